@@ -1,4 +1,11 @@
+import argparse
 import logging
+import os
+import sys
+
+# The quantization stage runs the ONNX backends from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
 from src.conversion.model_converter import ModelConverter
 
 logging.basicConfig(
@@ -7,6 +14,15 @@ logging.basicConfig(
 )
 
 def main():
+    parser = argparse.ArgumentParser(description="Export BLIP and ViLT to ONNX")
+    parser.add_argument("--quantize", choices=["static", "dynamic"],
+                        help="also write INT8 models to models/int8 (static = calibrated on real images)")
+    parser.add_argument("--calibration-dir", default="images/test_images",
+                        help="images used for static INT8 calibration")
+    parser.add_argument("--torchscript", action="store_true",
+                        help="also trace the models to TorchScript (.pt) for the torchscript backend")
+    args = parser.parse_args()
+
     try:
         # Initialize converter
         converter = ModelConverter()
@@ -23,12 +39,35 @@ def main():
         if converter.verify_model(language_path):
             logging.info(f"✅ Language model converted and verified: {language_path}")
         
+        # Convert and verify KV-cache decoder graphs
+        logging.info("\nConverting language model with KV cache...")
+        for path in converter.convert_language_with_past_to_onnx():
+            if converter.verify_model(path):
+                logging.info(f"✅ KV-cache decoder converted and verified: {path}")
+        
         # Convert and verify VQA model
         logging.info("\nConverting VQA model...")
         vqa_path = converter.convert_vqa_to_onnx()
         if converter.verify_model(vqa_path):
             logging.info(f"✅ VQA model converted and verified: {vqa_path}")
         
+        # Convert and verify scene detection model
+        logging.info("\nConverting scene model...")
+        scene_path = converter.convert_scene_to_onnx()
+        if converter.verify_model(scene_path):
+            logging.info(f"✅ Scene model converted and verified: {scene_path}")
+        
+        # TorchScript versions of the same graphs for the torchscript backend
+        if args.torchscript:
+            logging.info("\nTracing models to TorchScript...")
+            converter.convert_to_torchscript()
+        
+        # Quantize to INT8 and compare against the FP32 graphs
+        if args.quantize:
+            logging.info(f"\nQuantizing models ({args.quantize} INT8)...")
+            report_path = converter.quantize(args.calibration_dir, mode=args.quantize)
+            logging.info(f"✅ Quantized models written, report: {report_path}")
+        
     except Exception as e:
         logging.error(f"Conversion failed: {str(e)}")
         import traceback
@@ -1,15 +1,23 @@
 #accessibility_handler.py
 
  
-from transformers import pipeline
-import edge_tts
 import os
 import asyncio
+from image_context import image_context
+from config import SCENE_CONFIG
+from inference_backends import model_id
+from model_registry import registry
+from result_cache import result_cache
+from tts_cache import edge_speech
  
 class AccessibilityHandler:
-    def __init__(self):
-        # Initialize scene detection
-        self.scene_detector = pipeline("image-classification", model="microsoft/resnet-50")
+    def __init__(self, scene_model_name=None):
+        # Scene classifier is shared through the model registry; the inference
+        # engine is selected in SCENE_CONFIG
+        self.scene_model_name = scene_model_name or model_id(
+            "scene", SCENE_CONFIG["backend"], SCENE_CONFIG["model_name"]
+        )
+        registry.acquire(self.scene_model_name)
         
         # Create output directory for audio
         os.makedirs("audio_output", exist_ok=True)
@@ -21,29 +29,52 @@ class AccessibilityHandler:
         """Convert text to speech using Edge TTS"""
         try:
             audio_path = os.path.join("audio_output", filename)
-            communicate = edge_tts.Communicate(text, self.voice)
-            await communicate.save(audio_path)
-            return audio_path
+            return await edge_speech(text, self.voice, audio_path)
         except Exception as e:
             raise Exception(f"Error in text to speech conversion: {str(e)}")
  
-    def detect_scene(self, image_path):
-        """Detect the type of scene in the image"""
+    @property
+    def scene_detector(self):
+        return registry.get(self.scene_model_name)[1]
+
+    def close(self):
+        """Release the shared scene detection model"""
+        registry.release(self.scene_model_name)
+ 
+    def detect_scene(self, image):
+        """Detect the type of scene in the image (path or ImageContext)"""
         try:
-            results = self.scene_detector(image_path)
-            return results[0]['label'], results[0]['score']
+            context = image_context(image)
+            cached = result_cache.get("scene", self.scene_model_name, context.key)
+            if cached is not None:
+                return tuple(cached)
+
+            scene_detector = self.scene_detector
+            pixel_values = context.tensor("resnet", scene_detector.preprocess)
+            scene = scene_detector.classify_pixels(pixel_values)
+            result_cache.put("scene", self.scene_model_name, context.key, scene)
+            return scene
         except Exception as e:
             raise Exception(f"Error in scene detection: {str(e)}")
  
     def generate_detailed_description(self, caption, scene_info, vqa_results):
         """Generate a detailed, accessibility-focused description"""
-        description = f"This image shows {caption}. "
-        description += f"It appears to be a {scene_info[0]} scene with {scene_info[1]:.1%} confidence. "
-        
-        for question, result in vqa_results.items():
-            if result and 'answer' in result:
-                description += f"{question} {result['answer']}. "
-                
+        description = self.description_segment("caption", caption)
+        description += self.description_segment("scene", scene_info)
+        description += self.description_segment("vqa", vqa_results)
+        return description
+
+    def description_segment(self, stage, result):
+        """The part of the detailed description produced by one analysis stage"""
+        if stage == "caption":
+            return f"This image shows {result}. "
+        if stage == "scene":
+            return f"It appears to be a {result[0]} scene with {result[1]:.1%} confidence. "
+
+        description = ""
+        for question, answer in result.items():
+            if answer and 'answer' in answer:
+                description += f"{question} {answer['answer']}. "
         return description
  
     def change_voice(self, voice_name):
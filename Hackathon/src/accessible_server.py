@@ -2,15 +2,36 @@ import bluetooth
 import threading
 from image_captioning import generate_caption_with_blip
 from vqa_handler import VQAHandler
+from config import CAPTION_CONFIG, QUESTION_SETS, PROGRESSIVE_CONFIG
 from accessibility_handler import AccessibilityHandler
-from gtts import gTTS
+from model_preloader import start_preload
+from stage_executor import StageGraph
+from async_inference import inference
+from image_context import ImageContext
+from near_duplicates import NearDuplicateIndex, analyze, iter_analysis
+from question_planner import planner
+from progressive_audio import caption_first, frame_segment, END_OF_RESPONSE, ERROR_MESSAGE
+from tts_cache import gtts_speech
 import os
+import tempfile
 
 class AccessibleImageServer:
     def __init__(self):
         self.vqa_handler = VQAHandler()
         self.accessibility_handler = AccessibilityHandler()
         
+        # Load and warm up models in the background while Bluetooth starts
+        self.preloader = start_preload()
+
+        # Caption and scene detection run in parallel; VQA starts once those
+        # that answer some questions are done (see QUESTION_PLANNER_CONFIG)
+        self.stages = StageGraph()
+        self.stages.add("caption", lambda image: generate_caption_with_blip(
+            image, budget_ms=CAPTION_CONFIG["narration_budget_ms"]
+        ))
+        self.stages.add("scene", inference.limited("scene", self.accessibility_handler.detect_scene))
+        self.stages.add("vqa", self.answer_details, deps=planner.deps)
+        
         # Create output directories
         os.makedirs("received_images", exist_ok=True)
         os.makedirs("audio_output", exist_ok=True)
@@ -34,50 +55,81 @@ class AccessibleImageServer:
         print(f"Server started on port {self.port}")
         print("Waiting for connections...")
     
-    def process_image(self, image_path):
+    def answer_details(self, image, scene, caption=None):
+        """Answers to the accessibility questions, in one batched VQA pass for those still open"""
+        plan = planner.plan(QUESTION_SETS["accessibility"], scene, caption)
+        results = self.vqa_handler.get_answers(image, plan.to_run) if plan.to_run else []
+        return plan.answers({
+            question: result['main_answer'] for question, result in zip(plan.to_run, results)
+        })
+
+    def description_segment(self, stage, result):
+        """The part of the description produced by one analysis stage"""
+        if stage == "caption":
+            return f"I see {result}."
+        if stage == "scene":
+            return f"This appears to be a {result[0]} scene."
+
+        # Important details
+        return " ".join(f"{question} {answer}" for question, answer in result.items())
+
+    def process_image(self, image_path, recent=None):
         """Process image and generate detailed description"""
         try:
-            # Generate caption
-            caption = generate_caption_with_blip(image_path)
-            
-            # Get scene information
-            scene_type, confidence = self.accessibility_handler.detect_scene(image_path)
-            
-            # Get important details through VQA
-            questions = [
-                "What is in the foreground?",
-                "Are there any people?",
-                "What objects are visible?",
-                "What colors are prominent?",
-                "Is it indoor or outdoor?",
-                "What is the lighting like?",
-                "Are there any potential obstacles or hazards?"
-            ]
-            
-            details = []
-            for question in questions:
-                result = self.vqa_handler.get_answer(image_path, question)
-                if result and 'answer' in result:
-                    details.append(f"{question} {result['answer']}")
+            # Caption, scene information and VQA details (run in parallel)
+            results = analyze(self.stages, ImageContext(image_path), recent)
             
             # Create detailed, accessibility-focused description
-            description = f"I see {caption}. "
-            description += f"This appears to be a {scene_type} scene. "
-            description += " ".join(details)
+            description = " ".join(
+                self.description_segment(stage, results[stage]) for stage in ("caption", "scene", "vqa")
+            )
             
-            # Generate audio file
-            audio_path = os.path.join("audio_output", "description.mp3")
-            tts = gTTS(text=description, lang='en')
-            tts.save(audio_path)
+            # Generate audio file (a temporary file the caller deletes)
+            audio_path = self.speech_file(description)
             
             return audio_path, description
             
         except Exception as e:
             print(f"Error processing image: {e}")
             return None, str(e)
+
+    def speech_file(self, text):
+        """
+        Speak text into a new temporary MP3 in audio_output (client threads
+        must not share audio files); the caller deletes it
+        """
+        with tempfile.NamedTemporaryFile(dir="audio_output", suffix=".mp3", delete=False) as f:
+            audio_path = f.name
+        try:
+            return gtts_speech(text, audio_path)
+        except Exception:
+            os.remove(audio_path)
+            raise
+
+    def send_audio(self, client_socket, audio_path):
+        """Send the audio file as one length-prefixed segment, then delete it"""
+        try:
+            with open(audio_path, 'rb') as f:
+                client_socket.send(frame_segment(f.read()))
+        finally:
+            os.remove(audio_path)
+
+    def send_progressive(self, client_socket, image_path, recent=None):
+        """
+        Send the description as audio segments: the caption as soon as it is
+        ready, then scene and VQA details as they finish. Returns the full text.
+        """
+        segments = []
+        for stage, result in caption_first(iter_analysis(self.stages, ImageContext(image_path), recent)):
+            text = self.description_segment(stage, result)
+            self.send_audio(client_socket, self.speech_file(text))
+            segments.append(text)
+        return " ".join(segments)
     
     def handle_client(self, client_socket):
         """Handle client connection"""
+        # This client's recent images, for near-duplicate frames
+        recent = NearDuplicateIndex()
         try:
             while True:
                 # Receive image size
@@ -95,29 +147,35 @@ class AccessibleImageServer:
                         break
                     image_data += chunk
                 
-                # Save received image
-                image_path = os.path.join("received_images", "temp_image.jpg")
-                with open(image_path, 'wb') as f:
+                # Save received image (a temporary file per image, since
+                # clients are served concurrently)
+                with tempfile.NamedTemporaryFile(dir="received_images", suffix=".jpg", delete=False) as f:
                     f.write(image_data)
+                    image_path = f.name
                 
                 print("Image received, processing...")
                 
-                # Process image
-                audio_path, description = self.process_image(image_path)
+                try:
+                    if PROGRESSIVE_CONFIG["enabled"]:
+                        # One or more audio segments (8-byte size, then the
+                        # MP3 data), ended by a zero size
+                        try:
+                            description = self.send_progressive(client_socket, image_path, recent)
+                        except Exception as e:
+                            print(f"Error processing image: {e}")
+                            description = str(e)
+                            self.send_audio(client_socket, self.speech_file(ERROR_MESSAGE))
+                        client_socket.send(END_OF_RESPONSE)
+                    else:
+                        # One audio file (8-byte size, then the MP3 data)
+                        audio_path, description = self.process_image(image_path, recent)
+                        if audio_path:
+                            self.send_audio(client_socket, audio_path)
+                finally:
+                    os.remove(image_path)
                 
-                if audio_path:
-                    # Send audio file
-                    with open(audio_path, 'rb') as f:
-                        audio_data = f.read()
-                    
-                    # Send audio size first
-                    client_socket.send(len(audio_data).to_bytes(8, 'big'))
-                    
-                    # Send audio data
-                    client_socket.send(audio_data)
-                    
-                    print("Processed and sent response")
-                    print(f"Description: {description}")
+                print("Processed and sent response")
+                print(f"Description: {description}")
                 
         except Exception as e:
             print(f"Error handling client: {e}")
@@ -1,31 +1,33 @@
 import chainlit as cl
 from PIL import Image
-from image_captioning import generate_caption_with_blip
 from vqa_handler import VQAHandler
+from config import QUESTION_SETS
 import tempfile
-import os
 from optimized_models import OptimizedModelHandler
 from accessibility_handler import AccessibilityHandler
+from model_preloader import start_preload
+from async_inference import inference
+from image_context import ImageContext
+from question_planner import planner
 import asyncio
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
-import edge_tts  # Using Edge TTS
+from tts_cache import edge_speech  # Edge TTS, cached
 
-# Initialize Handlers & Models
+# Initialize Handlers (models are loaded once and shared through the model registry;
+# set MODEL_REGISTRY_CONFIG["local_files_only"] to run without internet)
 vqa_handler = VQAHandler()
 model_handler = OptimizedModelHandler()
 accessibility_handler = AccessibilityHandler()
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base", local_files_only=True) # can remove local_files_only if we want to connect to internet
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base", local_files_only=True)
+
+# Load and warm up models in the background; requests wait only for the model they use
+preloader = start_preload()
 
 async def generate_audio(text, lang='en'):
     """Generate audio from text using Edge TTS"""
     try:
         voice = "en-US-JennyNeural"  # Default voice
-        communicate = edge_tts.Communicate(text, voice)
         with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-            await communicate.save(fp.name)
-            return fp.name
+            # Repeated captions and answers come from the audio cache
+            return await edge_speech(text, voice, fp.name)
     except Exception as e:
         print(f"⚠️ Error generating audio: {str(e)}")
         return None
@@ -42,9 +44,13 @@ async def start():
                 "3️⃣ **Listen to Audio Descriptions** for accessibility.\n"
                 "\n📷 **Try uploading an image to get started!**"
     ).send()
+
+    if not preloader.ready.is_set():
+        await cl.Message(content="⏳ Models are still warming up, the first analysis may take a little longer.").send()
     
     # Initialize session variables
     cl.user_session.set("current_image_path", None)
+    cl.user_session.set("current_image", None)
     cl.user_session.set("accessibility_mode", True)
 
 @cl.on_message
@@ -58,22 +64,37 @@ async def main(message: cl.Message):
         image_element = message.elements[0]
         image_path = image_element.path
         cl.user_session.set("current_image_path", image_path)
+        # Decoded once and kept for the session's follow-up questions
+        image = ImageContext(image_path)
+        cl.user_session.set("current_image", image)
         
         try:
-            caption = model_handler.generate_caption(image_path)
-            scene_type, scene_confidence = accessibility_handler.detect_scene(image_path)
-
-            initial_questions = [
-                "What is in the foreground?",
-                "What is in the background?",
-                "What are the main colors?",
-                "Is it indoor or outdoor?",
-                "What is the lighting like?"
-            ]
-
-            vqa_results = {}
-            for question in initial_questions:
-                vqa_results[question] = model_handler.answer_question(image_path, question)
+            # Model calls run on the inference pool so other sessions keep being
+            # served. The caption decodes while scene detection runs (and VQA,
+            # unless it waits for the caption, see QUESTION_PLANNER_CONFIG)
+            caption_task = asyncio.ensure_future(inference.run(model_handler.generate_caption, image))
+            try:
+                scene_type, scene_confidence = await inference.run(
+                    accessibility_handler.detect_scene, image, model="scene"
+                )
+
+                initial_questions = QUESTION_SETS["overview"]
+
+                # Questions the caption and scene label already answer skip the
+                # VQA model; the rest are answered in one batched forward pass
+                caption = await caption_task if planner.wait_for_caption else None
+                vqa_results = await inference.run(
+                    model_handler.answer_planned_questions, image, initial_questions,
+                    (scene_type, scene_confidence), caption
+                )
+                caption = await caption_task
+            finally:
+                # If scene detection or VQA failed, stop waiting for the caption
+                # (or collect its own error, so it is not reported as unretrieved)
+                if not caption_task.done():
+                    caption_task.cancel()
+                elif not caption_task.cancelled():
+                    caption_task.exception()
 
             detailed_description = accessibility_handler.generate_detailed_description(
                 caption, (scene_type, scene_confidence), vqa_results
@@ -94,16 +115,15 @@ async def main(message: cl.Message):
         return
 
     if message.content.lower() == "v":
-        try:
-            question = accessibility_handler.listen_for_question()
-            message.content = question  # Update message content with transcribed question
-        except Exception as e:
-            await cl.Message(content=f"🎙️ Error processing voice input: {str(e)}").send()
-            return
+        # There is no speech recognition in the web app; questions are typed
+        await cl.Message(content="🎙️ Voice questions are not available here, please type your question.").send()
+        return
 
     if current_image_path:
         try:
-            result = model_handler.answer_question(current_image_path, message.content)
+            result = await inference.run(
+                model_handler.answer_question, cl.user_session.get("current_image"), message.content
+            )
             response = f"**Q:** {message.content}\n**A:** {result['answer']}"
 
             audio_path = await generate_audio(
@@ -135,7 +155,7 @@ async def on_action(action):
         return
     
     try:
-        result = vqa_handler.get_answer(current_image_path, question)
+        result = await inference.run(vqa_handler.get_answer, cl.user_session.get("current_image"), question)
 
         audio_path = await generate_audio(
             f"Question: {question}. Answer: {result['main_answer']}"
@@ -0,0 +1,113 @@
+#async_inference.py
+
+"""
+Runs blocking model calls from asyncio code (Chainlit handlers, the BLE
+server) on a bounded thread pool, so one slow image does not freeze the event
+loop for every other session. Threads rather than processes: torch and ONNX
+Runtime release the GIL during inference, and the models stay shared.
+
+Backpressure: at most max_pending calls are in flight per event loop; further
+callers wait for a slot and get an error after queue_timeout_s. Models that
+are not safe to call concurrently are limited by model_concurrency, for
+calls made here and for stage graph calls wrapped with limited().
+"""
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from config import EXECUTOR_CONFIG
+
+
+class InferenceExecutor:
+    def __init__(self, max_workers=EXECUTOR_CONFIG["max_workers"],
+                 max_pending=EXECUTOR_CONFIG["max_pending"],
+                 queue_timeout_s=EXECUTOR_CONFIG["queue_timeout_s"],
+                 model_concurrency=EXECUTOR_CONFIG["model_concurrency"]):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout_s = queue_timeout_s
+        self._pool = None
+        self._model_slots = {
+            model: threading.BoundedSemaphore(limit) for model, limit in model_concurrency.items()
+        }
+        self._pending = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _executor(self):
+        # Created on first use, so prefork workers each get their own threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+            return self._pool
+
+    def _pending_slots(self, loop):
+        with self._lock:
+            if loop not in self._pending:
+                self._pending[loop] = asyncio.Semaphore(self.max_pending)
+            return self._pending[loop]
+
+    def _call(self, model, func, args, kwargs):
+        slots = self._model_slots.get(model)
+        if slots is None:
+            return func(*args, **kwargs)
+        with slots:
+            return func(*args, **kwargs)
+
+    def limited(self, model, func):
+        """
+        func wrapped to take the model's concurrency slot on whatever thread
+        calls it (e.g. a StageGraph stage), so those calls share the limit
+        with run(..., model=model)
+        """
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            return self._call(model, func, args, kwargs)
+        return call
+
+    async def run(self, func, *args, model=None, **kwargs):
+        """
+        Await func(*args, **kwargs) run on the inference pool. model names the
+        model the call uses (e.g. "scene"), for its concurrency limit.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending_slots(loop)
+        try:
+            await asyncio.wait_for(pending.acquire(), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RuntimeError("The server is busy processing other images, please try again shortly")
+
+        self.in_flight += 1
+        try:
+            call = functools.partial(self._call, model, func, args, kwargs)
+            return await loop.run_in_executor(self._executor(), call)
+        finally:
+            self.in_flight -= 1
+            pending.release()
+
+    async def iterate(self, iterator, model=None):
+        """Async iterator over a blocking iterator, each step run on the inference pool"""
+        iterator = iter(iterator)
+        finished = object()
+        while True:
+            item = await self.run(next, iterator, finished, model=model)
+            if item is finished:
+                return
+            yield item
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected
+        }
+
+
+# Shared executor for this process
+inference = InferenceExecutor()
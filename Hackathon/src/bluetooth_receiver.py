@@ -3,8 +3,15 @@
 import os
 from image_captioning import generate_caption_with_blip
 from vqa_handler import VQAHandler
+from config import CAPTION_CONFIG, QUESTION_SETS
 from accessibility_handler import AccessibilityHandler
-import edge_tts
+from model_preloader import start_preload
+from stage_executor import StageGraph
+from image_context import ImageContext
+from near_duplicates import NearDuplicateIndex, analyze
+from async_inference import inference
+from question_planner import planner
+from tts_cache import edge_speech
 import time
 import asyncio
  
@@ -13,6 +20,18 @@ class ImageProcessor:
         print("Initializing models...")
         self.vqa_handler = VQAHandler()
         self.accessibility_handler = AccessibilityHandler()
+        # Load and warm up models in the background while we watch for images
+        self.preloader = start_preload()
+
+        # Caption and scene detection run in parallel and VQA starts once
+        # those that answer some questions are done (see QUESTION_PLANNER_CONFIG);
+        # a failed scene or VQA stage only leaves its part out of the description
+        self.stages = StageGraph()
+        self.stages.add("caption", lambda image: generate_caption_with_blip(
+            image, budget_ms=CAPTION_CONFIG["narration_budget_ms"]
+        ))
+        self.stages.add("scene", inference.limited("scene", self.accessibility_handler.detect_scene), optional=True)
+        self.stages.add("vqa", self.answer_questions, deps=planner.deps, optional=True)
         
         # Create directories if they don't exist
         os.makedirs("received_images", exist_ok=True)
@@ -20,14 +39,23 @@ class ImageProcessor:
         
         # Directory to watch for new images
         self.watch_dir = "received_images"
+        # Recent images from this phone, for near-duplicate frames
+        self.recent = NearDuplicateIndex()
         # Default voice for Edge TTS
         self.voice = "en-US-JennyNeural"
         
+    def answer_questions(self, image, scene, caption=None):
+        """Answers to the basic questions, in one batched VQA pass for those still open"""
+        plan = planner.plan(QUESTION_SETS["basic"], scene, caption)
+        results = self.vqa_handler.get_answers(image, plan.to_run) if plan.to_run else []
+        return plan.answers({
+            question: result['main_answer'] for question, result in zip(plan.to_run, results)
+        })
+
     async def generate_audio(self, text, audio_path):
         """Generate audio using Edge TTS"""
         try:
-            communicate = edge_tts.Communicate(text, self.voice)
-            await communicate.save(audio_path)
+            await edge_speech(text, self.voice, audio_path)
             return True
         except Exception as e:
             print(f"Error generating audio: {e}")
@@ -38,40 +66,29 @@ class ImageProcessor:
         try:
             print(f"\nProcessing image: {image_path}")
             
-            # Generate caption
-            print("Generating caption...")
-            caption = generate_caption_with_blip(image_path)
+            # Caption, scene detection and VQA run in parallel
+            print("Generating caption, detecting scene and analyzing image details...")
+            start = time.time()
+            results = await inference.run(analyze, self.stages, ImageContext(image_path), self.recent)
+            print(f"Analysis took {time.time() - start:.2f}s")
+
+            caption = results["caption"]
             print(f"Caption: {caption}")
             
-            # Get scene information
-            print("Detecting scene...")
-            try:
-                scene_type, scene_confidence = self.accessibility_handler.detect_scene(image_path)
+            # Scene information
+            scene_info = ""
+            if results["scene"] is not None:
+                scene_type, scene_confidence = results["scene"]
                 scene_info = f"It appears to be a {scene_type} scene. "
                 print(f"Scene: {scene_type} (Confidence: {scene_confidence:.2%})")
-            except Exception as e:
-                print(f"Scene detection error: {e}")
-                scene_info = ""
-            
-            # Generate VQA responses
-            print("Analyzing image details...")
-            questions = [
-                "What is the main subject?",
-                "What colors are present?",
-                "Is this indoors or outdoors?"
-            ]
             
+            # VQA responses, open questions answered in one batched forward pass
             vqa_results = []
-            for question in questions:
-                try:
-                    result = self.vqa_handler.get_answer(image_path, question)
-                    if isinstance(result, dict) and 'answer' in result:
-                        answer = result['answer']
-                        vqa_results.append(f"{answer}")
-                        print(f"Q: {question}")
-                        print(f"A: {answer}")
-                except Exception as e:
-                    print(f"VQA error for question '{question}': {e}")
+            if results["vqa"] is not None:
+                for question, answer in results["vqa"].items():
+                    vqa_results.append(f"{answer}")
+                    print(f"Q: {question}")
+                    print(f"A: {answer}")
             
             # Generate detailed description
             description = f"This image shows {caption}. {scene_info}"
@@ -1,17 +1,38 @@
 #bluetooth_server.py
 bluetooth_server
 import asyncio
+import functools
 from bleak import BleakScanner, BleakClient
 import os
+import tempfile
 from image_captioning import generate_caption_with_blip
 from vqa_handler import VQAHandler
+from config import CAPTION_CONFIG, QUESTION_SETS, PROGRESSIVE_CONFIG
 from accessibility_handler import AccessibilityHandler
-import edge_tts  # Changed from gtts to edge_tts
+from model_preloader import start_preload
+from async_inference import inference
+from stage_executor import StageGraph
+from image_context import ImageContext
+from near_duplicates import NearDuplicateIndex, analyze, iter_analysis
+from question_planner import planner
+from progressive_audio import caption_first, frame_segment, END_OF_RESPONSE, ERROR_MESSAGE
+from tts_cache import edge_speech  # Edge TTS, cached
  
 class BluetoothServer:
     def __init__(self):
         self.vqa_handler = VQAHandler()
         self.accessibility_handler = AccessibilityHandler()
+        # Load and warm up models in the background while we scan for devices
+        self.preloader = start_preload()
+
+        # Caption and scene detection run in parallel; VQA starts once those
+        # that answer some questions are done (see QUESTION_PLANNER_CONFIG)
+        self.stages = StageGraph()
+        self.stages.add("caption", lambda image: generate_caption_with_blip(
+            image, budget_ms=CAPTION_CONFIG["narration_budget_ms"]
+        ))
+        self.stages.add("scene", inference.limited("scene", self.accessibility_handler.detect_scene))
+        self.stages.add("vqa", self.answer_questions, deps=planner.deps)
         self.received_data = bytearray()
         self.voice = "en-US-JennyNeural"  # Default voice
         
@@ -43,10 +64,11 @@ class BluetoothServer:
             await client.connect()
             print("Connected! Waiting for image...")
             
-            # Set up notification handler
+            # Set up notification handler, with this device's recent images
+            # for near-duplicate frames
             await client.start_notify(
                 "image_characteristic_uuid",  # You'll need to replace this with your phone's characteristic UUID
-                self.handle_image_data
+                functools.partial(self.handle_image_data, NearDuplicateIndex())
             )
             
             # Keep connection alive
@@ -58,75 +80,108 @@ class BluetoothServer:
         finally:
             await client.disconnect()
  
-    async def handle_image_data(self, sender, data):
+    async def handle_image_data(self, recent, sender, data):
         try:
             # Accumulate received data
             self.received_data.extend(data)
             
             # Check if this is the end of the image
             if len(data) < 512:  # Assuming smaller packet means end of transmission
-                # Save received image
-                image_path = "received_images/received_image.jpg"
-                with open(image_path, "wb") as f:
-                    f.write(self.received_data)
+                # Take the buffer now: processing yields to the event loop, and
+                # packets of the next image may arrive before it finishes
+                image_data, self.received_data = self.received_data, bytearray()
+
+                # Saved to a temporary file (a unique name, since images can
+                # overlap) that is deleted once the response is sent
+                with tempfile.NamedTemporaryFile(dir="received_images", suffix=".jpg", delete=False) as f:
+                    f.write(image_data)
+                    image_path = f.name
                 
                 print("Image received! Processing...")
-                
-                # Process image using your existing models
-                results = await self.process_image(image_path)
-                
-                # Generate audio response
-                audio_path = await self.text_to_speech(results['description'])
-                
-                if audio_path:
-                    # Send audio back
-                    with open(audio_path, "rb") as f:
-                        audio_data = f.read()
-                        await sender.write_gatt_char(
-                            "audio_characteristic_uuid",  # Replace with your characteristic UUID
-                            audio_data
-                        )
+                try:
+                    if PROGRESSIVE_CONFIG["enabled"]:
+                        # One or more audio segments (8-byte size, then the MP3
+                        # data), ended by a zero size
+                        await self.send_progressive(sender, image_path, recent)
+                        await sender.write_gatt_char("audio_characteristic_uuid", END_OF_RESPONSE)
+                    else:
+                        # Process image using your existing models
+                        results = await self.process_image(image_path, recent)
                     
-                    print("Processed and sent response!")
+                        # Generate the audio response and send it back (the MP3 data as is)
+                        await self.speak(sender, results['description'], framed=False)
+                finally:
+                    os.remove(image_path)
                 
-                # Clear received data for next image
-                self.received_data = bytearray()
+                print("Processed and sent response!")
                 
         except Exception as e:
             print(f"Error processing data: {e}")
             self.received_data = bytearray()
  
-    async def process_image(self, image_path):
+    async def send_audio(self, sender, audio_path, framed=True):
+        """Send one audio segment, length-prefixed if framed"""
+        with open(audio_path, "rb") as f:
+            audio_data = f.read()
+        await sender.write_gatt_char(
+            "audio_characteristic_uuid",  # Replace with your characteristic UUID
+            frame_segment(audio_data) if framed else audio_data
+        )
+
+    async def speak(self, sender, text, framed=True):
+        """Send text as one audio segment, synthesized to a temporary file"""
+        audio_path = await self.text_to_speech(text)
+        if audio_path:
+            try:
+                await self.send_audio(sender, audio_path, framed)
+            finally:
+                os.remove(audio_path)
+
+    async def send_progressive(self, sender, image_path, recent=None):
+        """Speak the caption as soon as it is ready, then the scene and VQA details as they finish"""
+        try:
+            # Stages run on the inference pool so BLE notifications keep flowing
+            stage_results = caption_first(iter_analysis(self.stages, ImageContext(image_path), recent))
+            async for stage, result in inference.iterate(stage_results):
+                await self.speak(sender, self.description_segment(stage, result))
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            await self.speak(sender, ERROR_MESSAGE)
+
+    def description_segment(self, stage, result):
+        """The part of the description produced by one analysis stage"""
+        if stage == "caption":
+            return f"This image shows {result}. "
+        if stage == "scene":
+            return f"It appears to be a {result[0]} scene. "
+        return "".join(f"{answer}. " for answer in result.values())
+
+    def answer_questions(self, image, scene, caption=None):
+        """Answers to the basic questions, in one batched VQA pass for those still open"""
+        plan = planner.plan(QUESTION_SETS["basic"], scene, caption)
+        results = self.vqa_handler.get_answers(image, plan.to_run) if plan.to_run else []
+        return plan.answers({
+            question: result['main_answer'] for question, result in zip(plan.to_run, results)
+        })
+
+    async def process_image(self, image_path, recent=None):
         """Process the received image using your existing models"""
         try:
-            # Generate caption
-            caption = generate_caption_with_blip(image_path)
-            
-            # Get scene information
-            scene_type, scene_confidence = self.accessibility_handler.detect_scene(image_path)
+            # Caption, scene information and basic VQA run in parallel; the
+            # stages run on the inference pool so BLE notifications keep flowing
+            results = await inference.run(analyze, self.stages, ImageContext(image_path), recent)
             
-            # Get some basic VQA information
-            questions = [
-                "What is the main subject?",
-                "What colors are present?",
-                "Is this indoors or outdoors?"
-            ]
-            
-            vqa_results = {}
-            for question in questions:
-                result = self.vqa_handler.get_answer(image_path, question)
-                vqa_results[question] = result['answer']
+            vqa_results = results["vqa"]
             
             # Generate detailed description
-            description = f"This image shows {caption}. "
-            description += f"It appears to be a {scene_type} scene. "
-            for q, a in vqa_results.items():
-                description += f"{a}. "
+            description = "".join(
+                self.description_segment(stage, results[stage]) for stage in ("caption", "scene", "vqa")
+            )
             
             return {
-                'caption': caption,
+                'caption': results["caption"],
                 'description': description,
-                'scene_info': (scene_type, scene_confidence),
+                'scene_info': results["scene"],
                 'vqa_results': vqa_results
             }
             
@@ -135,14 +190,17 @@ class BluetoothServer:
             return None
  
     async def text_to_speech(self, text):
-        """Convert description to speech using Edge TTS"""
+        """
+        Convert description to speech using Edge TTS, in a new temporary file
+        (responses can overlap) that the caller deletes
+        """
+        with tempfile.NamedTemporaryFile(dir="audio_output", suffix=".mp3", delete=False) as f:
+            audio_path = f.name
         try:
-            audio_path = "audio_output/response.mp3"
-            communicate = edge_tts.Communicate(text, self.voice)
-            await communicate.save(audio_path)
-            return audio_path
+            return await edge_speech(text, self.voice, audio_path)
         except Exception as e:
             print(f"Error generating speech: {e}")
+            os.remove(audio_path)
             return None
  
     def change_voice(self, voice_name):
@@ -1,8 +1,225 @@
 # VQA model configuration
 VQA_CONFIG = {
     "model_name": "dandelin/vilt-b32-finetuned-vqa",
-    "max_length": 32,
-    "top_k": 3
+    # Questions are padded to this many tokens: ViLT's maximum, and the
+    # sequence length of the exported VQA graph (ONNX_CONFIG["vqa_seq_length"])
+    "max_length": 40,
+    "top_k": 3,
+    # Inference engine: "torch" (eager PyTorch), or the exported graph on
+    # "onnx" (ONNX Runtime) or "torchscript". "dlc" (Qualcomm SNPE) is a
+    # stub that is not supported yet: loading it raises NotImplementedError.
+    # Check an exported graph first: python src/onnx_vqa.py images/test_images
+    "backend": "torch"
+}
+
+# Caption model configuration
+CAPTION_CONFIG = {
+    "model_name": "Salesforce/blip-image-captioning-base",
+    # Inference engine: "torch", "onnx" or "torchscript" ("dlc" is a stub, see VQA_CONFIG)
+    "backend": "torch",
+    # Latency budget for spoken (Bluetooth) narration: decoding stops here and
+    # the partial caption is used; None for no limit
+    "narration_budget_ms": 1500
+}
+
+# Exported models written by convert_models.py (TorchScript .pt and SNPE
+# .dlc files use the same names with their own extension)
+ONNX_CONFIG = {
+    "model_dir": "models",
+    "caption_vision_model": "blip_vision.onnx",
+    "caption_decoder_model": "language_model.onnx",
+    # KV-cache decoder graphs; used instead of caption_decoder_model when present
+    "caption_decoder_prefill_model": "language_model_prefill.onnx",
+    "caption_decoder_step_model": "language_model_step.onnx",
+    # Caption length limit, including the start token (transformers' default)
+    "max_length": 20,
+    "vqa_model": "vqa_model.onnx",
+    "scene_model": "scene_model.onnx",
+    # Static input shapes the VQA graph was exported with
+    "vqa_image_size": 384,
+    "vqa_seq_length": 40
+}
+
+# Scene detection model configuration
+SCENE_CONFIG = {
+    "model_name": "microsoft/resnet-50",
+    # Inference engine: "torch", "onnx" or "torchscript" ("dlc" is a stub, see VQA_CONFIG)
+    "backend": "torch"
+}
+
+# Model registry configuration
+MODEL_REGISTRY_CONFIG = {
+    # Idle models are unloaded (least recently used first) once the loaded
+    # weights exceed this budget. Models held by a handler are never unloaded.
+    "memory_budget_mb": 4096,
+    # Set to True to load models from the local Hugging Face cache only
+    "local_files_only": False
+}
+
+# Startup preload configuration
+PRELOAD_CONFIG = {
+    # Load and warm up every model on background threads at startup
+    # (False: each model loads lazily on its first request)
+    "enabled": True,
+    "warmup_runs": 1,
+    # Width x height of the blank warm-up image, matching typical phone photos
+    "warmup_image_size": (640, 480),
+    "warmup_question": "What is in the image?"
+}
+
+# ONNX Runtime session configuration
+ORT_SESSION_CONFIG = {
+    # "disabled", "basic", "extended" or "all"
+    "graph_optimization_level": "all",
+    # 0 lets ONNX Runtime pick (one thread per physical core)
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    # Optimized graphs are saved here on first load and reused on later starts
+    "optimized_model_dir": "models/optimized",
+    # "onnx" or "ort" (ORT format loads fastest)
+    "save_format": "onnx",
+    # Bind inputs and outputs to long-lived per-thread buffers (I/O binding)
+    # where the caller asks for it: the caption encoder, decode loop and scene model
+    "io_binding": True
+}
+
+# Prefork serving configuration (see gunicorn_conf.py)
+PREFORK_CONFIG = {
+    "bind": "0.0.0.0:5000",
+    # None: one worker per CPU core
+    "workers": None,
+    # Request threads per worker (gthread workers), so concurrent requests
+    # reach the micro-batchers together. None: the largest max_batch_size
+    # in BATCHING_CONFIG (1 with batching off)
+    "threads": None,
+    # None: split the CPU cores evenly between workers
+    "torch_threads_per_worker": None,
+    # gunicorn kills (and respawns) a worker silent for this many seconds
+    "timeout": 120,
+    # How long a worker waits for its models to warm up before it starts
+    # serving degraded (/health reports 503 and which models failed). The
+    # worker is silent while it waits, so at most 3/4 of timeout is used.
+    "worker_ready_timeout_s": 90,
+    # Exit the worker (non-zero) instead of serving degraded
+    "exit_on_preload_failure": False
+}
+
+# Per-image cache of image tensors reused by follow-up questions
+EMBEDDING_CACHE_CONFIG = {
+    # Least recently used images are evicted above either limit
+    "max_entries": 32,
+    "max_mb": 256
+}
+
+# Content-addressed cache of captions, scene labels and VQA answers (result_cache.py)
+RESULT_CACHE_CONFIG = {
+    "enabled": True,
+    # In-memory tier, least recently used results evicted first
+    "memory_entries": 2048,
+    # On-disk tier, kept across restarts and shared by prefork workers
+    "db_path": "cache/results.sqlite3",
+    "max_disk_mb": 64,
+    # Bump to drop results from older Hugging Face weights (exported models
+    # are versioned by their files)
+    "version": "1"
+}
+
+# Near-duplicate frame suppression (near_duplicates.py)
+NEAR_DUPLICATE_CONFIG = {
+    "enabled": True,
+    # Images whose 64-bit dHashes differ in at most this many bits match
+    "max_distance": 6,
+    # ...if the earlier one was analyzed within this many seconds
+    "window_s": 10,
+    # Recent images kept per client; frames are never matched across clients
+    "max_entries": 64,
+    # HTTP sessions (session_id) whose recent images are kept
+    "max_clients": 256
+}
+
+# Disk cache of synthesized speech, keyed by (text, voice, format) (tts_cache.py)
+TTS_CACHE_CONFIG = {
+    "enabled": True,
+    "cache_dir": "cache/tts",
+    # Least recently used audio files are deleted above this size
+    "max_mb": 256
+}
+
+# Dynamic micro-batching of concurrent requests per model
+BATCHING_CONFIG = {
+    # False: every request runs on its own immediately (batch of one)
+    "enabled": True,
+    # Longest a request waits for others to join its batch
+    "max_wait_ms": 10,
+    # Most requests run together in one forward pass (a VQA request may
+    # itself carry a whole question set)
+    "max_batch_size": {
+        "caption": 8,
+        "vqa": 8
+    }
+}
+
+# Thread pool that runs model calls for the asyncio entry points (Chainlit, BLE)
+EXECUTOR_CONFIG = {
+    # Enough threads for a full caption/VQA micro-batch to gather
+    "max_workers": 8,
+    # Calls in flight per event loop; later callers wait for a slot...
+    "max_pending": 16,
+    # ...and are told the server is busy after this many seconds
+    "queue_timeout_s": 30,
+    # Concurrent calls allowed per model that is not safe to share. Caption
+    # and VQA calls are serialized by their micro-batching queues instead.
+    "model_concurrency": {
+        "scene": 1
+    }
+}
+
+# Parallel caption / scene / VQA stages per image (stage_executor.py)
+STAGE_CONFIG = {
+    # Stages running at once across all requests
+    "max_workers": 6,
+    # torch intra-op threads per stage, sized for a 4-core CPU so the three
+    # parallel stages share the cores (None: torch default)
+    "threads": {
+        "caption": 2,
+        "scene": 1,
+        "vqa": 1
+    }
+}
+
+# Progressive audio responses (progressive_audio.py)
+PROGRESSIVE_CONFIG = {
+    # Send the caption's audio as soon as it is ready, followed by the scene
+    # and VQA details as they finish (False: one MP3 for the full description)
+    "enabled": True,
+    # Default for server.py's /analyze_image, which clients can override with
+    # ?progressive=1/0. Off by default: once streaming starts, a failure can
+    # no longer be reported as an HTTP error status
+    "http": False
+}
+
+# Image decoding (image_context.py)
+IMAGE_DECODE_CONFIG = {
+    # Decode JPEGs at 1/2, 1/4 or 1/8 scale in the DCT domain, to the smallest
+    # size whose sides still cover every model input: BLIP and ViLT use 384,
+    # the scene ResNet 256 before its 224 crop
+    "draft": True,
+    "min_size": 384
+}
+
+# VQA question planning (question_planner.py)
+QUESTION_PLANNER_CONFIG = {
+    # False: always run every question in the set
+    "enabled": True,
+    # Per-image compute budget: most questions sent to the VQA model once
+    # category questions are added (fixed set questions always run)
+    "max_questions": 6,
+    # Scene labels below this confidence are not used to answer questions
+    "min_scene_confidence": 0.5,
+    # VQA waits for the caption too, so questions it answers ("Are there any
+    # people?" after "a man riding a bike") skip the VQA model. False: VQA
+    # starts once the scene label is known, in parallel with caption decoding
+    "wait_for_caption": True
 }
 
 # Suggested questions for different image types
@@ -23,4 +240,33 @@ SUGGESTED_QUESTIONS = {
         "Is this a city or suburban area?",
         "Are there any vehicles visible?",
     ]
-} 
\ No newline at end of file
+}
+
+# Fixed question sets asked about every image. These and SUGGESTED_QUESTIONS
+# are tokenized once at startup into padded (n, max_length) input blocks.
+QUESTION_SETS = {
+    # Chainlit and HTTP server image analysis
+    "overview": [
+        "What is in the foreground?",
+        "What is in the background?",
+        "What are the main colors?",
+        "Is it indoor or outdoor?",
+        "What is the lighting like?"
+    ],
+    # Accessible Bluetooth server
+    "accessibility": [
+        "What is in the foreground?",
+        "Are there any people?",
+        "What objects are visible?",
+        "What colors are prominent?",
+        "Is it indoor or outdoor?",
+        "What is the lighting like?",
+        "Are there any potential obstacles or hazards?"
+    ],
+    # BLE server and Bluetooth receiver
+    "basic": [
+        "What is the main subject?",
+        "What colors are present?",
+        "Is this indoors or outdoors?"
+    ]
+}
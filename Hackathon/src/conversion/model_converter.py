@@ -1,5 +1,7 @@
 import torch
 from transformers import (
+    AutoImageProcessor,
+    AutoModelForImageClassification,
     BlipProcessor, 
     BlipForConditionalGeneration,
     ViltProcessor, 
@@ -8,24 +10,109 @@ from transformers import (
 import logging
 from pathlib import Path
 import onnx
+from config import MODEL_REGISTRY_CONFIG
+from .quantization import quantize_models
+
+
+class VisionWrapper(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+
+    def forward(self, pixel_values):
+        return self.vision_model(pixel_values)[0]
+
+
+class LanguageWrapper(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.text_decoder = model.text_decoder
+
+    def forward(self, input_ids, attention_mask, encoder_hidden_states):
+        return self.text_decoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            encoder_hidden_states=encoder_hidden_states
+        )[0]
+
+
+class VQAWrapper(torch.nn.Module):
+    """
+    ViltForQuestionAnswering's full forward (text and image embeddings with
+    position, modality and CLS embeddings, encoder, final layernorm, pooler,
+    classifier) for images with a pixel_mask. Only ViLT's visual_embed is
+    replaced: it loops over the batch and keeps patches in a random order,
+    which can't be exported with a dynamic batch. Here every patch is kept in
+    order and padding patches are masked out, which gives the same logits for
+    the exported graph's unpadded 384x384 images (the encoder does not depend
+    on the order of the image tokens).
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def visual_embed(self, pixel_values, pixel_mask):
+        embeddings = self.model.vilt.embeddings
+        config = self.model.config
+        patches = embeddings.patch_embeddings(pixel_values)
+        batch_size, hidden_size, height, width = patches.shape
+
+        patch_mask = torch.nn.functional.interpolate(pixel_mask[:, None].float(), size=(height, width)).long()
+        patch_dim = config.image_size // config.patch_size
+        spatial_pos = embeddings.position_embeddings[:, 1:, :].transpose(1, 2).view(1, hidden_size, patch_dim, patch_dim)
+        pos_embed = torch.nn.functional.interpolate(spatial_pos, size=(height, width), mode="bilinear", align_corners=True)
+
+        patches = (patches + pos_embed).flatten(2).transpose(1, 2)
+        cls_tokens = embeddings.cls_token + embeddings.position_embeddings[:, :1, :]
+        image_embeds = torch.cat([cls_tokens.expand(batch_size, -1, -1), patches], dim=1)
+        image_mask = torch.cat([torch.ones_like(patch_mask.flatten(1)[:, :1]), patch_mask.flatten(1)], dim=1)
+        return image_embeds, image_mask
+
+    def forward(self, pixel_values, pixel_mask, input_ids, attention_mask):
+        image_embeds, image_mask = self.visual_embed(pixel_values, pixel_mask)
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            image_embeds=image_embeds,
+            pixel_mask=image_mask
+        ).logits
+
+
+class SceneWrapper(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
 
 class ModelConverter:
     def __init__(self):
         self.output_dir = Path("models")
         self.output_dir.mkdir(exist_ok=True)
         
+        # Set MODEL_REGISTRY_CONFIG["local_files_only"] to convert from the local cache only
+        pretrained = {"local_files_only": MODEL_REGISTRY_CONFIG["local_files_only"]}
         try:
             # Initialize BLIP model
-            self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-            self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+            self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base", **pretrained)
+            self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base", **pretrained)
             self.blip_model.eval()
             logging.info("Successfully loaded BLIP model")
 
             # Initialize VQA model
-            self.vqa_processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-            self.vqa_model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
+            self.vqa_processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa", **pretrained)
+            self.vqa_model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa", **pretrained)
             self.vqa_model.eval()
             logging.info("Successfully loaded VQA model")
+
+            # Initialize scene detection model
+            self.scene_processor = AutoImageProcessor.from_pretrained("microsoft/resnet-50", **pretrained)
+            self.scene_model = AutoModelForImageClassification.from_pretrained("microsoft/resnet-50", **pretrained)
+            self.scene_model.eval()
+            logging.info("Successfully loaded scene detection model")
             
         except Exception as e:
             logging.error(f"Failed to load models: {str(e)}")
@@ -46,15 +133,6 @@ class ModelConverter:
                 do_rescale=False
             )
             
-            # Create vision model wrapper
-            class VisionWrapper(torch.nn.Module):
-                def __init__(self, model):
-                    super().__init__()
-                    self.vision_model = model.vision_model
-
-                def forward(self, pixel_values):
-                    return self.vision_model(pixel_values)[0]
-
             # Create wrapper instance
             vision_wrapper = VisionWrapper(self.blip_model)
             vision_wrapper.eval()
@@ -81,8 +159,18 @@ class ModelConverter:
             logging.error(f"Failed to convert vision model: {str(e)}")
             raise
 
+    def _dummy_image_embeds(self):
+        """Vision encoder output for a dummy image, used as cross-attention input"""
+        inputs = self.blip_processor(
+            images=torch.rand(1, 3, 224, 224),
+            return_tensors="pt",
+            do_rescale=False
+        )
+        with torch.no_grad():
+            return self.blip_model.vision_model(inputs['pixel_values'])[0]
+
     def convert_language_to_onnx(self):
-        """Convert BLIP language model to ONNX"""
+        """Convert BLIP text decoder to ONNX (conditioned on the vision features)"""
         try:
             language_path = self.output_dir / "language_model.onnx"
             
@@ -93,19 +181,8 @@ class ModelConverter:
                 return_tensors="pt",
                 padding=True
             )
+            image_embeds = self._dummy_image_embeds()
             
-            # Create language model wrapper
-            class LanguageWrapper(torch.nn.Module):
-                def __init__(self, model):
-                    super().__init__()
-                    self.text_decoder = model.text_decoder
-
-                def forward(self, input_ids, attention_mask):
-                    return self.text_decoder(
-                        input_ids=input_ids,
-                        attention_mask=attention_mask
-                    )[0]
-
             # Create wrapper instance
             language_wrapper = LanguageWrapper(self.blip_model)
             language_wrapper.eval()
@@ -113,14 +190,15 @@ class ModelConverter:
             # Export to ONNX
             torch.onnx.export(
                 language_wrapper,
-                (inputs['input_ids'], inputs['attention_mask']),
+                (inputs['input_ids'], inputs['attention_mask'], image_embeds),
                 language_path,
-                input_names=['input_ids', 'attention_mask'],
-                output_names=['text_features'],
+                input_names=['input_ids', 'attention_mask', 'encoder_hidden_states'],
+                output_names=['logits'],
                 dynamic_axes={
                     'input_ids': {0: 'batch_size', 1: 'sequence'},
                     'attention_mask': {0: 'batch_size', 1: 'sequence'},
-                    'text_features': {0: 'batch_size', 1: 'sequence'}
+                    'encoder_hidden_states': {0: 'batch_size'},
+                    'logits': {0: 'batch_size', 1: 'sequence'}
                 },
                 opset_version=11,
                 do_constant_folding=True
@@ -133,6 +211,121 @@ class ModelConverter:
             logging.error(f"Failed to convert language model: {str(e)}")
             raise
 
+    def convert_language_with_past_to_onnx(self):
+        """
+        Convert BLIP text decoder to a KV-cache pair of ONNX graphs:
+        a prefill graph for the prompt and a step graph that decodes one token
+        from the cached past keys/values, so each new token costs O(n).
+        """
+        try:
+            prefill_path = self.output_dir / "language_model_prefill.onnx"
+            step_path = self.output_dir / "language_model_step.onnx"
+
+            image_embeds = self._dummy_image_embeds()
+            bos_token_id = self.blip_model.config.text_config.bos_token_id
+            input_ids = torch.full((1, 1), bos_token_id, dtype=torch.long)
+            attention_mask = torch.ones_like(input_ids)
+
+            # Create decoder wrapper with flat past/present tensors
+            class DecoderWithPastWrapper(torch.nn.Module):
+                def __init__(self, model, tensors_per_layer=2):
+                    super().__init__()
+                    self.text_decoder = model.text_decoder
+                    self.tensors_per_layer = tensors_per_layer
+
+                def forward(self, input_ids, attention_mask, encoder_hidden_states, *past):
+                    past_key_values = None
+                    if past:
+                        n = self.tensors_per_layer
+                        past_key_values = tuple(
+                            tuple(past[i:i + n]) for i in range(0, len(past), n)
+                        )
+                    outputs = self.text_decoder(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        encoder_hidden_states=encoder_hidden_states,
+                        past_key_values=past_key_values,
+                        use_cache=True,
+                        return_dict=True
+                    )
+                    present = outputs.past_key_values
+                    if hasattr(present, "to_legacy_cache"):
+                        present = present.to_legacy_cache()
+                    return (outputs.logits, *[t for layer in present for t in layer])
+
+            # Run the prefill once in PyTorch to get the cache layout and a dummy past
+            decoder_wrapper = DecoderWithPastWrapper(self.blip_model)
+            decoder_wrapper.eval()
+            with torch.no_grad():
+                prefill_outputs = decoder_wrapper(input_ids, attention_mask, image_embeds)
+            past = prefill_outputs[1:]
+            num_layers = self.blip_model.config.text_config.num_hidden_layers
+            decoder_wrapper.tensors_per_layer = len(past) // num_layers
+
+            def cache_names(prefix):
+                return [
+                    f"{prefix}.{layer}.{j}"
+                    for layer in range(num_layers)
+                    for j in range(decoder_wrapper.tensors_per_layer)
+                ]
+
+            def cache_axes(names):
+                # Self-attention entries grow with the decoded length; any
+                # cross-attention entries have the image sequence length
+                return {
+                    name: {0: 'batch_size', 2: 'past_sequence' if int(name.rsplit('.', 1)[1]) < 2 else 'encoder_sequence'}
+                    for name in names
+                }
+
+            past_names = cache_names("past_key_values")
+            present_names = cache_names("present")
+
+            # Export prefill graph
+            torch.onnx.export(
+                decoder_wrapper,
+                (input_ids, attention_mask, image_embeds),
+                prefill_path,
+                input_names=['input_ids', 'attention_mask', 'encoder_hidden_states'],
+                output_names=['logits'] + present_names,
+                dynamic_axes={
+                    'input_ids': {0: 'batch_size', 1: 'sequence'},
+                    'attention_mask': {0: 'batch_size', 1: 'sequence'},
+                    'encoder_hidden_states': {0: 'batch_size'},
+                    'logits': {0: 'batch_size', 1: 'sequence'},
+                    **cache_axes(present_names)
+                },
+                opset_version=14,
+                do_constant_folding=True
+            )
+            logging.info(f"Successfully converted decoder prefill graph to {prefill_path}")
+
+            # Export step graph: one new token attending to the cached past
+            next_ids = torch.full((1, 1), bos_token_id, dtype=torch.long)
+            step_mask = torch.ones(1, past[0].shape[2] + 1, dtype=torch.long)
+            torch.onnx.export(
+                decoder_wrapper,
+                (next_ids, step_mask, image_embeds, *past),
+                step_path,
+                input_names=['input_ids', 'attention_mask', 'encoder_hidden_states'] + past_names,
+                output_names=['logits'] + present_names,
+                dynamic_axes={
+                    'input_ids': {0: 'batch_size'},
+                    'attention_mask': {0: 'batch_size', 1: 'total_sequence'},
+                    'encoder_hidden_states': {0: 'batch_size'},
+                    'logits': {0: 'batch_size'},
+                    **cache_axes(past_names),
+                    **cache_axes(present_names)
+                },
+                opset_version=14,
+                do_constant_folding=True
+            )
+            logging.info(f"Successfully converted decoder step graph to {step_path}")
+            return prefill_path, step_path
+
+        except Exception as e:
+            logging.error(f"Failed to convert decoder with past: {str(e)}")
+            raise
+
     def convert_vqa_to_onnx(self):
         """Convert VQA model to ONNX"""
         try:
@@ -155,46 +348,7 @@ class ModelConverter:
                 max_length=seq_length,
                 truncation=True
             )
-
-            # Create VQA model wrapper
-            class VQAWrapper(torch.nn.Module):
-                def __init__(self, model):
-                    super().__init__()
-                    self.vilt = model.vilt
-                    self.classifier = model.classifier
-                    self.image_size = 384
-                    self.patch_size = 32
-                    self.num_patches = (self.image_size // self.patch_size) ** 2
-
-                def forward(self, pixel_values, input_ids, attention_mask):
-                    # Pre-compute image patches
-                    batch_size = pixel_values.shape[0]
-                    image_embeddings = self.vilt.embeddings.patch_embeddings(pixel_values)
-                    image_embeddings = image_embeddings.flatten(2).transpose(1, 2)
-                    
-                    # Get text embeddings with fixed sequence length
-                    text_embeddings = self.vilt.embeddings.text_embeddings(
-                        input_ids=input_ids
-                    )
-                    
-                    # Combine embeddings
-                    embeddings = torch.cat([image_embeddings, text_embeddings], dim=1)
-                    
-                    # Create extended attention mask
-                    extended_attention_mask = torch.cat([
-                        torch.ones(batch_size, self.num_patches, device=attention_mask.device),
-                        attention_mask
-                    ], dim=1)
-                    
-                    # Forward through transformer and classifier
-                    outputs = self.vilt.encoder(
-                        embeddings,
-                        attention_mask=extended_attention_mask,
-                        return_dict=True
-                    )
-                    logits = self.classifier(outputs.last_hidden_state[:, 0, :])
-                    return logits
-
+            
             # Create wrapper instance
             vqa_wrapper = VQAWrapper(self.vqa_model)
             vqa_wrapper.eval()
@@ -210,28 +364,164 @@ class ModelConverter:
                 vqa_wrapper,
                 (
                     inputs['pixel_values'],
+                    inputs['pixel_mask'],
                     inputs['input_ids'],
                     inputs['attention_mask']
                 ),
                 vqa_path,
-                input_names=['pixel_values', 'input_ids', 'attention_mask'],
+                input_names=['pixel_values', 'pixel_mask', 'input_ids', 'attention_mask'],
                 output_names=['logits'],
                 dynamic_axes={
                     'pixel_values': {0: 'batch_size'},
+                    'pixel_mask': {0: 'batch_size'},
                     'input_ids': {0: 'batch_size'},
-                    'attention_mask': {0: 'batch_size'}
+                    'attention_mask': {0: 'batch_size'},
+                    'logits': {0: 'batch_size'}
                 },
                 opset_version=11,
                 do_constant_folding=True
             )
             
             logging.info(f"Successfully converted VQA model to {vqa_path}")
+            self.check_vqa_parity(vqa_path)
             return vqa_path
             
         except Exception as e:
             logging.error(f"Failed to convert VQA model: {str(e)}")
             raise
 
+    def check_vqa_parity(self, vqa_path, batch_size=3, tolerance=1e-3):
+        """
+        Compare the exported VQA graph's logits with eager ViltForQuestionAnswering
+        on the same inputs (a batch of random 384x384 images and questions);
+        raises if they differ by more than tolerance
+        """
+        import onnxruntime as ort
+
+        questions = ["What is in the image?", "How many people are there?", "Is it outdoors?"]
+        tokens = self.vqa_processor.tokenizer(
+            (questions * batch_size)[:batch_size],
+            return_tensors="pt",
+            padding='max_length',
+            max_length=40,
+            truncation=True
+        )
+        # Normalized pixels of the exported graph's unpadded 384x384 images
+        pixel_values = torch.randn(batch_size, 3, 384, 384)
+        pixel_mask = torch.ones((batch_size, 384, 384), dtype=torch.long)
+        with torch.no_grad():
+            expected = self.vqa_model(
+                input_ids=tokens['input_ids'],
+                attention_mask=tokens['attention_mask'],
+                pixel_values=pixel_values,
+                pixel_mask=pixel_mask
+            ).logits.numpy()
+
+        session = ort.InferenceSession(str(vqa_path), providers=["CPUExecutionProvider"])
+        actual = session.run(["logits"], {
+            "pixel_values": pixel_values.numpy(),
+            "pixel_mask": pixel_mask.numpy(),
+            "input_ids": tokens['input_ids'].numpy(),
+            "attention_mask": tokens['attention_mask'].numpy()
+        })[0]
+
+        diff = float(abs(expected - actual).max())
+        same_answers = (expected.argmax(-1) == actual.argmax(-1)).all()
+        logging.info(f"VQA graph vs eager ViLT: max abs logit diff {diff:.2e}, same answers: {same_answers}")
+        if diff > tolerance or not same_answers:
+            raise ValueError(f"Exported VQA graph does not match eager ViLT (max abs logit diff {diff:.2e})")
+        return diff
+
+    def _dummy_scene_inputs(self):
+        return self.scene_processor(
+            images=torch.rand(3, 224, 224),
+            return_tensors="pt",
+            do_rescale=False
+        )
+
+    def convert_scene_to_onnx(self):
+        """Convert ResNet-50 scene detection model to ONNX"""
+        try:
+            scene_path = self.output_dir / "scene_model.onnx"
+            inputs = self._dummy_scene_inputs()
+
+            # Create wrapper instance
+            scene_wrapper = SceneWrapper(self.scene_model)
+            scene_wrapper.eval()
+
+            # Export to ONNX
+            torch.onnx.export(
+                scene_wrapper,
+                inputs['pixel_values'],
+                scene_path,
+                input_names=['pixel_values'],
+                output_names=['logits'],
+                dynamic_axes={
+                    'pixel_values': {0: 'batch_size'},
+                    'logits': {0: 'batch_size'}
+                },
+                opset_version=11,
+                do_constant_folding=True
+            )
+
+            logging.info(f"Successfully converted scene model to {scene_path}")
+            return scene_path
+
+        except Exception as e:
+            logging.error(f"Failed to convert scene model: {str(e)}")
+            raise
+
+    def convert_to_torchscript(self):
+        """
+        Trace the vision, language, VQA and scene wrappers to TorchScript
+        (same inputs/outputs as the ONNX graphs, saved next to them as .pt)
+        """
+        try:
+            vision_inputs = self.blip_processor(
+                images=torch.rand(1, 3, 224, 224),
+                return_tensors="pt",
+                do_rescale=False
+            )
+            text_inputs = self.blip_processor(text=["a photo of"], return_tensors="pt", padding=True)
+            vqa_inputs = self.vqa_processor(
+                images=torch.rand(1, 3, 384, 384),
+                text="What is in the image?",
+                return_tensors="pt",
+                padding='max_length',
+                max_length=40,
+                truncation=True
+            )
+            traces = {
+                "blip_vision.pt": (VisionWrapper(self.blip_model), (vision_inputs['pixel_values'],)),
+                "language_model.pt": (
+                    LanguageWrapper(self.blip_model),
+                    (text_inputs['input_ids'], text_inputs['attention_mask'], self._dummy_image_embeds())
+                ),
+                "vqa_model.pt": (
+                    VQAWrapper(self.vqa_model),
+                    (
+                        vqa_inputs['pixel_values'], vqa_inputs['pixel_mask'],
+                        vqa_inputs['input_ids'], vqa_inputs['attention_mask']
+                    )
+                ),
+                "scene_model.pt": (SceneWrapper(self.scene_model), (self._dummy_scene_inputs()['pixel_values'],)),
+            }
+
+            paths = []
+            for filename, (wrapper, example_inputs) in traces.items():
+                wrapper.eval()
+                with torch.no_grad():
+                    traced = torch.jit.trace(wrapper, example_inputs, check_trace=False)
+                path = self.output_dir / filename
+                torch.jit.save(traced, str(path))
+                logging.info(f"Successfully traced {filename} to {path}")
+                paths.append(path)
+            return paths
+
+        except Exception as e:
+            logging.error(f"Failed to convert to TorchScript: {str(e)}")
+            raise
+
     def verify_model(self, model_path):
         """Verify that an ONNX model is valid"""
         try:
@@ -241,4 +531,22 @@ class ModelConverter:
             return True
         except Exception as e:
             logging.error(f"Model verification failed: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def quantize(self, calibration_dir="images/test_images", mode="static", max_images=None):
+        """
+        Quantize the exported graphs to INT8 in models/int8. Static INT8 is
+        calibrated on real images from calibration_dir; mode="dynamic" skips
+        calibration. Writes models/int8/quantization_report.json.
+        """
+        try:
+            return quantize_models(
+                self.output_dir,
+                self.output_dir / "int8",
+                calibration_dir,
+                mode=mode,
+                max_images=max_images
+            )
+        except Exception as e:
+            logging.error(f"Quantization failed: {str(e)}")
+            raise
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Questions used to calibrate the VQA graph and check answer agreement
+CALIBRATION_QUESTIONS = [
+    "What is in the foreground?",
+    "Are there any people?",
+    "What colors are prominent?",
+    "Is it indoor or outdoor?",
+]
+
+
+def load_calibration_images(image_dir, max_images=None):
+    """Load the RGB images in a directory (sorted by name)"""
+    names = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not names:
+        raise ValueError(f"No calibration images found in {image_dir}")
+    return [Image.open(os.path.join(image_dir, name)).convert("RGB") for name in names[:max_images]]
+
+
+class FeedListReader(CalibrationDataReader):
+    """Calibration reader over a precomputed list of input feeds"""
+
+    def __init__(self, feeds):
+        self.feeds = feeds
+        self._iter = iter(feeds)
+
+    def get_next(self):
+        return next(self._iter, None)
+
+    def rewind(self):
+        self._iter = iter(self.feeds)
+
+
+def caption_feeds(images, model_dir):
+    """Feeds for the BLIP vision encoder and text decoder, from the FP32 graphs"""
+    from onnx_captioning import OnnxBlipCaptioner
+
+    captioner = OnnxBlipCaptioner(model_dir=str(model_dir))
+    vision_feeds, decoder_feeds = [], []
+    for image in images:
+        pixel_values = captioner.processor(images=image, return_tensors="np")["pixel_values"].astype(np.float32)
+        vision_feeds.append({"pixel_values": pixel_values})
+        # Calibrate the decoder on the caption it actually generates for this image
+        image_embeds = captioner.encode_image(pixel_values)
+        output_ids = captioner.generate(pixel_values)
+        decoder_feeds.append({
+            "input_ids": output_ids,
+            "attention_mask": np.ones_like(output_ids),
+            "encoder_hidden_states": image_embeds
+        })
+    return vision_feeds, decoder_feeds
+
+
+def vqa_feeds(images, model_dir):
+    """Feeds for the ViLT VQA graph, one per image/question pair"""
+    from onnx_vqa import OnnxViltVQA
+
+    vqa = OnnxViltVQA(model_dir=str(model_dir))
+    return [vqa.preprocess(image, question) for image in images for question in CALIBRATION_QUESTIONS]
+
+
+def quantize_graph(model_path, output_path, feeds=None, mode="static"):
+    """
+    Quantize one ONNX graph to INT8. Static quantization (QDQ, calibrated on
+    the given feeds) is used when possible; dynamic quantization is the
+    fallback when no feeds are given or static quantization fails.
+    Returns the mode actually used.
+    """
+    if mode == "static" and feeds:
+        try:
+            quantize_static(
+                str(model_path),
+                str(output_path),
+                FeedListReader(feeds),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True
+            )
+            return "static"
+        except Exception as e:
+            logging.warning(f"Static quantization of {model_path} failed, falling back to dynamic: {str(e)}")
+
+    quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QInt8)
+    return "dynamic"
+
+
+def _size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def _latency_ms(model_path, feeds, runs=5):
+    from onnx_sessions import sessions
+
+    session = sessions.get(str(model_path))
+    session.run(None, feeds[0])  # warm-up
+    start = time.perf_counter()
+    for i in range(runs):
+        session.run(None, feeds[i % len(feeds)])
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def caption_agreement(images, fp32_dir, int8_dir):
+    """Fraction of images whose INT8 caption matches the FP32 caption"""
+    from onnx_captioning import OnnxBlipCaptioner
+
+    fp32, int8 = OnnxBlipCaptioner(model_dir=str(fp32_dir)), OnnxBlipCaptioner(model_dir=str(int8_dir))
+    same = sum(fp32.caption(image) == int8.caption(image) for image in images)
+    return same / len(images)
+
+
+def vqa_agreement(images, fp32_dir, int8_dir):
+    """Fraction of image/question pairs whose INT8 top-1 answer matches FP32"""
+    from onnx_vqa import OnnxViltVQA
+
+    fp32, int8 = OnnxViltVQA(model_dir=str(fp32_dir)), OnnxViltVQA(model_dir=str(int8_dir))
+    pairs = [(image, question) for image in images for question in CALIBRATION_QUESTIONS]
+    same = sum(
+        fp32.predict(image, question).argmax() == int8.predict(image, question).argmax()
+        for image, question in pairs
+    )
+    return same / len(pairs)
+
+
+def quantize_models(model_dir, output_dir, calibration_dir, mode="static", max_images=None):
+    """
+    Quantize every exported graph found in model_dir into output_dir (same file
+    names, so the ONNX backends can load output_dir directly) and write
+    quantization_report.json comparing size, latency and output agreement.
+    """
+    from config import ONNX_CONFIG
+
+    model_dir, output_dir = Path(model_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    images = load_calibration_images(calibration_dir, max_images)
+    logging.info(f"Calibrating on {len(images)} images from {calibration_dir}")
+
+    feeds = {}
+    vision_name, decoder_name = ONNX_CONFIG["caption_vision_model"], ONNX_CONFIG["caption_decoder_model"]
+    has_caption = (model_dir / vision_name).exists() and (model_dir / decoder_name).exists()
+    has_vqa = (model_dir / ONNX_CONFIG["vqa_model"]).exists()
+    if has_caption:
+        feeds[vision_name], feeds[decoder_name] = caption_feeds(images, model_dir)
+    if has_vqa:
+        feeds[ONNX_CONFIG["vqa_model"]] = vqa_feeds(images, model_dir)
+
+    # KV-cache graphs are quantized dynamically (no calibration feeds for the past tensors)
+    kv_graphs = [ONNX_CONFIG["caption_decoder_prefill_model"], ONNX_CONFIG["caption_decoder_step_model"]]
+
+    report = {"calibration_dir": str(calibration_dir), "calibration_images": len(images), "graphs": {}}
+    for name in list(feeds) + [g for g in kv_graphs if (model_dir / g).exists()]:
+        source, target = model_dir / name, output_dir / name
+        logging.info(f"Quantizing {source} -> {target}")
+        used_mode = quantize_graph(source, target, feeds.get(name), mode=mode if name in feeds else "dynamic")
+        entry = {
+            "mode": used_mode,
+            "fp32_size_mb": round(_size_mb(source), 1),
+            "int8_size_mb": round(_size_mb(target), 1)
+        }
+        if name in feeds:
+            entry["fp32_latency_ms"] = round(_latency_ms(source, feeds[name]), 1)
+            entry["int8_latency_ms"] = round(_latency_ms(target, feeds[name]), 1)
+        report["graphs"][name] = entry
+
+    if has_caption:
+        report["caption_agreement"] = caption_agreement(images, model_dir, output_dir)
+    if has_vqa:
+        report["vqa_top1_agreement"] = vqa_agreement(images, model_dir, output_dir)
+
+    report_path = output_dir / "quantization_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, entry in report["graphs"].items():
+        logging.info(
+            f"{name} [{entry['mode']}]: {entry['fp32_size_mb']} MB -> {entry['int8_size_mb']} MB"
+            + (f", {entry['fp32_latency_ms']} ms -> {entry['int8_latency_ms']} ms" if "int8_latency_ms" in entry else "")
+        )
+    if has_caption:
+        logging.info(f"Caption text agreement: {report['caption_agreement']:.0%}")
+    if has_vqa:
+        logging.info(f"VQA top-1 answer agreement: {report['vqa_top1_agreement']:.0%}")
+    logging.info(f"Quantization report written to {report_path}")
+    return report_path
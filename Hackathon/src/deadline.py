@@ -0,0 +1,48 @@
+#deadline.py
+
+"""
+Latency budgets for caption generation. A budget in milliseconds becomes an
+absolute deadline when the request is made, so time spent waiting for a
+micro-batch counts against it. Decoding stops each image at its deadline and
+the caption generated so far is returned, flagged as truncated: for real-time
+narration a slightly shorter caption on time beats a full one late.
+"""
+
+import time
+
+import numpy as np
+
+
+def deadline_after(budget_ms):
+    """perf_counter() time budget_ms from now, or None for no budget"""
+    if budget_ms is None:
+        return None
+    return time.perf_counter() + budget_ms / 1000
+
+
+def expired(deadlines):
+    """Boolean array of which deadlines have passed (None never does)"""
+    now = time.perf_counter()
+    return np.array([deadline is not None and now >= deadline for deadline in deadlines], dtype=bool)
+
+
+class DeadlineCriteria:
+    """
+    Stopping criterion for transformers' generate() that ends each row of
+    the batch at its deadline. truncated[i] is set for rows stopped before
+    they produced the end-of-caption token.
+    """
+
+    def __init__(self, deadlines, eos_token_id):
+        self.deadlines = list(deadlines)
+        self.eos_token_id = eos_token_id
+        self.truncated = np.zeros(len(self.deadlines), dtype=bool)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        done = expired(self.deadlines)
+        if done.any():
+            ended = (input_ids == self.eos_token_id).any(-1).cpu().numpy()
+            self.truncated |= done & ~ended
+        return torch.as_tensor(done, device=input_ids.device)
@@ -0,0 +1,98 @@
+#embedding_cache.py
+
+"""
+Per-image cache for the image side of the models. Users usually ask several
+questions about one photo, so the image tensors are computed once per image
+(keyed by a hash of the file contents) and reused by follow-up questions.
+Least recently used entries are evicted above the entry and memory limits.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config import EMBEDDING_CACHE_CONFIG
+
+
+def image_key(image_path):
+    """Content hash of an image file (the same photo saved twice shares one entry)"""
+    digest = hashlib.sha1()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _nbytes(value):
+    """Memory held by a tensor, numpy array, or dict/tuple of them"""
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if hasattr(value, "element_size"):  # torch.Tensor
+        return value.numel() * value.element_size()
+    return getattr(value, "nbytes", 0)
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries=EMBEDDING_CACHE_CONFIG["max_entries"],
+                 max_mb=EMBEDDING_CACHE_CONFIG["max_mb"]):
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = OrderedDict()  # key -> (value, nbytes), oldest first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            # Computed outside the lock so other images are not blocked
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared cache for this process
+embedding_cache = EmbeddingCache()
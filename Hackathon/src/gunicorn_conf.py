@@ -0,0 +1,29 @@
+# gunicorn_conf.py
+# Prefork serving for server.py with model weights shared between workers:
+#   cd Hackathon/src && gunicorn -c gunicorn_conf.py server:app
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import BATCHING_CONFIG, PREFORK_CONFIG
+
+# Tells server.py to load the models synchronously in the master before forking
+os.environ["SNAPSENSE_PREFORK"] = "1"
+
+bind = PREFORK_CONFIG["bind"]
+workers = PREFORK_CONFIG["workers"] or os.cpu_count() or 1
+# A sync worker serves one request at a time, so its micro-batches would
+# always hold one request; threads let a full batch gather in each worker
+worker_class = "gthread"
+threads = PREFORK_CONFIG["threads"] or (
+    max(BATCHING_CONFIG["max_batch_size"].values()) if BATCHING_CONFIG["enabled"] else 1
+)
+preload_app = True  # import server.py (and load the weights) once in the master
+timeout = PREFORK_CONFIG["timeout"]
+
+
+def post_fork(server, worker):
+    from prefork import init_worker
+    init_worker(workers, timeout)
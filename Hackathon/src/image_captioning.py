@@ -1,36 +1,25 @@
-import cv2
-import numpy as np
-import onnxruntime
-from transformers import AutoTokenizer, BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
 import sys
 import os
+from config import CAPTION_CONFIG
+from deadline import DeadlineCriteria, deadline_after
+from image_context import image_context, load_image
+from inference_backends import model_id
+from micro_batching import get_batcher
+from model_registry import registry
+from preprocessing import batch_buffer, preprocess
+from result_cache import result_cache
 
 
 def preprocess_image(image_path):
+    """BLIP pixel values (1, 3, 384, 384) for an image file, as the vision model expects"""
     print(f"Attempting to load image from: {image_path}")
 
     # Check if file exists
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Image file not found: {image_path}")
 
-    # Read and resize the image to 256x256 pixels
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"Unable to load image from {image_path}")
-
-    print(f"Original image shape: {image.shape}")
-    image = cv2.resize(image, (256, 256))
-    print(f"Resized image shape: {image.shape}")
-
-    # Normalize pixel values to [0,1] and convert to float32
-    image = image.astype(np.float32) / 255.0
-
-    # Convert from (H, W, C) to (C, H, W)
-    image = np.transpose(image, (2, 0, 1))
-
-    # Add batch dimension
-    image = np.expand_dims(image, axis=0)
+    image = preprocess("blip", [load_image(image_path)])
     print(f"Final preprocessed image shape: {image.shape}")
     return image
 
@@ -45,54 +34,100 @@ def run_vision_model(image_np, session):
     return features
 
 
-def generate_caption_with_blip(image_path):
+def caption_images(contexts, model_name, backend, deadlines):
+    """
+    Captions for a batch of ImageContexts, generated together in one batch.
+    Each image is decoded until its perf_counter() deadline (None for no
+    limit); returns (caption, truncated) pairs.
+    """
+    processor, model = registry.get(model_name)
+    # BLIP resizes every image to 384x384, so the batch needs no padding; it is
+    # written into this thread's reusable buffer, used only by this generate call
+    images = [context.image for context in contexts]
+    pixel_values = preprocess("blip", images, out=batch_buffer("blip", len(images), 384, 384))
+    if backend != "torch":
+        # Exported graphs on the configured inference engine
+        return model.caption_pixels_within(pixel_values, deadlines)
+
+    import torch  # deferred so importing the module stays cheap
+    from transformers import StoppingCriteriaList
+
+    inputs = {"pixel_values": torch.from_numpy(pixel_values)}
+    criteria = DeadlineCriteria(deadlines, model.config.text_config.sep_token_id)
+    generate_kwargs = {}
+    if any(deadline is not None for deadline in deadlines):
+        # Greedy decoding is the cheapest setting; each row stops at its own deadline
+        generate_kwargs = {"num_beams": 1, "stopping_criteria": StoppingCriteriaList([criteria])}
+    with torch.no_grad():
+        outputs = model.generate(**inputs, **generate_kwargs)
+    captions = processor.batch_decode(outputs, skip_special_tokens=True)
+    return list(zip(captions, criteria.truncated.tolist()))
+
+
+def caption_image_within(image, budget_ms, model_name=None, backend=CAPTION_CONFIG["backend"]):
+    """
+    Caption one image (path or ImageContext) within a latency budget in
+    milliseconds, counted from now (None for no limit). Captions of images
+    seen before come from the result cache; others go through the caption
+    model's micro-batching queue, so concurrent requests share a forward
+    pass. Returns (caption, truncated), truncated when decoding was cut
+    short at the deadline.
+    """
+    deadline = deadline_after(budget_ms)
+    model_name = model_name or model_id("caption", backend, CAPTION_CONFIG["model_name"])
+    context = image_context(image)
+    caption = result_cache.get("caption", model_name, context.key)
+    if caption is not None:
+        return caption, False
+
+    # Decoded here, so a corrupt upload fails its own request and not the batch
+    context.image
+    batcher = get_batcher("caption", model_name, lambda items: caption_images(
+        [context for context, _ in items], model_name, backend, [deadline for _, deadline in items]
+    ))
+    caption, truncated = batcher((context, deadline))
+    # Only complete captions are kept, so a later request can get the full one
+    if not truncated:
+        result_cache.put("caption", model_name, context.key, caption)
+    return caption, truncated
+
+
+def caption_image(image, model_name=None, backend=CAPTION_CONFIG["backend"], budget_ms=None):
+    """Caption one image (see caption_image_within), without the truncated flag"""
+    caption, truncated = caption_image_within(image, budget_ms, model_name, backend)
+    if truncated:
+        print(f"Caption cut short at the {budget_ms} ms budget: {caption}")
+    return caption
+
+
+def generate_caption_with_blip(image, budget_ms=None):
     """
     Generate a caption for the given image using the BLIP model.
 
     Args:
-        image_path (str): Path to the input image.
+        image (str or ImageContext): Path to the input image, or the
+            request's decoded image.
+        budget_ms (float): Optional latency budget; decoding stops at it and
+            the partial caption is returned.
 
     Returns:
         str: Generated caption for the image.
     """
-    # Load the pre-trained BLIP model and processor
-    processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-    model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
-    # Load and preprocess the image
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(image, return_tensors="pt")
-
-    # Generate the caption
-    outputs = model.generate(**inputs)
-    caption = processor.decode(outputs[0], skip_special_tokens=True)
-    return caption
+    # The shared BLIP model is loaded once per process; concurrent calls are batched
+    return caption_image(image, budget_ms=budget_ms)
 
 
 def main(image_path):
     try:
         print(f"\nStarting image captioning for: {image_path}")
 
-        # Check for models
-        vision_model_path = "models/vision_model.onnx"
-        language_model_path = "models/language_model.onnx"
-
-        if not os.path.exists(vision_model_path):
-            raise FileNotFoundError(f"Vision model not found at: {vision_model_path}")
-        if not os.path.exists(language_model_path):
-            raise FileNotFoundError(f"Language model not found at: {language_model_path}")
-
-        # Preprocess the input image
-        image_np = preprocess_image(image_path)
-
-        # Load and run vision model
-        print("\nLoading vision model...")
-        vision_session = onnxruntime.InferenceSession(vision_model_path)
-        features = run_vision_model(image_np, vision_session)
+        # Caption with the exported BLIP vision encoder and text decoder on ONNX Runtime
+        from onnx_captioning import OnnxBlipCaptioner
+        print("\nLoading ONNX models...")
+        captioner = OnnxBlipCaptioner()
 
-        # Generate caption using BLIP
-        print("\nGenerating caption using BLIP...")
-        caption = generate_caption_with_blip(image_path)
+        print("\nGenerating caption with ONNX Runtime...")
+        caption = captioner.caption(Image.open(image_path).convert("RGB"))
         print("\nGenerated Caption:")
         print(caption)
 
@@ -0,0 +1,93 @@
+#image_context.py
+
+"""
+One uploaded image, decoded once per request and shared by every model in
+the pipeline. The RGB image is decoded on first use, and model input
+tensors (ViLT pixels and mask, ResNet 224x224 pixels) are derived from it
+on first use and kept for the rest of the request; BLIP pixels go straight
+into the caption batch (see preprocessing.py). Caption, scene detection and
+every VQA question read the JPEG once instead of once per model and
+question. Large JPEGs (12 MP phone photos) are decoded straight to reduced
+resolution, since no model needs more than 384 pixels.
+
+Handlers take an ImageContext or a plain path (wrapped with image_context).
+"""
+
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import IMAGE_DECODE_CONFIG
+from embedding_cache import image_key
+
+
+def load_image(path, draft=IMAGE_DECODE_CONFIG["draft"], min_size=IMAGE_DECODE_CONFIG["min_size"]):
+    """
+    Decode an image to RGB. JPEGs are scaled down while decoding (libjpeg's
+    DCT scaling through PIL's draft mode) as far as keeps both sides at least
+    min_size, which cuts decode time and memory by up to 64x for large photos.
+    """
+    with Image.open(path) as image:
+        if draft and image.format == "JPEG":
+            image.draft("RGB", (min_size, min_size))
+        return image.convert("RGB")
+
+
+class ImageContext:
+    def __init__(self, path=None, image=None):
+        if path is None and image is None:
+            raise ValueError("ImageContext needs a path or an image")
+        self.path = path
+        self._image = image.convert("RGB") if image is not None else None
+        self._key = None
+        self._tensors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def image(self):
+        """The decoded RGB PIL image"""
+        # Parallel stages ask for it at the same time; decode only once
+        with self._lock:
+            if self._image is None:
+                self._image = load_image(self.path)
+            return self._image
+
+    @property
+    def rgb(self):
+        """The decoded image as a (height, width, 3) uint8 array"""
+        return np.asarray(self.image)
+
+    @property
+    def key(self):
+        """Content hash, for caches shared across requests"""
+        if self._key is None:
+            if self.path is not None:
+                self._key = image_key(self.path)
+            else:
+                import hashlib
+                self._key = hashlib.sha1(self.image.tobytes()).hexdigest()
+        return self._key
+
+    def tensor(self, name, compute):
+        """
+        Model input derived from the image, computed once per context:
+        compute(image) is called on the first request for name
+        """
+        value = self._tensors.get(name)
+        if value is None:
+            # Computed outside the lock so other models' inputs are not blocked
+            value = self._tensors.setdefault(name, compute(self.image))
+        return value
+
+    def __repr__(self):
+        return f"ImageContext({self.path!r})"
+
+
+def image_context(image):
+    """ImageContext for a path, PIL image or existing context"""
+    if isinstance(image, ImageContext):
+        return image
+    if isinstance(image, Image.Image):
+        return ImageContext(image=image)
+    return ImageContext(image)
@@ -0,0 +1,193 @@
+#inference_backends.py
+
+"""
+Inference engines behind a common contract: run(inputs) -> outputs, where both
+are dicts of numpy arrays keyed by the graph's input/output names. The caption,
+VQA and scene pipelines only talk to this interface, so the engine can be
+switched per model in config.py without touching handler code.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from config import ORT_SESSION_CONFIG
+
+# numpy dtype of each ONNX tensor type, for bound output buffers
+ORT_TYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(int64)": np.int64,
+    "tensor(int32)": np.int32,
+    "tensor(bool)": np.bool_,
+}
+
+# File extension of the exported model for each engine
+MODEL_EXTENSIONS = {
+    "onnx": ".onnx",
+    "torchscript": ".pt",
+    "dlc": ".dlc",
+}
+
+
+class InferenceBackend:
+    engine = None
+
+    def __init__(self, input_names, output_names):
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+
+    def run(self, inputs, bind_slot=None):
+        """
+        Run the model on a dict of numpy arrays, returning a dict of numpy arrays.
+        Engines that support it write the outputs into the calling thread's
+        long-lived buffers for bind_slot (any hashable) instead of new arrays:
+        those outputs stay valid only until the thread's next run with the
+        same slot, so they must not be kept or handed to other threads.
+        """
+        raise NotImplementedError
+
+    def _named_outputs(self, outputs):
+        return dict(zip(self.output_names, outputs))
+
+
+class TorchBackend(InferenceBackend):
+    """Eager PyTorch module called with the inputs as keyword arguments"""
+    engine = "torch"
+
+    def __init__(self, module, input_names, output_names):
+        super().__init__(input_names, output_names)
+        self.module = module
+
+    def run(self, inputs, bind_slot=None):
+        import torch
+
+        with torch.no_grad():
+            outputs = self.module(**{name: torch.from_numpy(inputs[name]) for name in self.input_names})
+        if hasattr(outputs, "to_tuple"):
+            outputs = outputs.to_tuple()
+        elif not isinstance(outputs, (tuple, list)):
+            outputs = (outputs,)
+        return self._named_outputs(output.numpy() for output in outputs)
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Traced TorchScript module (convert_models.py --torchscript) called positionally"""
+    engine = "torchscript"
+
+    def __init__(self, model_path, input_names, output_names):
+        import torch
+
+        super().__init__(input_names, output_names)
+        self.module = torch.jit.load(model_path)
+        self.module.eval()
+
+    def run(self, inputs, bind_slot=None):
+        import torch
+
+        with torch.no_grad():
+            outputs = self.module(*[torch.from_numpy(inputs[name]) for name in self.input_names])
+        if not isinstance(outputs, (tuple, list)):
+            outputs = (outputs,)
+        return self._named_outputs(output.numpy() for output in outputs)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    ONNX Runtime session from the shared session manager. With bind_slot,
+    inputs are bound in place and outputs are written through I/O binding
+    into per-thread buffers that only grow, so steady-state runs (the vision
+    encoder, every decode step) allocate nothing. Output shapes are learned
+    from the first plain run for each set of input shapes.
+    """
+    engine = "onnx"
+
+    def __init__(self, model_path, input_names=None, output_names=None, io_binding=ORT_SESSION_CONFIG["io_binding"]):
+        from onnx_sessions import sessions
+
+        self.session = sessions.get(model_path)
+        super().__init__(
+            input_names or [i.name for i in self.session.get_inputs()],
+            output_names or [o.name for o in self.session.get_outputs()]
+        )
+        self.io_binding = io_binding
+        self._output_types = {o.name: ORT_TYPES.get(o.type, np.float32) for o in self.session.get_outputs()}
+        self._output_shapes = {}  # input shapes -> {output name: shape}
+        self._buffers = threading.local()
+
+    def run(self, inputs, bind_slot=None):
+        feed = {name: inputs[name] for name in self.input_names}
+        if bind_slot is None or not self.io_binding:
+            return self._named_outputs(self.session.run(self.output_names, feed))
+
+        signature = tuple(feed[name].shape for name in self.input_names)
+        shapes = self._output_shapes.get(signature)
+        if shapes is None:
+            outputs = self._named_outputs(self.session.run(self.output_names, feed))
+            self._output_shapes[signature] = {name: output.shape for name, output in outputs.items()}
+            return outputs
+
+        binding = self.session.io_binding()
+        # Contiguous CPU arrays of the graph's dtype are read in place, without a copy
+        feed = {name: np.ascontiguousarray(array) for name, array in feed.items()}
+        for name, array in feed.items():
+            binding.bind_cpu_input(name, array)
+        outputs = {}
+        for name in self.output_names:
+            buffer = self._output_buffer(name, bind_slot, shapes[name])
+            binding.bind_output(name, "cpu", 0, buffer.dtype.type, buffer.shape, buffer.ctypes.data)
+            outputs[name] = buffer
+        self.session.run_with_iobinding(binding)
+        return outputs
+
+    def _output_buffer(self, name, slot, shape):
+        """View of this thread's buffer for (output, slot), grown to fit shape"""
+        buffers = self._buffers.__dict__.setdefault("arrays", {})
+        size = int(np.prod(shape))
+        flat = buffers.get((name, slot))
+        if flat is None or flat.size < size:
+            flat = buffers[(name, slot)] = np.empty(size, dtype=self._output_types[name])
+        return flat[:size].reshape(shape)
+
+
+class DlcBackend(InferenceBackend):
+    """
+    Placeholder for Qualcomm Neural Processing SDK models (.dlc converted
+    from the ONNX graphs with onnx_to_dlc, see doc.txt). Not implemented:
+    the "dlc" engine name is reserved, but loading always fails.
+    """
+    engine = "dlc"
+
+    def __init__(self, model_path, input_names, output_names):
+        raise NotImplementedError(
+            f"Cannot load {model_path}: the dlc (Qualcomm Neural Processing SDK) runtime is not supported yet; "
+            "use the onnx or torchscript backend"
+        )
+
+
+def create_backend(engine, model_path, input_names=None, output_names=None):
+    """
+    Create an engine for an exported model. model_path may use any extension;
+    the engine's own file (.onnx, .pt or .dlc) next to it is loaded.
+    """
+    if engine not in MODEL_EXTENSIONS:
+        raise ValueError(f"Unknown inference engine: {engine} (expected one of {sorted(MODEL_EXTENSIONS)})")
+    path = os.path.splitext(model_path)[0] + MODEL_EXTENSIONS[engine]
+    if engine == "dlc":
+        return DlcBackend(path, input_names, output_names)  # not supported yet, raises
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{engine} model not found at: {path} (run convert_models.py)")
+
+    if engine == "onnx":
+        return OnnxRuntimeBackend(path, input_names, output_names)
+    return TorchScriptBackend(path, input_names, output_names)
+
+
+def exported_model_exists(engine, model_path):
+    return os.path.exists(os.path.splitext(model_path)[0] + MODEL_EXTENSIONS[engine])
+
+
+def model_id(task, backend, model_name):
+    """Registry id for a task: the Hugging Face name for eager torch, else '<engine>/<task>'"""
+    return model_name if backend == "torch" else f"{backend}/{task}"
@@ -0,0 +1,140 @@
+#micro_batching.py
+
+"""
+Dynamic micro-batching. Each model gets a request queue served by one worker
+thread: the first request waits up to max_wait_ms for others to arrive, then
+up to max_batch_size requests run as one padded batch and each caller's
+future is resolved with its own result. Under concurrent load this turns many
+batch-1 forward passes into a few larger ones. Callers decode and validate
+their inputs before queueing them; if a batch still fails, its requests are
+retried one at a time so only the bad request gets the error.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from config import BATCHING_CONFIG, STAGE_CONFIG
+from stage_executor import limit_threads
+
+
+class MicroBatcher:
+    def __init__(self, name, run_batch, max_batch_size=8, max_wait_ms=None,
+                 enabled=BATCHING_CONFIG["enabled"], threads=None):
+        """
+        run_batch takes a list of request items and returns one result per item.
+        threads caps torch intra-op threads on the worker thread.
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.threads = threads
+        self.max_wait = (BATCHING_CONFIG["max_wait_ms"] if max_wait_ms is None else max_wait_ms) / 1000
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._batch_sizes = Counter()
+        self._queue_wait_total = 0.0
+
+    def submit(self, item):
+        """Queue a request, returning a Future for its result"""
+        future = Future()
+        if not self.enabled:
+            self._run([(item, future, time.perf_counter())])
+            return future
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        """Queue a request and wait for its result"""
+        return self.submit(item).result()
+
+    def _ensure_worker(self):
+        # Started on first use, so prefork workers each get their own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._serve, name=f"batcher-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _serve(self):
+        limit_threads(self.threads)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch, retry=False):
+        started = time.perf_counter()
+        if not retry:
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._queue_wait_total += sum(started - queued for _, _, queued in batch)
+
+        try:
+            results = self._run_items([item for item, _, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            print(f"Batch of {len(batch)} failed on {self.name} ({e}), retrying one at a time")
+            for entry in batch:
+                self._run([entry], retry=True)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_items(self, items):
+        results = self.run_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} requests")
+        return results
+
+    def stats(self):
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            requests = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "enabled": self.enabled,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queued": self._queue.qsize(),
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_wait_ms": round(self._queue_wait_total * 1000 / requests, 1) if requests else 0.0
+            }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(task, model_name, run_batch):
+    """Shared batcher for a model ("caption" or "vqa" task), created on first use"""
+    with _batchers_lock:
+        if model_name not in _batchers:
+            max_batch_size = BATCHING_CONFIG["max_batch_size"][task]
+            # The model's forward passes run here, so the stage thread budget applies here
+            threads = STAGE_CONFIG["threads"].get(task)
+            _batchers[model_name] = MicroBatcher(model_name, run_batch, max_batch_size, threads=threads)
+        return _batchers[model_name]
+
+
+def batching_stats():
+    with _batchers_lock:
+        return {name: batcher.stats() for name, batcher in _batchers.items()}
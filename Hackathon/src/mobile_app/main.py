@@ -10,6 +10,8 @@ import os
 from plyer import camera, tts, vibrator
 import bluetooth
 import threading
+import queue
+import time
 from kivy.core.audio import SoundLoader
 
 class AccessibleImageApp(App):
@@ -89,26 +91,22 @@ class AccessibleImageApp(App):
                 
                 self.speak("Image sent. Waiting for description.")
                 
-                # Receive audio response
-                size_data = self.bluetooth_socket.recv(8)
-                audio_size = int.from_bytes(size_data, 'big')
+                # The description arrives in audio segments (caption first, then
+                # details); each one plays as soon as the previous one finishes
+                playback = queue.Queue()
+                player = threading.Thread(target=self.play_segments, args=(playback,))
+                player.start()
                 
-                audio_data = b''
-                while len(audio_data) < audio_size:
-                    chunk = self.bluetooth_socket.recv(min(4096, audio_size - len(audio_data)))
-                    if not chunk:
-                        break
-                    audio_data += chunk
-                
-                # Save and play audio
-                audio_path = 'description.mp3'
-                with open(audio_path, 'wb') as f:
-                    f.write(audio_data)
-                
-                # Play audio description
-                sound = SoundLoader.load(audio_path)
-                if sound:
-                    sound.play()
+                try:
+                    for index, audio_data in enumerate(self.receive_segments()):
+                        # Save and queue audio
+                        audio_path = f'description_{index}.mp3'
+                        with open(audio_path, 'wb') as f:
+                            f.write(audio_data)
+                        playback.put(audio_path)
+                finally:
+                    # Always stop the player, or a lost connection leaves it waiting forever
+                    playback.put(None)
                 
             else:
                 self.speak("Not connected to analysis server. Please try again.")
@@ -116,6 +114,36 @@ class AccessibleImageApp(App):
         except Exception as e:
             self.speak(f"Error: {str(e)}")
     
+    def receive_exact(self, size):
+        """Receive exactly size bytes from the server"""
+        data = b''
+        while len(data) < size:
+            chunk = self.bluetooth_socket.recv(min(4096, size - len(data)))
+            if not chunk:
+                raise ConnectionError("Connection to analysis server lost")
+            data += chunk
+        return data
+    
+    def receive_segments(self):
+        """Yield audio segments (8-byte size, then MP3 data) until a zero size ends the response"""
+        while True:
+            audio_size = int.from_bytes(self.receive_exact(8), 'big')
+            if audio_size == 0:
+                return
+            yield self.receive_exact(audio_size)
+    
+    def play_segments(self, playback):
+        """Play queued audio files one after another until None is queued"""
+        while True:
+            audio_path = playback.get()
+            if audio_path is None:
+                return
+            sound = SoundLoader.load(audio_path)
+            if sound:
+                sound.play()
+                while sound.state == 'play':
+                    time.sleep(0.1)
+    
     def connect_to_laptop(self):
         """Connect to laptop server with audio feedback"""
         try:
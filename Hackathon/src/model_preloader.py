@@ -0,0 +1,145 @@
+#model_preloader.py
+
+import threading
+import time
+
+from config import CAPTION_CONFIG, VQA_CONFIG, SCENE_CONFIG, PRELOAD_CONFIG
+from inference_backends import model_id
+from model_registry import registry
+from question_sets import question_sets
+
+
+def _dummy_image():
+    """Blank image at the resolution phones typically send (processors resize it like a real photo)"""
+    from PIL import Image
+    return Image.new("RGB", PRELOAD_CONFIG["warmup_image_size"], (127, 127, 127))
+
+
+def _warm_caption(processor, model):
+    import torch
+    inputs = processor(_dummy_image(), return_tensors="pt")
+    with torch.no_grad():
+        model.generate(**inputs)
+
+
+def _warm_exported_caption(processor, captioner):
+    captioner.caption(_dummy_image())
+
+
+def _warm_vqa(processor, model):
+    import torch
+    question_sets.compile(processor.tokenizer)
+    inputs = processor(_dummy_image(), PRELOAD_CONFIG["warmup_question"], return_tensors="pt")
+    with torch.no_grad():
+        model(**inputs)
+
+
+def _warm_exported_vqa(processor, vqa):
+    question_sets.compile(processor.tokenizer)
+    vqa.predict(_dummy_image(), PRELOAD_CONFIG["warmup_question"])
+
+
+def _warm_scene(processor, classifier):
+    classifier.classify(_dummy_image())
+
+
+def _model_id(task, config):
+    return model_id(task, config["backend"], config["model_name"])
+
+
+DEFAULT_WARMUPS = {
+    _model_id("caption", CAPTION_CONFIG): _warm_caption if CAPTION_CONFIG["backend"] == "torch" else _warm_exported_caption,
+    _model_id("vqa", VQA_CONFIG): _warm_vqa if VQA_CONFIG["backend"] == "torch" else _warm_exported_vqa,
+    _model_id("scene", SCENE_CONFIG): _warm_scene,
+}
+
+
+class ModelPreloader:
+    """
+    Loads and warms up models on background threads so entry points can start
+    serving (or report readiness) without blocking on imports and weights.
+    """
+
+    def __init__(self, warmups=None, model_registry=registry):
+        self.warmups = warmups or DEFAULT_WARMUPS
+        self.registry = model_registry
+        self.ready = threading.Event()
+        self.finished = threading.Event()  # every model is ready or failed
+        self._states = {model_id: "pending" for model_id in self.warmups}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        """Start loading every model concurrently (no-op if already started)"""
+        with self._lock:
+            if self._threads:
+                return self
+            self._started_at = time.time()
+            for model_id in self.warmups:
+                thread = threading.Thread(
+                    target=self._load, args=(model_id,), name=f"preload-{model_id}", daemon=True
+                )
+                self._threads.append(thread)
+        print(f"Preloading {len(self._threads)} models in the background...")
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _set_state(self, model_id, state):
+        with self._lock:
+            self._states[model_id] = state
+            done = all(s in ("ready", "failed") for s in self._states.values())
+            all_ready = all(s == "ready" for s in self._states.values())
+        if done and self._finished_at is None:
+            self._finished_at = time.time()
+            elapsed = self._finished_at - self._started_at
+            if all_ready:
+                self.ready.set()
+                print(f"✅ All models loaded and warmed up in {elapsed:.1f}s - ready to serve")
+            else:
+                print(f"⚠️ Model preload finished with failures after {elapsed:.1f}s: {self._states}")
+            self.finished.set()
+
+    def _load(self, model_id):
+        try:
+            self._set_state(model_id, "loading")
+            processor, model = self.registry.get(model_id)
+            self._set_state(model_id, "warming_up")
+            for _ in range(PRELOAD_CONFIG["warmup_runs"]):
+                self.warmups[model_id](processor, model)
+            self._set_state(model_id, "ready")
+        except Exception as e:
+            print(f"Error preloading {model_id}: {str(e)}")
+            self._set_state(model_id, "failed")
+
+    def wait(self, timeout=None):
+        """
+        Block until every model is ready or has failed to load, at most
+        timeout seconds; returns True only if every model is ready
+        """
+        self.finished.wait(timeout)
+        return self.ready.is_set()
+
+    def status(self):
+        """Readiness report for health checks"""
+        with self._lock:
+            states = dict(self._states)
+        end = self._finished_at or time.time()
+        return {
+            "ready": self.ready.is_set(),
+            "models": states,
+            "elapsed_s": round(end - self._started_at, 1) if self._started_at else None
+        }
+
+
+# Shared preloader for this process
+preloader = ModelPreloader()
+
+
+def start_preload():
+    """Start background preloading if enabled in PRELOAD_CONFIG"""
+    if PRELOAD_CONFIG["enabled"]:
+        preloader.start()
+    return preloader
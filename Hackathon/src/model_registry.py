@@ -0,0 +1,198 @@
+#model_registry.py
+
+import gc
+import threading
+import time
+
+from config import CAPTION_CONFIG, VQA_CONFIG, SCENE_CONFIG, MODEL_REGISTRY_CONFIG
+from inference_backends import MODEL_EXTENSIONS, model_id
+
+
+def _load_blip_caption(model_name, **kwargs):
+    """Load the BLIP captioning processor and model"""
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained(model_name, **kwargs)
+    model = BlipForConditionalGeneration.from_pretrained(model_name, **kwargs)
+    model.eval()
+    return processor, model
+
+
+def _load_vilt_vqa(model_name, **kwargs):
+    """Load the ViLT VQA processor and model"""
+    from transformers import ViltProcessor, ViltForQuestionAnswering
+    processor = ViltProcessor.from_pretrained(model_name, **kwargs)
+    model = ViltForQuestionAnswering.from_pretrained(model_name, **kwargs)
+    model.eval()
+    return processor, model
+
+
+def _load_scene_classifier(model_name, **kwargs):
+    """Load the eager ResNet-50 scene classifier"""
+    from transformers import AutoModelForImageClassification
+    from scene_classifier import SceneClassifier
+    model = AutoModelForImageClassification.from_pretrained(model_name, **kwargs)
+    model.eval()
+    classifier = SceneClassifier("torch", model, model_name=model_name)
+    # Preprocessing is built into the classifier (preprocessing.py), so there is no processor
+    return None, classifier
+
+
+def _exported_loader(task, engine):
+    """Loader for a task's exported graphs on a non-torch engine (the pipeline plays the model role)"""
+    def load(model_id, **kwargs):
+        if task == "caption":
+            from onnx_captioning import OnnxBlipCaptioner
+            pipeline = OnnxBlipCaptioner(engine=engine, **kwargs)
+        elif task == "vqa":
+            from onnx_vqa import OnnxViltVQA
+            pipeline = OnnxViltVQA(engine=engine, **kwargs)
+        else:
+            from scene_classifier import SceneClassifier
+            return None, SceneClassifier(engine, **kwargs)
+        return pipeline.processor, pipeline
+    return load
+
+
+def _estimate_size_mb(model):
+    """Estimate the memory held by a model's weights in MB"""
+    module = getattr(model, "model", model)  # unwrap pipelines around eager models
+    if not hasattr(module, "parameters"):
+        return 0.0
+    total = sum(p.numel() * p.element_size() for p in module.parameters())
+    total += sum(b.numel() * b.element_size() for b in module.buffers())
+    return total / (1024 * 1024)
+
+
+class _ModelEntry:
+    def __init__(self, loader):
+        self.loader = loader
+        self.load_lock = threading.Lock()
+        self.processor = None
+        self.model = None
+        self.refcount = 0
+        self.size_mb = 0.0
+        self.last_used = 0.0
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+
+class ModelRegistry:
+    """
+    Process-wide model store. Each model id is loaded lazily on first use and
+    shared by every handler; idle models are unloaded under a memory budget.
+    """
+
+    def __init__(self, memory_budget_mb=None, **load_kwargs):
+        self.memory_budget_mb = memory_budget_mb
+        self.load_kwargs = load_kwargs
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def register(self, model_id, loader):
+        """Register a loader(model_id, **kwargs) -> (processor, model) for a model id"""
+        with self._lock:
+            if model_id not in self._entries:
+                self._entries[model_id] = _ModelEntry(loader)
+
+    def _entry(self, model_id):
+        try:
+            return self._entries[model_id]
+        except KeyError:
+            raise KeyError(f"Model not registered: {model_id}")
+
+    def acquire(self, model_id):
+        """Take a reference on a model so it is never unloaded while held"""
+        with self._lock:
+            self._entry(model_id).refcount += 1
+
+    def release(self, model_id):
+        """Drop a reference taken with acquire()"""
+        with self._lock:
+            entry = self._entry(model_id)
+            entry.refcount = max(0, entry.refcount - 1)
+        self._enforce_budget()
+
+    def get(self, model_id):
+        """Return (processor, model) for a model id, loading it on first use"""
+        entry = self._entry(model_id)
+        if not entry.loaded:
+            # Serialise loads per model so concurrent callers share one copy
+            with entry.load_lock:
+                if not entry.loaded:
+                    start = time.time()
+                    processor, model = entry.loader(model_id, **self.load_kwargs)
+                    with self._lock:
+                        entry.processor, entry.model = processor, model
+                        entry.size_mb = _estimate_size_mb(model)
+                    print(f"Loaded {model_id} ({entry.size_mb:.0f} MB) in {time.time() - start:.1f}s")
+                    entry.last_used = time.time()
+                    self._enforce_budget(keep=model_id)
+        with self._lock:
+            entry.last_used = time.time()
+            return entry.processor, entry.model
+
+    def is_loaded(self, model_id):
+        return self._entry(model_id).loaded
+
+    def loaded_size_mb(self):
+        with self._lock:
+            return sum(e.size_mb for e in self._entries.values() if e.loaded)
+
+    def unload(self, model_id):
+        """Unload a model if nobody holds a reference to it"""
+        with self._lock:
+            entry = self._entry(model_id)
+            if not entry.loaded or entry.refcount > 0:
+                return False
+            entry.processor, entry.model = None, None
+            entry.size_mb = 0.0
+        gc.collect()
+        print(f"Unloaded idle model {model_id}")
+        return True
+
+    def unload_idle(self):
+        """Unload every model that has no references"""
+        with self._lock:
+            idle = [mid for mid, e in self._entries.items() if e.loaded and e.refcount == 0]
+        return [mid for mid in idle if self.unload(mid)]
+
+    def _enforce_budget(self, keep=None):
+        """Unload least recently used idle models until under the memory budget"""
+        if self.memory_budget_mb is None:
+            return
+        with self._lock:
+            idle = sorted(
+                (e.last_used, mid) for mid, e in self._entries.items()
+                if e.loaded and e.refcount == 0 and mid != keep
+            )
+        for _, model_id in idle:
+            if self.loaded_size_mb() <= self.memory_budget_mb:
+                break
+            self.unload(model_id)
+
+    def stats(self):
+        """Return load state, references and size for each registered model"""
+        with self._lock:
+            return {
+                model_id: {
+                    "loaded": entry.loaded,
+                    "refcount": entry.refcount,
+                    "size_mb": round(entry.size_mb, 1)
+                }
+                for model_id, entry in self._entries.items()
+            }
+
+
+# Shared registry used by every handler in this process
+registry = ModelRegistry(
+    memory_budget_mb=MODEL_REGISTRY_CONFIG["memory_budget_mb"],
+    local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]
+)
+registry.register(CAPTION_CONFIG["model_name"], _load_blip_caption)
+registry.register(VQA_CONFIG["model_name"], _load_vilt_vqa)
+registry.register(SCENE_CONFIG["model_name"], _load_scene_classifier)
+for _engine in MODEL_EXTENSIONS:
+    for _task, _config in (("caption", CAPTION_CONFIG), ("vqa", VQA_CONFIG), ("scene", SCENE_CONFIG)):
+        registry.register(model_id(_task, _engine, _config["model_name"]), _exported_loader(_task, _engine))
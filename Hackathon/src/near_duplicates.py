@@ -0,0 +1,147 @@
+#near_duplicates.py
+
+"""
+Near-duplicate frame suppression. Users pointing the phone at the same scene
+tap repeatedly and send frames that differ in bytes (so the result cache
+misses them) but not in content. Each image gets a 64-bit difference hash
+(dHash) of a tiny grayscale thumbnail; an image within max_distance bits of
+one analyzed in the last window_s seconds reuses that image's results
+instead of running the models again. Frames are only matched against the
+same client's recent frames: two users photographing similar dark or blank
+scenes must never hear each other's descriptions.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+from PIL import Image
+
+from config import NEAR_DUPLICATE_CONFIG
+
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its left neighbour"""
+    thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance=NEAR_DUPLICATE_CONFIG["max_distance"],
+                 window_s=NEAR_DUPLICATE_CONFIG["window_s"],
+                 max_entries=NEAR_DUPLICATE_CONFIG["max_entries"],
+                 enabled=NEAR_DUPLICATE_CONFIG["enabled"]):
+        self.max_distance = max_distance
+        self.window_s = window_s
+        self.enabled = enabled
+        self._entries = deque(maxlen=max_entries)  # (time, hash, results), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, image_hash):
+        """Results of the latest near-duplicate analyzed within the window, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            while self._entries and now - self._entries[0][0] > self.window_s:
+                self._entries.popleft()
+            for _, other_hash, results in reversed(self._entries):
+                if hamming_distance(image_hash, other_hash) <= self.max_distance:
+                    self.hits += 1
+                    return results
+            self.misses += 1
+            return None
+
+    def add(self, image_hash, results):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries.append((time.monotonic(), image_hash, results))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_distance": self.max_distance,
+                "window_s": self.window_s,
+                "recent": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+class ClientIndexes:
+    """One NearDuplicateIndex per client (HTTP session), least recently seen clients dropped first"""
+
+    def __init__(self, max_clients=NEAR_DUPLICATE_CONFIG["max_clients"]):
+        self.max_clients = max_clients
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, client):
+        with self._lock:
+            index = self._indexes.get(client)
+            if index is None:
+                index = self._indexes[client] = NearDuplicateIndex()
+                while len(self._indexes) > self.max_clients:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(client)
+            return index
+
+    def stats(self):
+        with self._lock:
+            indexes = list(self._indexes.values())
+        hits = sum(index.hits for index in indexes)
+        misses = sum(index.misses for index in indexes)
+        lookups = hits + misses
+        return {
+            "enabled": NEAR_DUPLICATE_CONFIG["enabled"],
+            "clients": len(indexes),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Per-session indexes for the HTTP server
+near_duplicates = ClientIndexes()
+
+
+def iter_analysis(stages, context, recent=None):
+    """
+    stages.iter_results(context), or the results of a near-duplicate of the
+    image in recent (the client's NearDuplicateIndex) analyzed within the
+    window, in the order its stages finished. recent=None always analyzes.
+    """
+    if recent is None:
+        yield from stages.iter_results(context)
+        return
+
+    image_hash = dhash(context.image)
+    previous = recent.find(image_hash)
+    if previous is not None:
+        print("Near-duplicate of a recent image, reusing its results")
+        yield from previous.items()
+        return
+
+    results = {}
+    for stage, result in stages.iter_results(context):
+        results[stage] = result
+        yield stage, result
+    recent.add(image_hash, results)
+
+
+def analyze(stages, context, recent=None):
+    """stages.run(context), reusing a near-duplicate's results from the client's recent index"""
+    return dict(iter_analysis(stages, context, recent))
@@ -0,0 +1,180 @@
+#onnx_captioning.py
+
+"""
+BLIP captioning on the exported graphs: the vision encoder (blip_vision) and
+the text decoder exported by ModelConverter, driven by a greedy decoding loop
+that mirrors BlipForConditionalGeneration.generate. Runs on ONNX Runtime by
+default, or on any other engine from inference_backends. The KV-cache decoder
+graphs (prefill + step) are used when available; otherwise the plain decoder
+recomputes the whole prefix for every token.
+"""
+
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+from config import CAPTION_CONFIG, MODEL_REGISTRY_CONFIG, ONNX_CONFIG
+from deadline import expired
+from inference_backends import create_backend, exported_model_exists
+from preprocessing import preprocess
+
+
+class OnnxBlipCaptioner:
+    def __init__(self, model_dir=ONNX_CONFIG["model_dir"], model_name=CAPTION_CONFIG["model_name"], engine="onnx",
+                 local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]):
+        from transformers import BlipConfig, BlipProcessor
+
+        vision_path = os.path.join(model_dir, ONNX_CONFIG["caption_vision_model"])
+        decoder_path = os.path.join(model_dir, ONNX_CONFIG["caption_decoder_model"])
+        self.vision = create_backend(engine, vision_path, ["pixel_values"], ["vision_features"])
+        self.decoder = create_backend(
+            engine, decoder_path, ["input_ids", "attention_mask", "encoder_hidden_states"], ["logits"]
+        )
+
+        prefill_path = os.path.join(model_dir, ONNX_CONFIG["caption_decoder_prefill_model"])
+        step_path = os.path.join(model_dir, ONNX_CONFIG["caption_decoder_step_model"])
+        self.prefill = self.step = None
+        if exported_model_exists(engine, prefill_path) and exported_model_exists(engine, step_path):
+            # Cache input/output names come from the exported graphs themselves
+            self.prefill = create_backend(engine, prefill_path)
+            self.step = create_backend(engine, step_path)
+            self.past_names = [name for name in self.step.input_names if name.startswith("past_key_values")]
+
+        # Only the tokenizer and config are needed, not the torch weights
+        self.processor = BlipProcessor.from_pretrained(model_name, local_files_only=local_files_only)
+        text_config = BlipConfig.from_pretrained(model_name, local_files_only=local_files_only).text_config
+        self.bos_token_id = text_config.bos_token_id
+        self.eos_token_id = text_config.sep_token_id  # BLIP stops decoding on [SEP]
+        self.pad_token_id = text_config.pad_token_id
+        self.max_length = ONNX_CONFIG["max_length"]
+
+    def encode_image(self, pixel_values, bind_slot=None):
+        """
+        Run the vision encoder, returning the image embeddings for
+        cross-attention (in a reused buffer with bind_slot, see InferenceBackend.run)
+        """
+        return self.vision.run({"pixel_values": pixel_values}, bind_slot)["vision_features"]
+
+    def generate(self, pixel_values):
+        """Greedy decode token ids (batch, length) for preprocessed images"""
+        return self.generate_within(pixel_values, [None] * len(pixel_values))[0]
+
+    def generate_within(self, pixel_values, deadlines):
+        """
+        Greedy decode that stops each image at its perf_counter() deadline
+        (None for no limit). Returns the token ids and a boolean array of the
+        rows cut short before [SEP].
+        """
+        # Embeddings, logits and the cache live in reused buffers: they are only
+        # read within this call
+        image_embeds = self.encode_image(pixel_values, bind_slot=0)
+        if self.step is not None:
+            return self._generate_with_cache(image_embeds, deadlines)
+        return self._generate_full(image_embeds, deadlines)
+
+    def _next_tokens(self, logits, finished):
+        next_tokens = logits[:, -1, :].argmax(-1)
+        return np.where(finished, self.pad_token_id, next_tokens)
+
+    def _stop_expired(self, deadlines, finished, truncated):
+        """Mark rows whose deadline passed as finished, and as truncated if still decoding"""
+        late = expired(deadlines) & ~finished
+        truncated |= late
+        finished |= late
+
+    def _generate_full(self, image_embeds, deadlines):
+        """Decode by re-running the decoder over the whole prefix for every token"""
+        batch_size = image_embeds.shape[0]
+        input_ids = np.full((batch_size, 1), self.bos_token_id, dtype=np.int64)
+        finished = np.zeros(batch_size, dtype=bool)
+        truncated = np.zeros(batch_size, dtype=bool)
+        # max_length counts the [DEC] start token, as in transformers' generate()
+        for _ in range(self.max_length - 1):
+            logits = self.decoder.run({
+                "input_ids": input_ids,
+                "attention_mask": np.ones_like(input_ids),
+                "encoder_hidden_states": image_embeds
+            }, bind_slot=0)["logits"]
+            next_tokens = self._next_tokens(logits, finished)
+            input_ids = np.concatenate([input_ids, next_tokens[:, None]], axis=1)
+            finished |= next_tokens == self.eos_token_id
+            self._stop_expired(deadlines, finished, truncated)
+            if finished.all():
+                break
+        return input_ids, truncated
+
+    def _generate_with_cache(self, image_embeds, deadlines):
+        """Decode one token per step, feeding back the cached keys/values"""
+        batch_size = image_embeds.shape[0]
+        input_ids = np.full((batch_size, 1), self.bos_token_id, dtype=np.int64)
+        finished = np.zeros(batch_size, dtype=bool)
+        truncated = np.zeros(batch_size, dtype=bool)
+        outputs = self.prefill.run({
+            "input_ids": input_ids,
+            "attention_mask": np.ones_like(input_ids),
+            "encoder_hidden_states": image_embeds
+        }, bind_slot=0)
+        while True:
+            logits = outputs["logits"]
+            next_tokens = self._next_tokens(logits, finished)
+            input_ids = np.concatenate([input_ids, next_tokens[:, None]], axis=1)
+            finished |= next_tokens == self.eos_token_id
+            self._stop_expired(deadlines, finished, truncated)
+            if finished.all() or input_ids.shape[1] >= self.max_length:
+                break
+            feed = {
+                "input_ids": next_tokens[:, None].astype(np.int64),
+                "attention_mask": np.ones_like(input_ids),
+                "encoder_hidden_states": image_embeds
+            }
+            # present.<layer>.<i> from the last step becomes past_key_values.<layer>.<i>
+            feed.update({name: outputs[name.replace("past_key_values", "present", 1)] for name in self.past_names})
+            # Alternate between two output buffers: the cache being read is the last step's
+            outputs = self.step.run(feed, bind_slot=input_ids.shape[1] % 2)
+        return input_ids, truncated
+
+    def caption(self, image):
+        """Generate a caption for a PIL image"""
+        return self.caption_batch([image])[0]
+
+    def caption_batch(self, images):
+        """Generate captions for a list of PIL images in one batch"""
+        return [caption for caption, _ in self.caption_batch_within(images, [None] * len(images))]
+
+    def caption_batch_within(self, images, deadlines):
+        """
+        Captions for a batch of PIL images, each decoded until its deadline.
+        Returns (caption, truncated) pairs.
+        """
+        return self.caption_pixels_within(preprocess("blip", images), deadlines)
+
+    def caption_pixels_within(self, pixel_values, deadlines):
+        """caption_batch_within for already preprocessed (batch, 3, 384, 384) pixels"""
+        output_ids, truncated = self.generate_within(pixel_values, deadlines)
+        captions = self.processor.batch_decode(output_ids, skip_special_tokens=True)
+        return list(zip(captions, truncated.tolist()))
+
+
+def compare_with_pytorch(image_dir):
+    """Caption every image in a directory with both backends and report mismatches"""
+    from image_captioning import generate_caption_with_blip
+
+    captioner = OnnxBlipCaptioner()
+    matches = 0
+    images = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    for filename in images:
+        image_path = os.path.join(image_dir, filename)
+        onnx_caption = captioner.caption(Image.open(image_path).convert("RGB"))
+        torch_caption = generate_caption_with_blip(image_path)
+        same = onnx_caption == torch_caption
+        matches += same
+        print(f"{'✅' if same else '❌'} {filename}\n   onnx:  {onnx_caption}\n   torch: {torch_caption}")
+    print(f"\n{matches}/{len(images)} captions match")
+    return matches == len(images)
+
+
+if __name__ == "__main__":
+    # python src/onnx_captioning.py images/test_images
+    sys.exit(0 if compare_with_pytorch(sys.argv[1] if len(sys.argv) > 1 else "images/test_images") else 1)
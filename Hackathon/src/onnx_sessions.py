@@ -0,0 +1,107 @@
+#onnx_sessions.py
+
+"""
+Shared ONNX Runtime sessions. One session is kept per model/options
+combination, and the graph optimized on first load is saved next to the
+models, so later starts load the optimized graph and skip optimization.
+"""
+
+import hashlib
+import os
+import threading
+
+from config import ORT_SESSION_CONFIG
+
+_OPTIMIZATION_LEVELS = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+class SessionManager:
+    def __init__(self, optimized_model_dir=ORT_SESSION_CONFIG["optimized_model_dir"], **defaults):
+        self.optimized_model_dir = optimized_model_dir
+        self.defaults = {
+            "graph_optimization_level": ORT_SESSION_CONFIG["graph_optimization_level"],
+            "intra_op_num_threads": ORT_SESSION_CONFIG["intra_op_num_threads"],
+            "inter_op_num_threads": ORT_SESSION_CONFIG["inter_op_num_threads"],
+            "save_format": ORT_SESSION_CONFIG["save_format"],
+            "providers": ("CPUExecutionProvider",),
+            **defaults
+        }
+        self._sessions = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def _optimized_path(self, model_path, options):
+        """Cache file for the optimized graph; changes whenever the source model or options do"""
+        stat = os.stat(model_path)
+        key = repr((os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns, sorted(options.items())))
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        extension = ".ort" if options["save_format"] == "ort" else ".onnx"
+        return os.path.join(self.optimized_model_dir, f"{name}.{digest}.opt{extension}")
+
+    def _session_options(self, options, optimized_path, reuse_optimized):
+        import onnxruntime
+
+        sess_options = onnxruntime.SessionOptions()
+        sess_options.intra_op_num_threads = options["intra_op_num_threads"]
+        sess_options.inter_op_num_threads = options["inter_op_num_threads"]
+        sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        if reuse_optimized:
+            # The saved graph is already optimized for this machine
+            sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            level = _OPTIMIZATION_LEVELS[options["graph_optimization_level"]]
+            sess_options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel, level)
+            sess_options.optimized_model_filepath = optimized_path
+            if options["save_format"] == "ort":
+                sess_options.add_session_config_entry("session.save_model_format", "ORT")
+        return sess_options
+
+    def get(self, model_path, **overrides):
+        """Return the shared session for a model, creating (and optimizing) it on first use"""
+        import onnxruntime
+
+        options = {**self.defaults, **overrides}
+        options["providers"] = tuple(options["providers"])
+        key = (os.path.abspath(model_path), tuple(sorted(options.items())))
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session
+            # One lock per session so different models still load concurrently
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            if key in self._sessions:
+                return self._sessions[key]
+
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"ONNX model not found at: {model_path}")
+            os.makedirs(self.optimized_model_dir, exist_ok=True)
+            optimized_path = self._optimized_path(model_path, options)
+            reuse_optimized = os.path.exists(optimized_path)
+
+            session = onnxruntime.InferenceSession(
+                optimized_path if reuse_optimized else model_path,
+                sess_options=self._session_options(options, optimized_path, reuse_optimized),
+                providers=list(options["providers"])
+            )
+            if not reuse_optimized:
+                print(f"Saved optimized graph for {model_path} to {optimized_path}")
+            with self._lock:
+                self._sessions[key] = session
+            return session
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+# Shared session manager for this process
+sessions = SessionManager()
@@ -0,0 +1,149 @@
+#onnx_vqa.py
+
+"""
+ViLT VQA on the vqa_model graph exported by ModelConverter (the full
+ViltForQuestionAnswering forward), on ONNX Runtime by default or any other
+engine from inference_backends. The graph has static shapes: 384x384 images
+and 40-token questions.
+
+python src/onnx_vqa.py <image_dir> checks the graph's logits against eager
+ViLT on the same inputs; run it before selecting a non-torch VQA backend.
+"""
+
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+from config import VQA_CONFIG, MODEL_REGISTRY_CONFIG, ONNX_CONFIG
+from inference_backends import create_backend
+from preprocessing import preprocess
+
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def top_k(logits, k):
+    """Top-k (probability, label index) pairs from logits (1, num_answers), best first"""
+    probs = softmax(logits)[0]
+    top_indices = np.argsort(probs)[::-1][:k]
+    return [(probs[i], i) for i in top_indices]
+
+
+class OnnxViltVQA:
+    def __init__(self, model_dir=ONNX_CONFIG["model_dir"], model_name=VQA_CONFIG["model_name"], engine="onnx",
+                 local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]):
+        from transformers import ViltConfig, ViltProcessor
+
+        vqa_path = os.path.join(model_dir, ONNX_CONFIG["vqa_model"])
+        self.backend = create_backend(
+            engine, vqa_path, ["pixel_values", "pixel_mask", "input_ids", "attention_mask"], ["logits"]
+        )
+
+        # Only the tokenizer and label map are needed, not the torch weights
+        self.processor = ViltProcessor.from_pretrained(model_name, local_files_only=local_files_only)
+        self.id2label = ViltConfig.from_pretrained(model_name, local_files_only=local_files_only).id2label
+        self.image_size = ONNX_CONFIG["vqa_image_size"]
+        self.seq_length = ONNX_CONFIG["vqa_seq_length"]
+
+    def preprocess_image(self, image):
+        """pixel_values (1, 3, 384, 384) for the exported graph"""
+        # The ViLT processor's normalization on a 384x384 resize of the image
+        return preprocess("vilt_fixed", [image])
+
+    def pixel_mask(self, num_images):
+        """All-ones pixel_mask: the 384x384 images are never padded"""
+        return np.ones((num_images, self.image_size, self.image_size), dtype=np.int64)
+
+    def preprocess_question(self, question):
+        """Tokens for a question (or list of questions) padded to the exported graph's 40-token length"""
+        inputs = self.processor.tokenizer(
+            question,
+            return_tensors="np",
+            padding="max_length",
+            max_length=self.seq_length,
+            truncation=True
+        )
+        return {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64)
+        }
+
+    def preprocess(self, image, question):
+        """Processor output padded/resized to the exported graph's static shapes"""
+        return {
+            "pixel_values": self.preprocess_image(image),
+            "pixel_mask": self.pixel_mask(1),
+            **self.preprocess_question(question)
+        }
+
+    def predict(self, image, question, pixel_values=None):
+        """
+        Return answer logits (1, num_answers) for a PIL image and question.
+        pixel_values from preprocess_image can be passed instead of the image.
+        """
+        if pixel_values is None:
+            pixel_values = self.preprocess_image(image)
+        return self.backend.run({
+            "pixel_values": pixel_values,
+            "pixel_mask": self.pixel_mask(len(pixel_values)),
+            **self.preprocess_question(question)
+        })["logits"]
+
+    def predict_batch(self, pixel_values, question_inputs):
+        """
+        Answer logits (n, num_answers) for a block of n padded questions (from
+        preprocess_question or question_sets) in a single run. pixel_values is
+        one image, shared by every question, or one image per question.
+        """
+        num_questions = len(question_inputs["input_ids"])
+        if len(pixel_values) != num_questions:
+            pixel_values = np.repeat(pixel_values, num_questions, axis=0)
+        return self.backend.run({
+            "pixel_values": pixel_values, "pixel_mask": self.pixel_mask(num_questions), **question_inputs
+        })["logits"]
+
+
+def compare_with_pytorch(image_dir, questions=("What is in the image?", "How many people are there?"),
+                         tolerance=1e-3):
+    """
+    Run the exported graph and eager ViltForQuestionAnswering on the same
+    inputs for every image and question, and report the largest logit
+    difference and any top-k answer mismatches
+    """
+    import torch
+    from transformers import ViltForQuestionAnswering
+
+    vqa = OnnxViltVQA()
+    model = ViltForQuestionAnswering.from_pretrained(
+        VQA_CONFIG["model_name"], local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]
+    )
+    model.eval()
+    k = VQA_CONFIG["top_k"]
+    worst, mismatches = 0.0, 0
+    images = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    for filename in images:
+        image = Image.open(os.path.join(image_dir, filename)).convert("RGB")
+        for question in questions:
+            inputs = vqa.preprocess(image, question)
+            onnx_logits = vqa.backend.run(inputs)["logits"]
+            with torch.no_grad():
+                torch_logits = model(**{name: torch.from_numpy(array) for name, array in inputs.items()}).logits.numpy()
+            diff = float(np.abs(onnx_logits - torch_logits).max())
+            worst = max(worst, diff)
+            onnx_answers = [int(i) for _, i in top_k(onnx_logits, k)]
+            torch_answers = [int(i) for _, i in top_k(torch_logits, k)]
+            same = onnx_answers == torch_answers and diff <= tolerance
+            mismatches += not same
+            print(f"{'✅' if same else '❌'} {filename} {question!r}: max abs logit diff {diff:.2e}, "
+                  f"onnx {[vqa.id2label[i] for i in onnx_answers]}, torch {[vqa.id2label[i] for i in torch_answers]}")
+    print(f"\nLargest logit difference: {worst:.2e}, {mismatches} mismatches")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    # python src/onnx_vqa.py images/test_images
+    sys.exit(0 if compare_with_pytorch(sys.argv[1] if len(sys.argv) > 1 else "images/test_images") else 1)
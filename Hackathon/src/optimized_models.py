@@ -1,55 +1,88 @@
-from transformers import BlipProcessor, ViltProcessor, BlipForConditionalGeneration, ViltForQuestionAnswering
-import torch
-from PIL import Image
 import os
+from config import CAPTION_CONFIG, VQA_CONFIG
+from image_captioning import caption_image_within
+from inference_backends import model_id
+from model_registry import registry
+from question_planner import planner
+from vqa_handler import predict_batch
 
 class OptimizedModelHandler:
     def __init__(self):
-        # Initialize BLIP for image captioning
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-        
-        # Initialize ViLT for VQA
-        self.vilt_processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-        self.vilt_model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-
-    def generate_caption(self, image_path):
-        """Generate caption for the image"""
+        # BLIP (captioning) and ViLT (VQA) are shared through the model registry;
+        # the inference engine for each is selected in config.py
+        self.caption_backend = CAPTION_CONFIG["backend"]
+        self.caption_model_name = model_id("caption", self.caption_backend, CAPTION_CONFIG["model_name"])
+        self.vqa_backend = VQA_CONFIG["backend"]
+        self.vqa_model_name = model_id("vqa", self.vqa_backend, VQA_CONFIG["model_name"])
+        registry.acquire(self.caption_model_name)
+        registry.acquire(self.vqa_model_name)
+
+    @property
+    def blip_processor(self):
+        return registry.get(self.caption_model_name)[0]
+
+    @property
+    def blip_model(self):
+        return registry.get(self.caption_model_name)[1]
+
+    @property
+    def vilt_processor(self):
+        return registry.get(self.vqa_model_name)[0]
+
+    @property
+    def vilt_model(self):
+        return registry.get(self.vqa_model_name)[1]
+
+    def close(self):
+        """Release the shared models"""
+        registry.release(self.caption_model_name)
+        registry.release(self.vqa_model_name)
+
+    def generate_caption(self, image):
+        """Generate caption for the image (path or ImageContext)"""
+        return self.generate_caption_within(image, None)[0]
+
+    def generate_caption_within(self, image, budget_ms):
+        """
+        Generate a caption within a latency budget in milliseconds. Returns
+        (caption, truncated), truncated when the budget cut decoding short.
+        """
         try:
-            # Read and process image
-            image = Image.open(image_path).convert('RGB')
-            inputs = self.blip_processor(image, return_tensors="pt")
-            
-            # Generate caption
-            outputs = self.blip_model.generate(**inputs)
-            caption = self.blip_processor.decode(outputs[0], skip_special_tokens=True)
-            
-            return caption
-            
+            # Concurrent requests are batched into one generate call
+            return caption_image_within(image, budget_ms, self.caption_model_name, self.caption_backend)
+
         except Exception as e:
             raise Exception(f"Error generating caption: {str(e)}")
 
-    def answer_question(self, image_path, question):
+    def answer_question(self, image, question):
         """Answer a question about the image"""
+        return self.answer_questions(image, [question])[question]
+
+    def answer_questions(self, image, questions):
+        """Answer several questions about the image in one batched forward pass"""
         try:
-            # Read and process image
-            image = Image.open(image_path).convert('RGB')
-            inputs = self.vilt_processor(image, question, return_tensors="pt")
-            
-            # Get answer
-            outputs = self.vilt_model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
-            
-            # Get top answer and confidence
-            max_idx = logits.argmax(-1).item()
-            answer = self.vilt_model.config.id2label[max_idx]
-            confidence = probs[0][max_idx].item()
-            
-            return {
-                "answer": answer,
-                "confidence": f"{confidence:.2%}"
-            }
-            
+            predictions, id2label = predict_batch(
+                image, questions, self.vqa_model_name, self.vqa_backend, 1
+            )
+
+            # Top answer and confidence for each question
+            results = {}
+            for question, top_predictions in zip(questions, predictions):
+                prob, idx = top_predictions[0]
+                results[question] = {
+                    "answer": id2label[int(idx)],
+                    "confidence": f"{float(prob):.2%}"
+                }
+            return results
+
         except Exception as e:
-            raise Exception(f"Error processing question: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error processing question: {str(e)}")
+
+    def answer_planned_questions(self, image, questions, scene, caption=None):
+        """
+        Answer questions given the image's (label, score) scene and caption:
+        the ones those already answer skip the VQA model
+        """
+        plan = planner.plan(questions, scene, caption)
+        results = self.answer_questions(image, plan.to_run) if plan.to_run else {}
+        return plan.answers(results, lambda answer, source: {"answer": answer, "confidence": f"from {source}"})
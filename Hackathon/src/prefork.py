@@ -0,0 +1,85 @@
+#prefork.py
+
+"""
+Prefork serving helpers. Models are loaded once in the parent process before
+workers are forked, so every worker shares the read-only weight pages
+copy-on-write instead of holding its own copy.
+"""
+
+import gc
+import os
+import sys
+
+from config import PREFORK_CONFIG
+from model_preloader import preloader
+from model_registry import registry
+
+PREFORK_ENV = "SNAPSENSE_PREFORK"
+
+
+def is_prefork_parent():
+    """True when the app is being imported by a prefork master (see gunicorn_conf.py)"""
+    return os.environ.get(PREFORK_ENV) == "1"
+
+
+def load_shared_models():
+    """
+    Load every model in the parent before forking. Warm-up is left to the
+    workers: running inference here would start torch's thread pools, which
+    do not survive fork.
+    """
+    for model_id in preloader.warmups:
+        registry.get(model_id)
+    # Move everything loaded so far out of the collector's reach so the
+    # workers' GC passes don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    print(f"Loaded shared models in parent (pid {os.getpid()}): {memory_usage()}")
+
+
+def init_worker(num_workers, timeout):
+    """Run in each worker right after fork; timeout is gunicorn's worker timeout"""
+    import torch
+
+    threads = PREFORK_CONFIG["torch_threads_per_worker"]
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // max(1, num_workers))
+    torch.set_num_threads(threads)
+
+    # Warm up in the worker; the weights themselves are already loaded and shared.
+    # The worker only starts its heartbeat after post_fork returns, so waiting
+    # past gunicorn's timeout would get it killed and respawned in a loop.
+    preloader.start()
+    ready_timeout = min(PREFORK_CONFIG["worker_ready_timeout_s"], timeout * 0.75)
+    if not preloader.wait(ready_timeout):
+        models = preloader.status()["models"]
+        if PREFORK_CONFIG["exit_on_preload_failure"]:
+            print(f"❌ Worker {os.getpid()} models not ready, exiting: {models}")
+            sys.exit(1)
+        print(f"⚠️ Worker {os.getpid()} serving degraded, models not ready: {models}")
+        return
+    print(f"Worker {os.getpid()} ready with {threads} torch threads: {memory_usage()}")
+
+
+def memory_usage():
+    """
+    Memory of the current process in MB. unique_rss_mb (private pages only)
+    is what each extra worker really costs; rss_mb also counts shared weights.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {"pid": os.getpid(), "rss_mb": None, "pss_mb": None, "unique_rss_mb": None}
+
+    unique_kb = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "pid": os.getpid(),
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "unique_rss_mb": round(unique_kb / 1024, 1)
+    }
@@ -0,0 +1,146 @@
+#preprocessing.py
+
+"""
+Image preprocessing for every model in one place: resize, rescale, normalize
+and HWC->CHW, reproducing the Hugging Face image processors (BLIP, ViLT and
+the ResNet scene classifier) without building their intermediate float
+copies. Rescale and normalize are folded into one precomputed 256-entry
+table per channel, so the float32 pixel values are looked up straight into
+the output array; batches can be written into a reusable per-thread buffer.
+tests/test_preprocessing.py checks the output against the HF processors.
+"""
+
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import ONNX_CONFIG
+
+OPENAI_CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+OPENAI_CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+IMAGENET_STANDARD_MEAN = (0.5, 0.5, 0.5)
+IMAGENET_STANDARD_STD = (0.5, 0.5, 0.5)
+IMAGENET_DEFAULT_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_DEFAULT_STD = (0.229, 0.224, 0.225)
+
+
+def _normalize_table(mean, std):
+    """
+    (3, 256) float32 values of (pixel / 255 - mean) / std, with the same
+    rounding as the HF processors (rescale in float64, normalize in float32)
+    """
+    rescaled = (np.arange(256, dtype=np.float64) * (1 / 255)).astype(np.float32)
+    mean = np.asarray(mean, dtype=np.float32)[:, None]
+    std = np.asarray(std, dtype=np.float32)[:, None]
+    return (rescaled[None, :] - mean) / std
+
+
+def _fixed_size(height, width):
+    def output_size(image_size):
+        return height, width
+    return output_size
+
+
+def _vilt_size(image_size, shorter=384, size_divisor=32):
+    """ViltImageProcessor's shortest-edge resize, capped at 1333/800 of it and rounded down to 32"""
+    width, height = image_size
+    longer = int(1333 / 800 * shorter)
+    scale = shorter / min(height, width)
+    if height < width:
+        new_height, new_width = shorter, scale * width
+    else:
+        new_height, new_width = scale * height, shorter
+    if max(new_height, new_width) > longer:
+        scale = longer / max(new_height, new_width)
+        new_height, new_width = scale * new_height, scale * new_width
+    new_height, new_width = int(new_height + 0.5), int(new_width + 0.5)
+    return new_height // size_divisor * size_divisor, new_width // size_divisor * size_divisor
+
+
+def _shortest_edge_size(shortest_edge):
+    def output_size(image_size):
+        width, height = image_size
+        if width <= height:
+            return int(shortest_edge * height / width), shortest_edge
+        return shortest_edge, int(shortest_edge * width / height)
+    return output_size
+
+
+class ImageSpec:
+    """How one model's processor turns an RGB image into pixel values"""
+
+    def __init__(self, output_size, mean, std, crop=None, resample=Image.BICUBIC):
+        self.output_size = output_size  # (width, height) -> resized (height, width)
+        self.crop = crop                # center crop (height, width) after the resize
+        self.resample = resample
+        self.table = _normalize_table(mean, std)
+
+    def shape(self, image):
+        """(height, width) of the pixel values for a PIL image"""
+        return self.crop or self.output_size(image.size)
+
+    def resize(self, image):
+        height, width = self.output_size(image.size)
+        if image.size != (width, height):
+            image = image.resize((width, height), self.resample)
+        if self.crop is not None:
+            top, left = (height - self.crop[0]) // 2, (width - self.crop[1]) // 2
+            image = image.crop((left, top, left + self.crop[1], top + self.crop[0]))
+        return image
+
+    def write(self, image, out):
+        """Preprocess one PIL image into out, a (3, height, width) float32 array"""
+        pixels = np.asarray(self.resize(image.convert("RGB")))
+        for channel in range(3):
+            np.take(self.table[channel], pixels[:, :, channel], out=out[channel])
+
+
+SPECS = {
+    # BlipImageProcessor: 384x384 bicubic, CLIP mean/std
+    "blip": ImageSpec(_fixed_size(384, 384), OPENAI_CLIP_MEAN, OPENAI_CLIP_STD),
+    # ViltImageProcessor: shortest edge 384 (longer side at most 639), multiple of 32
+    "vilt": ImageSpec(_vilt_size, IMAGENET_STANDARD_MEAN, IMAGENET_STANDARD_STD),
+    # The exported ViLT graph's static 384x384 input
+    "vilt_fixed": ImageSpec(
+        _fixed_size(ONNX_CONFIG["vqa_image_size"], ONNX_CONFIG["vqa_image_size"]),
+        IMAGENET_STANDARD_MEAN, IMAGENET_STANDARD_STD
+    ),
+    # ConvNextImageProcessor for microsoft/resnet-50: shortest edge 224 / 0.875, center crop 224
+    "resnet": ImageSpec(_shortest_edge_size(256), IMAGENET_DEFAULT_MEAN, IMAGENET_DEFAULT_STD, crop=(224, 224)),
+}
+
+
+_buffers = threading.local()
+
+
+def batch_buffer(model, batch_size, height, width):
+    """
+    Reusable (batch_size, 3, height, width) float32 array for the calling
+    thread. Its contents are overwritten by the thread's next call, so it is
+    only for pixel values used straight away (not cached).
+    """
+    buffers = _buffers.__dict__.setdefault("arrays", {})
+    buffer = buffers.get((model, height, width))
+    if buffer is None or len(buffer) < batch_size:
+        buffer = buffers[(model, height, width)] = np.empty((batch_size, 3, height, width), dtype=np.float32)
+    return buffer[:batch_size]
+
+
+def preprocess(model, images, out=None):
+    """
+    Pixel values (n, 3, height, width) for a list of PIL images, as the
+    model's HF image processor computes them. The images must come out the
+    same size (always true except for "vilt"). Written into out when given,
+    e.g. a batch_buffer, otherwise into a new array.
+    """
+    spec = SPECS[model]
+    shapes = {spec.shape(image) for image in images}
+    if len(shapes) != 1:
+        raise ValueError(f"Images preprocess to different sizes for {model}: {sorted(shapes)}")
+    height, width = shapes.pop()
+    if out is None:
+        out = np.empty((len(images), 3, height, width), dtype=np.float32)
+    for image, pixel_values in zip(images, out):
+        spec.write(image, pixel_values)
+    return out
@@ -0,0 +1,44 @@
+#progressive_audio.py
+
+"""
+Progressive responses: the description is spoken in segments, the caption
+first as soon as it exists, then scene and VQA details as their stages
+finish, so users hear something long before the full analysis is done.
+
+Segments are framed on byte-stream transports (RFCOMM, BLE) as an 8-byte
+big-endian length followed by the MP3 data; a zero length ends the response.
+If the analysis fails after some segments were sent, a last segment speaks
+ERROR_MESSAGE, so the listener knows the description is incomplete.
+"""
+
+# Marks the end of a multi-segment response
+END_OF_RESPONSE = (0).to_bytes(8, 'big')
+
+# Spoken when the analysis fails part way through a progressive response
+ERROR_MESSAGE = "Sorry, the rest of the description could not be generated."
+
+
+def frame_segment(audio_data):
+    """Length-prefixed audio segment"""
+    return len(audio_data).to_bytes(8, 'big') + audio_data
+
+
+def caption_first(stage_results, first="caption"):
+    """
+    Reorder (stage, result) pairs from StageGraph.iter_results so the caption
+    comes first; stages finishing before it are held back, later ones pass
+    straight through in completion order
+    """
+    held = []
+    first_seen = False
+    for name, result in stage_results:
+        if first_seen:
+            yield name, result
+        elif name == first:
+            first_seen = True
+            yield name, result
+            yield from held
+            held = []
+        else:
+            held.append((name, result))
+    yield from held
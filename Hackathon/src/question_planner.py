@@ -0,0 +1,163 @@
+#question_planner.py
+
+"""
+Chooses which VQA questions to run for an image. Questions whose answer the
+caption or a confident scene label already gives are answered from those
+instead (e.g. "Are there any people?" after "a man riding a bike", "Is this
+indoors or outdoors?" after "lakeside"), the SUGGESTED_QUESTIONS for the
+image's category fill the freed slots, and at most max_questions go to the
+VQA model. With wait_for_caption off, VQA starts as soon as the (fast) scene
+label is known, while the caption decodes, and only the scene label is used.
+"""
+
+import re
+
+from config import QUESTION_PLANNER_CONFIG, SUGGESTED_QUESTIONS
+
+PERSON_WORDS = {
+    "man", "men", "woman", "women", "person", "people", "boy", "boys", "girl", "girls",
+    "child", "children", "kid", "kids", "baby", "guy", "lady", "crowd", "couple", "family",
+    "player", "players", "skier", "surfer", "rider", "diver", "groom", "ballplayer"
+}
+ANIMAL_WORDS = {
+    "animal", "animals", "dog", "dogs", "puppy", "cat", "cats", "kitten", "horse", "horses",
+    "bird", "birds", "cow", "cows", "sheep", "elephant", "elephants", "giraffe", "giraffes",
+    "zebra", "zebras", "bear", "bears", "duck", "ducks"
+}
+VEHICLE_WORDS = {
+    "vehicle", "vehicles", "car", "cars", "bus", "buses", "truck", "trucks", "bike", "bikes",
+    "bicycle", "bicycles", "motorcycle", "motorcycles", "train", "boat", "boats", "plane",
+    "airplane", "taxi", "van"
+}
+OUTDOOR_WORDS = {
+    "outdoors", "outside", "street", "road", "sidewalk", "beach", "field", "park", "garden",
+    "yard", "patio", "terrace", "mountain", "mountains", "alp", "valley", "cliff", "lake",
+    "lakeside", "river", "ocean", "sea", "seashore", "coast", "forest", "desert", "snow", "sky"
+}
+INDOOR_WORDS = {
+    "indoors", "inside", "room", "kitchen", "bedroom", "bathroom", "office", "restaurant",
+    "library", "bookshop", "classroom", "hallway", "theater", "couch", "sofa", "bed"
+}
+
+# Words that put an image in a SUGGESTED_QUESTIONS category
+CATEGORY_WORDS = {
+    "nature": {
+        "mountain", "mountains", "alp", "valley", "cliff", "volcano", "beach", "seashore",
+        "coast", "lake", "lakeside", "river", "waterfall", "ocean", "sea", "forest", "tree",
+        "trees", "field", "grass", "desert", "sandbar", "promontory"
+    },
+    "urban": {
+        "city", "street", "road", "sidewalk", "building", "buildings", "skyscraper", "bridge",
+        "traffic", "downtown", "station", "parking", "shop", "store"
+    },
+}
+
+
+def _words(text):
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+class QuestionPlan:
+    def __init__(self):
+        self.questions = []  # every question answered, in order
+        self.to_run = []     # the ones the VQA model has to answer
+        self.implied = {}    # question -> answer taken from the caption or scene label
+        self.sources = {}    # question -> "caption" or "scene", where its implied answer came from
+
+    def answers(self, vqa_answers, format_implied=None):
+        """
+        All answers in question order: the VQA answers for to_run, and the
+        implied answers (passed through format_implied(answer, source), if
+        given) for the rest
+        """
+        implied = self.implied
+        if format_implied is not None:
+            implied = {
+                question: format_implied(answer, self.sources[question]) for question, answer in implied.items()
+            }
+        merged = {**implied, **vqa_answers}
+        return {question: merged[question] for question in self.questions if question in merged}
+
+
+class QuestionPlanner:
+    def __init__(self, enabled=QUESTION_PLANNER_CONFIG["enabled"],
+                 max_questions=QUESTION_PLANNER_CONFIG["max_questions"],
+                 min_scene_confidence=QUESTION_PLANNER_CONFIG["min_scene_confidence"],
+                 wait_for_caption=QUESTION_PLANNER_CONFIG["wait_for_caption"]):
+        self.enabled = enabled
+        self.max_questions = max_questions
+        self.min_scene_confidence = min_scene_confidence
+        self.wait_for_caption = wait_for_caption
+        # Analysis stages the VQA stage waits for
+        self.deps = ("caption", "scene") if wait_for_caption else ("scene",)
+
+    def _scene_words(self, scene):
+        """Words of the scene label when it is confident enough"""
+        if scene is not None and scene[1] >= self.min_scene_confidence:
+            return _words(scene[0])
+        return set()
+
+    def category(self, scene, caption=None):
+        """SUGGESTED_QUESTIONS category for the image, or None"""
+        words = _words(caption or "") | self._scene_words(scene)
+        matches = {name: len(words & vocabulary) for name, vocabulary in CATEGORY_WORDS.items()}
+        best = max(matches, key=matches.get)
+        return best if matches[best] else None
+
+    def _implied_answer(self, question, words):
+        """Answer to a question given by the caption or scene words, or None"""
+        question_words = _words(question)
+        if question_words & {"people", "person", "anyone"} and words & PERSON_WORDS:
+            return "yes"
+        if question_words & {"animal", "animals"} and words & ANIMAL_WORDS:
+            return "yes"
+        if question_words & {"vehicle", "vehicles"} and words & VEHICLE_WORDS:
+            return "yes"
+        if question_words & {"indoor", "indoors", "outdoor", "outdoors"}:
+            suffix = "s" if "outdoors" in question_words else ""
+            outdoor, indoor = words & OUTDOOR_WORDS, words & INDOOR_WORDS
+            if outdoor and not indoor:
+                return "outdoor" + suffix
+            if indoor and not outdoor:
+                return "indoor" + suffix
+        return None
+
+    def plan(self, questions, scene=None, caption=None):
+        """
+        Plan the questions for an image given its (label, score) scene and,
+        when known, its caption. Returns a QuestionPlan.
+        """
+        plan = QuestionPlan()
+        if not self.enabled:
+            plan.questions = plan.to_run = list(questions)
+            return plan
+
+        # Never more VQA rows than the fixed set would have used: category
+        # questions only fill the slots freed by implied ones. Fixed questions
+        # the caption and scene cannot answer always run.
+        budget = min(self.max_questions, len(questions))
+
+        # The fixed questions come first, then the category extras the budget has room for
+        candidates = list(questions)
+        category = self.category(scene, caption)
+        if category in SUGGESTED_QUESTIONS:
+            candidates += [q for q in SUGGESTED_QUESTIONS[category] if q not in candidates]
+
+        caption_words, scene_words = _words(caption or ""), self._scene_words(scene)
+        for question in candidates:
+            source, answer = "caption", self._implied_answer(question, caption_words)
+            if answer is None:
+                source, answer = "scene", self._implied_answer(question, scene_words)
+            if answer is not None:
+                plan.implied[question] = answer
+                plan.sources[question] = source
+            elif question in questions or len(plan.to_run) < budget:
+                plan.to_run.append(question)
+            else:
+                continue
+            plan.questions.append(question)
+        return plan
+
+
+# Shared planner for this process
+planner = QuestionPlanner()
@@ -0,0 +1,73 @@
+#question_sets.py
+
+"""
+Configured questions tokenized once into fixed-length VQA input rows. Every
+image asks questions from the same configured sets, so each question's padded
+input_ids/attention_mask row is built at startup, and the input block for any
+list of questions (a whole set, the planner's subset, the ones missing from
+the result cache) is assembled by stacking rows instead of re-tokenizing.
+The fixed length also matches the exported VQA graph's 40-token input, so
+every request runs with the same shapes.
+"""
+
+import threading
+
+import numpy as np
+
+from config import VQA_CONFIG, QUESTION_SETS, SUGGESTED_QUESTIONS
+
+
+def tokenize_questions(tokenizer, questions, max_length=VQA_CONFIG["max_length"]):
+    """input_ids and attention_mask (len(questions), max_length) as int64 numpy arrays"""
+    tokens = tokenizer(
+        list(questions),
+        return_tensors="np",
+        padding="max_length",
+        max_length=max_length,
+        truncation=True
+    )
+    return {
+        "input_ids": tokens["input_ids"].astype(np.int64),
+        "attention_mask": tokens["attention_mask"].astype(np.int64)
+    }
+
+
+class QuestionSets:
+    def __init__(self, question_sets=None, max_length=VQA_CONFIG["max_length"]):
+        self.question_sets = question_sets or {**SUGGESTED_QUESTIONS, **QUESTION_SETS}
+        self.max_length = max_length
+        self._rows = {}  # (tokenizer name, question) -> input block of one row
+        self._lock = threading.Lock()
+
+    def compile(self, tokenizer):
+        """Tokenize every configured question for this tokenizer (once per process)"""
+        name = tokenizer.name_or_path
+        with self._lock:
+            questions = list(dict.fromkeys(
+                question for questions in self.question_sets.values() for question in questions
+                if (name, question) not in self._rows
+            ))
+            if not questions:
+                return
+            block = tokenize_questions(tokenizer, questions, self.max_length)
+            for i, question in enumerate(questions):
+                self._rows[(name, question)] = {key: array[i:i + 1] for key, array in block.items()}
+
+    def inputs(self, tokenizer, questions):
+        """
+        Input block for a list of questions: precompiled rows for configured
+        questions, the others (e.g. a user's own question) tokenized now
+        """
+        self.compile(tokenizer)
+        name = tokenizer.name_or_path
+        rows = [self._rows.get((name, question)) for question in questions]
+        other = [question for question, row in zip(questions, rows) if row is None]
+        if other:
+            block = tokenize_questions(tokenizer, other, self.max_length)
+            tokenized = iter([{key: array[i:i + 1] for key, array in block.items()} for i in range(len(other))])
+            rows = [row if row is not None else next(tokenized) for row in rows]
+        return {key: np.concatenate([row[key] for row in rows]) for key in ("input_ids", "attention_mask")}
+
+
+# Shared question sets for this process
+question_sets = QuestionSets()
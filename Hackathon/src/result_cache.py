@@ -0,0 +1,205 @@
+#result_cache.py
+
+"""
+Content-addressed cache of model results: captions, scene labels and VQA
+answers, keyed by the image's byte hash, the model id and version, and the
+question. A photo that is re-sent, seen again by the watcher or re-uploaded
+costs a hash and a lookup instead of the whole pipeline.
+
+Two tiers: an in-memory LRU in front of a SQLite file that survives
+restarts and is shared by the prefork workers. Both have size limits; the
+least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import ONNX_CONFIG, RESULT_CACHE_CONFIG
+from inference_backends import MODEL_EXTENSIONS
+
+# Exported files each task's backend may load (the caption backend uses the
+# KV-cache decoder graphs instead of the plain decoder when they exist)
+_EXPORTED_MODELS = {
+    "caption": ("caption_vision_model", "caption_decoder_model",
+                "caption_decoder_prefill_model", "caption_decoder_step_model"),
+    "vqa": ("vqa_model",),
+    "scene": ("scene_model",),
+}
+
+
+def model_version(model_name):
+    """
+    Version of a registry model for cache keys: for '<engine>/<task>' models a
+    hash of model_dir and the size and mtime of every exported file the task
+    can load (re-exporting or quantizing any graph invalidates their
+    results), else the configured version of the Hugging Face weights
+    """
+    engine, _, task = model_name.partition("/")
+    if engine not in MODEL_EXTENSIONS or task not in _EXPORTED_MODELS:
+        return RESULT_CACHE_CONFIG["version"]
+
+    model_dir = ONNX_CONFIG["model_dir"]
+    files = []
+    for config_key in _EXPORTED_MODELS[task]:
+        path = os.path.join(model_dir, ONNX_CONFIG[config_key])
+        path = os.path.splitext(path)[0] + MODEL_EXTENSIONS[engine]
+        if os.path.exists(path):
+            stat = os.stat(path)
+            files.append([config_key, stat.st_size, stat.st_mtime_ns])
+        else:
+            files.append([config_key, None, None])
+    digest = hashlib.sha1(json.dumps([os.path.abspath(model_dir), files]).encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, db_path=RESULT_CACHE_CONFIG["db_path"],
+                 memory_entries=RESULT_CACHE_CONFIG["memory_entries"],
+                 max_disk_mb=RESULT_CACHE_CONFIG["max_disk_mb"],
+                 enabled=RESULT_CACHE_CONFIG["enabled"]):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.enabled = enabled
+        self._memory = OrderedDict()  # key -> value, oldest first
+        self._versions = {}
+        self._db = None
+        self._db_pid = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        # Opened on first use in each process, so prefork workers get their own
+        if self._db is None or self._db_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def key(self, kind, model_name, image_key, extra=""):
+        """Cache key for one result, e.g. ("vqa", model, image hash, question)"""
+        version = self._versions.get(model_name)
+        if version is None:
+            version = self._versions[model_name] = model_version(model_name)
+        return json.dumps([kind, model_name, version, image_key, extra])
+
+    def get(self, kind, model_name, image_key, extra=""):
+        """The cached result, or None"""
+        if not self.enabled:
+            return None
+        key = self.key(kind, model_name, image_key, extra)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            try:
+                db = self._connection()
+                row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    db.commit()
+            except sqlite3.Error as e:
+                print(f"Result cache lookup failed: {e}")
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            value = json.loads(row[0])
+            self._remember(key, value)
+            return value
+
+    def put(self, kind, model_name, image_key, value, extra=""):
+        """Store a JSON-serializable result in both tiers"""
+        if not self.enabled:
+            return
+        key = self.key(kind, model_name, image_key, extra)
+        encoded = json.dumps(value)
+        with self._lock:
+            self._remember(key, json.loads(encoded))
+            try:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, encoded, len(key) + len(encoded), time.time())
+                )
+                # Summing the file tier's size is a table scan, so check it now and then
+                self._writes += 1
+                if self._writes % 64 == 0:
+                    self._evict_disk(db)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Result cache write failed: {e}")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, db):
+        """Delete the least recently used rows while the file tier is over its limit"""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        freed = 0
+        rows = db.execute("SELECT key, size FROM results ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if freed >= excess:
+                break
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            freed += size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                db = self._connection()
+                db.execute("DELETE FROM results")
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Result cache clear failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            try:
+                disk_entries, disk_bytes = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+            except sqlite3.Error:
+                disk_entries, disk_bytes = 0, 0
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_mb": round(disk_bytes / (1024 * 1024), 2),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared cache for this process (the SQLite file is shared between processes)
+result_cache = ResultCache()
@@ -0,0 +1,44 @@
+#scene_classifier.py
+
+import os
+
+from config import SCENE_CONFIG, MODEL_REGISTRY_CONFIG, ONNX_CONFIG
+from inference_backends import TorchBackend, create_backend
+from onnx_vqa import softmax
+from preprocessing import preprocess
+
+
+class SceneClassifier:
+    """
+    ResNet-50 scene detection on any inference engine: the eager model
+    (engine="torch") or the exported scene_model graph.
+    """
+
+    def __init__(self, engine="torch", model=None, model_dir=ONNX_CONFIG["model_dir"],
+                 model_name=SCENE_CONFIG["model_name"], local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]):
+        from transformers import AutoConfig
+
+        self.model = model
+        if engine == "torch":
+            self.backend = TorchBackend(model, ["pixel_values"], ["logits"])
+            self.id2label = model.config.id2label
+        else:
+            scene_path = os.path.join(model_dir, ONNX_CONFIG["scene_model"])
+            self.backend = create_backend(engine, scene_path, ["pixel_values"], ["logits"])
+            self.id2label = AutoConfig.from_pretrained(model_name, local_files_only=local_files_only).id2label
+
+    def preprocess(self, image):
+        """224x224 normalized pixel values for a PIL image"""
+        return preprocess("resnet", [image])
+
+    def classify(self, image):
+        """Return (label, score) of the most likely scene for a PIL image"""
+        return self.classify_pixels(self.preprocess(image))
+
+    def classify_pixels(self, pixel_values):
+        """classify() for already preprocessed pixel values"""
+        # The logits are only read here, so they can go to a reused buffer
+        logits = self.backend.run({"pixel_values": pixel_values}, bind_slot=0)["logits"]
+        probs = softmax(logits)[0]
+        idx = int(probs.argmax())
+        return self.id2label[idx], float(probs[idx])
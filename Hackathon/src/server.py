@@ -1,25 +1,65 @@
 # server.py
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 import os
-from Hackathon.src.models.optimized_models import OptimizedModelHandler
-from Hackathon.handlers.accessibility_handler import AccessibilityHandler
+import tempfile
+from tts_cache import gtts_speech, tts_cache
+from optimized_models import OptimizedModelHandler
+from accessibility_handler import AccessibilityHandler
+from vqa_handler import VQAHandler
+from config import QUESTION_SETS, PROGRESSIVE_CONFIG
+from model_preloader import preloader, start_preload
+from prefork import is_prefork_parent, load_shared_models, memory_usage
+from embedding_cache import embedding_cache
+from result_cache import result_cache
+from micro_batching import batching_stats
+from stage_executor import StageGraph
+from async_inference import inference
+from image_context import ImageContext
+from near_duplicates import analyze, iter_analysis, near_duplicates
+from progressive_audio import caption_first, ERROR_MESSAGE
+from question_planner import planner
 
 app = Flask(__name__)
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize handlers globally
+# Initialize handlers globally (models are shared through the model registry)
 model_handler = OptimizedModelHandler()
 accessibility_handler = AccessibilityHandler()
 vqa_handler = VQAHandler()
 
+# Caption and scene detection run in parallel; VQA waits for the questions
+# they answer (or only the fast scene label, see QUESTION_PLANNER_CONFIG)
+analysis = StageGraph()
+analysis.add("caption", model_handler.generate_caption)
+analysis.add("scene", inference.limited("scene", accessibility_handler.detect_scene))
+analysis.add("vqa", lambda image, scene, caption=None: model_handler.answer_planned_questions(
+    image, QUESTION_SETS["overview"], scene, caption
+), deps=planner.deps)
+
+# Load and warm up models in the background; /health reports readiness.
+# Under gunicorn_conf.py the master loads them before forking so workers share the weights.
+if is_prefork_parent():
+    load_shared_models()
+else:
+    start_preload()
+
 def generate_audio(text, lang='en'):
-    """Generate audio from text using gTTS"""
-    tts = gTTS(text=text, lang=lang)
+    """Generate audio from text using gTTS (repeated texts come from the audio cache)"""
     with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-        tts.save(fp.name)
-        return fp.name
+        return gtts_speech(text, fp.name, lang)
+
+@app.route('/health', methods=['GET'])
+def health():
+    status = preloader.status()
+    status['memory'] = memory_usage()
+    status['embedding_cache'] = embedding_cache.stats()
+    status['result_cache'] = result_cache.stats()
+    status['near_duplicates'] = near_duplicates.stats()
+    status['tts_cache'] = tts_cache.stats()
+    status['batching'] = batching_stats()
+    return jsonify(status), (200 if status['ready'] else 503)
 
 @app.route('/analyze_image', methods=['POST'])
 def analyze_image():
@@ -35,29 +75,23 @@ def analyze_image():
         image_path = os.path.join(UPLOAD_FOLDER, file.filename)
         file.save(image_path)
 
-        # Generate basic caption
-        caption = model_handler.generate_caption(image_path)
-
-        # Get scene information
-        scene_type, scene_confidence = accessibility_handler.detect_scene(image_path)
+        # Frames are matched only against the same session's recent images;
+        # clients that send no session id are always analyzed afresh
+        session_id = request.form.get('session_id') or request.headers.get('X-Session-Id')
+        recent = near_duplicates.get(session_id) if session_id else None
 
-        # Generate initial VQA results for key aspects
-        initial_questions = [
-            "What is in the foreground?",
-            "What is in the background?",
-            "What are the main colors?",
-            "Is it indoor or outdoor?",
-            "What is the lighting like?"
-        ]
+        # Progressive mode (opt-in) streams the caption's audio first, then the details
+        progressive = request.args.get('progressive', str(PROGRESSIVE_CONFIG['http']))
+        if progressive.lower() in ('1', 'true', 'yes'):
+            return progressive_audio(image_path, recent)
 
-        vqa_results = {}
-        for question in initial_questions:
-            result = model_handler.answer_question(image_path, question)
-            vqa_results[question] = result
+        # Caption, scene information and VQA results for key aspects (run in parallel)
+        # The image is decoded once and shared by every stage
+        results = analyze(analysis, ImageContext(image_path), recent)
 
         # Generate detailed description
         detailed_description = accessibility_handler.generate_detailed_description(
-            caption, (scene_type, scene_confidence), vqa_results
+            results['caption'], results['scene'], results['vqa']
         )
 
         # Convert description to speech
@@ -68,6 +102,43 @@ def analyze_image():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def description_audio(image_path, recent=None):
+    """Yield the description's audio one segment at a time, caption first, as the stages finish"""
+    for stage, result in caption_first(iter_analysis(analysis, ImageContext(image_path), recent)):
+        text = accessibility_handler.description_segment(stage, result)
+        if not text:
+            continue
+        audio_path = generate_audio(text)
+        with open(audio_path, 'rb') as f:
+            audio_data = f.read()
+        os.remove(audio_path)
+        yield audio_data
+
+def progressive_audio(image_path, recent=None):
+    """
+    Stream the description's audio as the stages finish. The MP3 segments
+    concatenate into one stream, so any player can start on the caption while
+    the details are still being computed. The caption's segment is made before
+    the response starts, so an analysis that fails outright still gets a 500;
+    a later failure ends the stream with a spoken error message.
+    """
+    segments = description_audio(image_path, recent)
+    first = next(segments, b"")
+
+    def stream():
+        yield first
+        try:
+            yield from segments
+        except Exception as e:
+            # Headers are already sent; say that the description is incomplete
+            print(f"Error streaming description: {e}")
+            audio_path = generate_audio(ERROR_MESSAGE)
+            with open(audio_path, 'rb') as f:
+                yield f.read()
+            os.remove(audio_path)
+
+    return Response(stream_with_context(stream()), mimetype='audio/mpeg')
+
 @app.route('/ask_question', methods=['POST'])
 def ask_question():
     data = request.json
@@ -0,0 +1,104 @@
+#stage_executor.py
+
+"""
+Small dependency-graph executor for the per-image pipeline. Caption, scene
+detection and VQA do not depend on each other, so they run in parallel and a
+request takes about as long as its slowest stage instead of the sum; stages
+that need their results (e.g. the description) run once those are done.
+
+Each stage has a torch thread budget so parallel stages share the cores
+instead of each starting a full-size intra-op pool.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import STAGE_CONFIG
+
+
+def limit_threads(num_threads):
+    """
+    Cap torch intra-op threads for the calling thread. With OpenMP (the
+    default CPU build) the setting applies to the thread that makes it.
+    """
+    if not num_threads:
+        return
+    import torch
+    if torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+
+class Stage:
+    def __init__(self, name, func, deps, threads, optional):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.threads = threads
+        self.optional = optional
+
+
+class StageGraph:
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, func, deps=(), threads=None, optional=False):
+        """
+        Add a stage. func is called with the run() arguments plus one keyword
+        argument per dependency holding its result. threads defaults to the
+        budget in STAGE_CONFIG; an optional stage that fails yields None.
+        """
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        if threads is None:
+            threads = STAGE_CONFIG["threads"].get(name)
+        self.stages[name] = Stage(name, func, deps, threads, optional)
+        return self
+
+    def _run_stage(self, stage, args, dep_results):
+        limit_threads(stage.threads)
+        try:
+            return stage.func(*args, **dep_results)
+        except Exception as e:
+            if not stage.optional:
+                raise
+            print(f"Stage {stage.name} failed: {e}")
+            return None
+
+    def run(self, *args):
+        """Run every stage, each as soon as its dependencies finish. Returns {stage: result}."""
+        return dict(self.iter_results(*args))
+
+    def iter_results(self, *args):
+        """Run every stage like run(), yielding (stage, result) pairs as stages finish"""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        pool = _executor()
+
+        while pending or running:
+            # Start every stage whose dependencies are done
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    dep_results = {dep: results[dep] for dep in stage.deps}
+                    running[pool.submit(self._run_stage, stage, args, dep_results)] = name
+                    del pending[name]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                yield name, results[name]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    # Created on first use, so prefork workers each get their own threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(STAGE_CONFIG["max_workers"], thread_name_prefix="stage")
+        return _pool
@@ -42,11 +42,19 @@ async def test_connection():
             )
             print("Image sent!")
             
-            # Wait for response
+            # Wait for response: audio segments (8-byte size, then MP3 data),
+            # caption first, ended by a zero size
             print("Waiting for response...")
-            response = await client.read_gatt_char("audio_characteristic_uuid")
+            response = b""
+            while True:
+                segment = await client.read_gatt_char("audio_characteristic_uuid")
+                audio_size = int.from_bytes(segment[:8], 'big')
+                if audio_size == 0:
+                    break
+                response += segment[8:8 + audio_size]
+                print(f"Received audio segment ({audio_size} bytes)")
             
-            # Save audio
+            # Save audio (the MP3 segments play back to back as one file)
             with open("response.mp3", "wb") as f:
                 f.write(response)
             print("Response received and saved!")
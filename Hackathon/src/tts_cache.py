@@ -0,0 +1,142 @@
+#tts_cache.py
+
+"""
+Disk cache of synthesized speech. Many utterances repeat (the same caption,
+"It appears to be a beach scene.", fixed answer templates), and TTS is one of
+the slowest stages, so audio is stored by a hash of (text, voice, format) and
+copied to the caller's path on a hit. Least recently used files are deleted
+when the cache grows past its byte quota.
+
+Every TTS call site goes through edge_speech (Edge TTS) or gtts_speech (gTTS).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from config import TTS_CACHE_CONFIG
+
+
+class AudioCache:
+    def __init__(self, cache_dir=TTS_CACHE_CONFIG["cache_dir"], max_mb=TTS_CACHE_CONFIG["max_mb"],
+                 enabled=TTS_CACHE_CONFIG["enabled"]):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.enabled = enabled
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, text, voice, audio_format):
+        digest = hashlib.sha1(json.dumps([text, voice, audio_format]).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{audio_format}")
+
+    def fetch(self, text, voice, audio_format, audio_path):
+        """Copy the cached audio to audio_path; False on a miss"""
+        if not self.enabled:
+            return False
+        cached = self._path(text, voice, audio_format)
+        try:
+            shutil.copyfile(cached, audio_path)
+            os.utime(cached)  # mark as recently used
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, text, voice, audio_format, audio_path):
+        """Add the audio file at audio_path to the cache"""
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = self._path(text, voice, audio_format)
+        # Written under a temporary name so readers never see a partial file
+        partial = f"{cached}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(audio_path, partial)
+        os.replace(partial, cached)
+        with self._lock:
+            self._writes += 1
+            check = self._writes % 32 == 1
+        if check:
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used files while the cache is over its quota"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def speak(self, text, voice, audio_format, audio_path, synthesize):
+        """Write speech for text to audio_path, calling synthesize(audio_path) only on a miss"""
+        if self.fetch(text, voice, audio_format, audio_path):
+            return audio_path
+        synthesize(audio_path)
+        self.store(text, voice, audio_format, audio_path)
+        return audio_path
+
+    async def speak_async(self, text, voice, audio_format, audio_path, synthesize):
+        """speak() for a coroutine function synthesize"""
+        if self.fetch(text, voice, audio_format, audio_path):
+            return audio_path
+        await synthesize(audio_path)
+        self.store(text, voice, audio_format, audio_path)
+        return audio_path
+
+    def stats(self):
+        files, size = 0, 0
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    files += 1
+                    size += entry.stat().st_size
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "files": files,
+                "size_mb": round(size / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared cache for this process (the files are shared between processes)
+tts_cache = AudioCache()
+
+
+async def edge_speech(text, voice, audio_path):
+    """Edge TTS speech for text in audio_path (MP3), from the cache when possible"""
+    import edge_tts
+
+    async def synthesize(path):
+        await edge_tts.Communicate(text, voice).save(path)
+
+    return await tts_cache.speak_async(text, f"edge:{voice}", "mp3", audio_path, synthesize)
+
+
+def gtts_speech(text, audio_path, lang='en'):
+    """gTTS speech for text in audio_path (MP3), from the cache when possible"""
+    from gtts import gTTS
+
+    return tts_cache.speak(
+        text, f"gtts:{lang}", "mp3", audio_path, lambda path: gTTS(text=text, lang=lang).save(path)
+    )
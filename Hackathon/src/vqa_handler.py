@@ -1,43 +1,167 @@
-from transformers import ViltProcessor, ViltForQuestionAnswering
-import torch
-from PIL import Image
+import numpy as np
+from config import VQA_CONFIG
+from embedding_cache import embedding_cache
+from image_context import image_context
+from inference_backends import model_id
+from micro_batching import get_batcher
+from model_registry import registry
+from onnx_vqa import top_k
+from preprocessing import preprocess
+from question_sets import question_sets
+from result_cache import result_cache
+
+
+def format_answers(top_predictions, id2label):
+    """Build the answer dict from (probability, label index) pairs, best first"""
+    results = []
+    for prob, idx in top_predictions:
+        results.append({
+            "answer": id2label[int(idx)],
+            "confidence": f"{float(prob):.2%}"
+        })
+
+    return {
+        "main_answer": results[0]["answer"],
+        "confidence": results[0]["confidence"],
+        "alternatives": results[1:]
+    }
+
+
+def image_inputs(context, model_name, backend):
+    """
+    ViLT image tensors for an ImageContext, computed once per image (by
+    content) and reused by follow-up questions, which then only tokenize the
+    question
+    """
+    def preprocess_image(image):
+        if backend != "torch":
+            return registry.get(model_name)[1].preprocess_image(image)
+
+        import torch
+
+        # One image needs no padding, so its pixel mask is all ones
+        pixel_values = torch.from_numpy(preprocess("vilt", [image]))
+        pixel_mask = torch.ones((1,) + pixel_values.shape[2:], dtype=torch.long)
+        return {"pixel_values": pixel_values, "pixel_mask": pixel_mask}
+
+    return embedding_cache.get_or_compute(
+        (model_name, context.key), lambda: context.tensor(("vilt", backend), preprocess_image)
+    )
+
+
+def _pad_pixel_inputs(pixel_inputs, counts):
+    """
+    Stack per-image ViLT tensors into one batch, repeating each image for its
+    questions. Images of different sizes are zero-padded bottom/right and the
+    padding is masked out in pixel_mask, as the ViLT processor does for batches.
+    """
+    import torch
+
+    height = max(inputs["pixel_values"].shape[2] for inputs in pixel_inputs)
+    width = max(inputs["pixel_values"].shape[3] for inputs in pixel_inputs)
+    pixel_values, pixel_mask = [], []
+    for inputs, count in zip(pixel_inputs, counts):
+        values, mask = inputs["pixel_values"], inputs["pixel_mask"]
+        padding = (0, width - values.shape[3], 0, height - values.shape[2])
+        pixel_values.append(torch.nn.functional.pad(values, padding).expand(count, -1, -1, -1))
+        pixel_mask.append(torch.nn.functional.pad(mask, padding).expand(count, -1, -1))
+    return {"pixel_values": torch.cat(pixel_values), "pixel_mask": torch.cat(pixel_mask)}
+
+
+def vqa_logits(requests, model_name, backend):
+    """
+    Answer logits for a batch of (ImageContext, questions) requests, computed in
+    one forward pass over every question row. Returns one (n, num_answers)
+    array per request.
+    """
+    processor, model = registry.get(model_name)
+    counts = [len(questions) for _, questions in requests]
+    pixel_inputs = [image_inputs(context, model_name, backend) for context, _ in requests]
+    # Configured question sets are tokenized once; all blocks have the same fixed length
+    blocks = [question_sets.inputs(processor.tokenizer, questions) for _, questions in requests]
+    question_inputs = {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+
+    if backend != "torch":
+        # The exported graph takes fixed 384x384 images, so rows stack directly
+        pixel_values = np.concatenate([
+            np.repeat(pixels, count, axis=0) for pixels, count in zip(pixel_inputs, counts)
+        ])
+        logits = model.predict_batch(pixel_values, question_inputs)
+    else:
+        import torch  # deferred so importing the handler stays cheap
+
+        inputs = {name: torch.from_numpy(array) for name, array in question_inputs.items()}
+        inputs.update(_pad_pixel_inputs(pixel_inputs, counts))
+        with torch.no_grad():
+            logits = model(**inputs).logits.numpy()
+
+    return np.split(logits, np.cumsum(counts)[:-1])
+
+
+def predict_batch(image, questions, model_name, backend, k):
+    """
+    Top-k (probability, label index) pairs for each question about one image
+    (path or ImageContext). Answers seen before come from the result cache;
+    the other questions go through the model's micro-batching queue, so
+    concurrent requests (for any image) share one forward pass. Returns
+    (predictions, id2label).
+    """
+    context = image_context(image)
+    predictions = {}
+    for question in questions:
+        cached = result_cache.get("vqa", model_name, context.key, f"top{k}:{question}")
+        if cached is not None:
+            predictions[question] = cached
+
+    missing = [question for question in questions if question not in predictions]
+    if missing:
+        # Image tensors are built here (and cached for the batch), so a
+        # corrupt upload fails its own request and not the batch
+        image_inputs(context, model_name, backend)
+        batcher = get_batcher("vqa", model_name, lambda requests: vqa_logits(requests, model_name, backend))
+        logits = batcher((context, missing))
+        for question, row in zip(missing, logits):
+            predictions[question] = [(float(prob), int(idx)) for prob, idx in top_k(row[None], k)]
+            result_cache.put("vqa", model_name, context.key, predictions[question], f"top{k}:{question}")
+
+    model = registry.get(model_name)[1]
+    id2label = model.id2label if backend != "torch" else model.config.id2label
+    return [predictions[question] for question in questions], id2label
+
 
 class VQAHandler:
-    def __init__(self):
-        # Initialize VQA model
-        self.processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-        self.model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
+    def __init__(self, model_name=None):
+        # VQA model is shared through the model registry; the inference
+        # engine is selected in VQA_CONFIG
+        self.backend = VQA_CONFIG["backend"]
+        self.model_name = model_name or model_id("vqa", self.backend, VQA_CONFIG["model_name"])
+        self.num_answers = VQA_CONFIG["top_k"]
+        registry.acquire(self.model_name)
+
+    @property
+    def processor(self):
+        return registry.get(self.model_name)[0]
+
+    @property
+    def model(self):
+        return registry.get(self.model_name)[1]
+
+    def close(self):
+        """Release the shared VQA model"""
+        registry.release(self.model_name)
         
-    def get_answer(self, image_path: str, question: str) -> dict:
+    def get_answer(self, image, question: str) -> dict:
         """
-        Get answer for a question about an image
+        Get answer for a question about an image (path or ImageContext)
         """
-        # Load and preprocess image
-        image = Image.open(image_path).convert('RGB')
-        
-        # Prepare inputs
-        inputs = self.processor(image, question, return_tensors="pt")
-        
-        # Get prediction
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
-            
-            # Get top 3 predictions
-            top_probs, top_indices = torch.topk(probs[0], 3)
-            
-            results = []
-            for prob, idx in zip(top_probs, top_indices):
-                answer = self.model.config.id2label[idx.item()]
-                confidence = prob.item()
-                results.append({
-                    "answer": answer,
-                    "confidence": f"{confidence:.2%}"
-                })
-                
-        return {
-            "main_answer": results[0]["answer"],
-            "confidence": results[0]["confidence"],
-            "alternatives": results[1:]
-        } 
\ No newline at end of file
+        return self.get_answers(image, [question])[0]
+
+    def get_answers(self, image, questions: list) -> list:
+        """
+        Get answers for several questions about an image in one forward pass
+        (one answer dict per question, in order)
+        """
+        predictions, id2label = predict_batch(
+            image, questions, self.model_name, self.backend, self.num_answers
+        )
+        return [format_answers(top_predictions, id2label) for top_predictions in predictions]
@@ -0,0 +1,71 @@
+#test_micro_batching.py
+# Micro-batching with a stand-in model function
+
+import pytest
+
+from micro_batching import MicroBatcher
+
+
+class FakeModel:
+    """Upper-cases a batch of strings; any "bad" item fails the whole batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("bad input")
+        return [item.upper() for item in items]
+
+
+def make_batcher(model, **kwargs):
+    options = {"max_batch_size": 8, "max_wait_ms": 200, "enabled": True}
+    options.update(kwargs)
+    return MicroBatcher("fake", model, **options)
+
+
+def test_concurrent_requests_run_as_one_batch():
+    model = FakeModel()
+    batcher = make_batcher(model)
+    futures = [batcher.submit(item) for item in ("a", "b", "c")]
+    assert [future.result(timeout=5) for future in futures] == ["A", "B", "C"]
+    assert model.batches == [["a", "b", "c"]]
+    assert batcher.stats()["batch_sizes"] == {3: 1}
+
+
+def test_batch_size_limit():
+    model = FakeModel()
+    batcher = make_batcher(model, max_batch_size=2)
+    futures = [batcher.submit(item) for item in ("a", "b", "c")]
+    assert [future.result(timeout=5) for future in futures] == ["A", "B", "C"]
+    assert model.batches == [["a", "b"], ["c"]]
+
+
+def test_failed_batch_is_retried_one_at_a_time():
+    model = FakeModel()
+    batcher = make_batcher(model)
+    futures = [batcher.submit(item) for item in ("a", "bad", "c")]
+    assert futures[0].result(timeout=5) == "A"
+    assert futures[2].result(timeout=5) == "C"
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert model.batches == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+    # Retries are not counted as batches
+    assert batcher.stats()["batches"] == 1
+
+
+def test_wrong_result_count_fails_only_its_request():
+    batcher = make_batcher(lambda items: [] if "empty" in items else items)
+    futures = [batcher.submit(item) for item in ("a", "empty")]
+    assert futures[0].result(timeout=5) == "a"
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=5)
+
+
+def test_disabled_runs_each_request_at_once():
+    model = FakeModel()
+    batcher = make_batcher(model, enabled=False)
+    assert batcher("a") == "A"
+    assert batcher("b") == "B"
+    assert model.batches == [["a"], ["b"]]
@@ -0,0 +1,40 @@
+#test_model_registry.py
+# Loads every registered model id through the registry:
+#   cd Hackathon && python -m pytest tests
+
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from config import SCENE_CONFIG
+from inference_backends import MODEL_EXTENSIONS, model_id as registry_id
+from model_registry import registry
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+MODEL_IDS = sorted(registry.stats())
+# The scene classifier does its own preprocessing, so it has no processor
+SCENE_IDS = {SCENE_CONFIG["model_name"]} | {
+    registry_id("scene", engine, SCENE_CONFIG["model_name"]) for engine in MODEL_EXTENSIONS
+}
+
+
+@pytest.mark.parametrize("model_id", MODEL_IDS)
+def test_load_registered_model(model_id, monkeypatch):
+    monkeypatch.chdir(SRC_DIR)  # exported graphs live under ONNX_CONFIG["model_dir"]
+    try:
+        processor, model = registry.get(model_id)
+    except OSError as e:
+        # Weights not downloaded / graph not exported (convert_models.py) on this machine
+        pytest.skip(f"{model_id} not available: {e}")
+    except NotImplementedError as e:
+        # The dlc engine is a stub
+        pytest.skip(str(e))
+    try:
+        assert model is not None
+        if model_id not in SCENE_IDS:
+            assert processor is not None
+    finally:
+        registry.unload(model_id)
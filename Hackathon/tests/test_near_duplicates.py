@@ -0,0 +1,101 @@
+#test_near_duplicates.py
+# Near-duplicate frame suppression, without any model
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+import near_duplicates
+from image_context import ImageContext
+from near_duplicates import ClientIndexes, NearDuplicateIndex, analyze, dhash
+
+
+class FakeStages:
+    """Stands in for a StageGraph: one "caption" stage that counts its runs"""
+
+    def __init__(self):
+        self.runs = 0
+
+    def iter_results(self, context):
+        self.runs += 1
+        yield "caption", f"caption {self.runs}"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(near_duplicates.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def gradient(offset=0):
+    """A horizontal gradient, brightening left to right"""
+    row = np.linspace(offset, 200 + offset, 64).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(np.tile(row, (48, 1))).convert("RGB")
+
+
+def test_dhash_ignores_small_brightness_changes():
+    assert dhash(gradient()) == dhash(gradient(offset=10))
+    assert dhash(gradient()) != dhash(gradient().transpose(Image.FLIP_LEFT_RIGHT))
+
+
+def test_same_client_reuses_results(clock):
+    stages, recent = FakeStages(), NearDuplicateIndex(max_distance=6, window_s=10, enabled=True)
+    first = analyze(stages, ImageContext(image=gradient()), recent)
+    clock.now += 5
+    second = analyze(stages, ImageContext(image=gradient(offset=10)), recent)
+    assert second == first
+    assert stages.runs == 1
+    assert recent.hits == 1
+
+
+def test_clients_never_share_results(clock):
+    stages = FakeStages()
+    indexes = ClientIndexes(max_clients=4)
+    first = analyze(stages, ImageContext(image=gradient()), indexes.get("alice"))
+    second = analyze(stages, ImageContext(image=gradient()), indexes.get("bob"))
+    assert second != first
+    assert stages.runs == 2
+
+
+def test_no_index_always_analyzes(clock):
+    stages = FakeStages()
+    analyze(stages, ImageContext(image=gradient()))
+    analyze(stages, ImageContext(image=gradient()))
+    assert stages.runs == 2
+
+
+def test_window_cutoff(clock):
+    stages, recent = FakeStages(), NearDuplicateIndex(max_distance=6, window_s=10, enabled=True)
+    analyze(stages, ImageContext(image=gradient()), recent)
+    clock.now += 10.5
+    analyze(stages, ImageContext(image=gradient()), recent)
+    assert stages.runs == 2
+
+
+def test_distance_cutoff(clock):
+    recent = NearDuplicateIndex(max_distance=6, window_s=10, enabled=True)
+    recent.add(0, {"caption": "dark"})
+    assert recent.find(0b111111) == {"caption": "dark"}
+    assert recent.find(0b1111111) is None
+
+
+def test_least_recent_client_dropped():
+    indexes = ClientIndexes(max_clients=2)
+    alice = indexes.get("alice")
+    indexes.get("bob")
+    indexes.get("alice")
+    indexes.get("carol")
+    assert indexes.get("alice") is alice
+    assert indexes.stats()["clients"] == 2
@@ -0,0 +1,44 @@
+#test_preprocessing.py
+# preprocessing.py against the Hugging Face image processors it replaces
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+transformers = pytest.importorskip("transformers")
+
+from PIL import Image
+
+from config import CAPTION_CONFIG, MODEL_REGISTRY_CONFIG, SCENE_CONFIG, VQA_CONFIG
+from preprocessing import preprocess
+
+TOLERANCE = 1e-5
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images", "test_images")
+IMAGES = sorted(f for f in os.listdir(IMAGE_DIR) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+MODELS = {
+    "blip": CAPTION_CONFIG["model_name"],
+    "vilt": VQA_CONFIG["model_name"],
+    "resnet": SCENE_CONFIG["model_name"],
+}
+
+
+@pytest.fixture(scope="module", params=sorted(MODELS))
+def processor(request):
+    try:
+        return request.param, transformers.AutoImageProcessor.from_pretrained(
+            MODELS[request.param], local_files_only=MODEL_REGISTRY_CONFIG["local_files_only"]
+        )
+    except OSError as e:
+        pytest.skip(f"{MODELS[request.param]} processor config not available: {e}")
+
+
+@pytest.mark.parametrize("filename", IMAGES)
+def test_matches_hf_processor(processor, filename):
+    model, image_processor = processor
+    image = Image.open(os.path.join(IMAGE_DIR, filename)).convert("RGB")
+    expected = image_processor(images=image, return_tensors="np")["pixel_values"]
+    actual = preprocess(model, [image])
+    assert actual.shape == expected.shape
+    assert np.abs(expected - actual).max() <= TOLERANCE
@@ -0,0 +1,78 @@
+#test_question_planner.py
+# Which VQA questions the planner skips, without any model
+
+from config import QUESTION_SETS
+from question_planner import QuestionPlanner
+
+BASIC = QUESTION_SETS["basic"]
+ACCESSIBILITY = QUESTION_SETS["accessibility"]
+
+
+def make_planner(**kwargs):
+    options = {"enabled": True, "max_questions": 6, "min_scene_confidence": 0.5, "wait_for_caption": True}
+    options.update(kwargs)
+    return QuestionPlanner(**options)
+
+
+def test_caption_answers_people():
+    plan = make_planner().plan(ACCESSIBILITY, caption="a man riding a bike down a street")
+    assert plan.implied["Are there any people?"] == "yes"
+    assert plan.sources["Are there any people?"] == "caption"
+    assert plan.implied["Is it indoor or outdoor?"] == "outdoor"
+    assert "Are there any people?" not in plan.to_run
+
+
+def test_without_caption_people_question_runs():
+    plan = make_planner().plan(ACCESSIBILITY, scene=("lakeside", 0.9))
+    assert "Are there any people?" in plan.to_run
+    assert plan.implied == {"Is it indoor or outdoor?": "outdoor"}
+    assert plan.sources == {"Is it indoor or outdoor?": "scene"}
+
+
+def test_unconfident_scene_is_ignored():
+    plan = make_planner().plan(BASIC, scene=("lakeside", 0.2))
+    assert plan.to_run == BASIC
+    assert plan.implied == {}
+
+
+def test_main_subject_is_never_dropped():
+    plan = make_planner().plan(BASIC, scene=("kitchen", 0.9), caption="a man cooking in a kitchen")
+    assert "What is the main subject?" in plan.to_run
+    answers = plan.answers({question: "vqa" for question in plan.to_run})
+    assert list(answers) == BASIC
+
+
+def test_fixed_questions_run_beyond_budget():
+    plan = make_planner(max_questions=2).plan(ACCESSIBILITY)
+    assert plan.to_run == ACCESSIBILITY
+
+
+def test_category_questions_fill_freed_slots():
+    plan = make_planner().plan(BASIC, scene=("alp", 0.9))
+    assert plan.implied == {"Is this indoors or outdoors?": "outdoors"}
+    # One slot freed: the first nature question takes it
+    assert plan.to_run == ["What is the main subject?", "What colors are present?", "What kind of landscape is this?"]
+    assert plan.questions[-1] == "What kind of landscape is this?"
+
+
+def test_answers_keep_question_order():
+    plan = make_planner().plan(BASIC, caption="a kitchen with a stove")
+    answers = plan.answers(
+        {question: "vqa" for question in plan.to_run}, lambda answer, source: f"{answer} ({source})"
+    )
+    assert answers == {
+        "What is the main subject?": "vqa",
+        "What colors are present?": "vqa",
+        "Is this indoors or outdoors?": "indoors (caption)",
+    }
+
+
+def test_vqa_stage_deps():
+    assert make_planner().deps == ("caption", "scene")
+    assert make_planner(wait_for_caption=False).deps == ("scene",)
+
+
+def test_disabled_runs_everything():
+    plan = make_planner(enabled=False).plan(BASIC, scene=("alp", 0.9), caption="a man on a mountain")
+    assert plan.to_run == BASIC
+    assert plan.implied == {}
@@ -0,0 +1,104 @@
+#test_result_cache.py
+# Result cache tiers and model versions, without any model
+
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from config import ONNX_CONFIG, RESULT_CACHE_CONFIG
+from result_cache import ResultCache, model_version
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(db_path=str(tmp_path / "results.sqlite3"), memory_entries=2, max_disk_mb=1, enabled=True)
+
+
+def test_round_trip(cache):
+    cache.put("caption", "torch", "image", "a dog on a beach")
+    assert cache.get("caption", "torch", "image") == "a dog on a beach"
+    assert cache.get("caption", "torch", "other image") is None
+    assert cache.get("vqa", "torch", "image", "Are there any people?") is None
+
+
+def test_memory_tier_evicts_least_recently_used(cache):
+    cache.put("caption", "torch", "a", "first")
+    cache.put("caption", "torch", "b", "second")
+    cache.get("caption", "torch", "a")
+    cache.put("caption", "torch", "c", "third")
+    assert cache.stats()["memory_entries"] == 2
+
+    # "b" fell out of memory but is still on disk
+    assert cache.get("caption", "torch", "a") == "first"
+    assert cache.memory_hits == 2
+    assert cache.get("caption", "torch", "b") == "second"
+    assert cache.disk_hits == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "results.sqlite3"), memory_entries=1, max_disk_mb=0.01, enabled=True)
+    for i in range(128):
+        cache.put("caption", "torch", f"image {i}", "x" * 200)
+    # Eviction runs every 64 writes, the last one after the 128th
+    stats = cache.stats()
+    assert stats["disk_entries"] < 128
+    assert stats["disk_mb"] <= 0.01
+    # The newest entries survive
+    assert cache.get("caption", "torch", "image 127") is not None
+    assert ResultCache(db_path=cache.db_path, enabled=True).get("caption", "torch", "image 0") is None
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "results.sqlite3"), enabled=False)
+    cache.put("caption", "torch", "image", "a dog")
+    assert cache.get("caption", "torch", "image") is None
+
+
+def test_hugging_face_models_use_configured_version():
+    assert model_version("Salesforce/blip-image-captioning-base") == RESULT_CACHE_CONFIG["version"]
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(ONNX_CONFIG, "model_dir", str(tmp_path))
+    return tmp_path
+
+
+def export(model_dir, config_key, data, mtime):
+    path = model_dir / ONNX_CONFIG[config_key]
+    path.write_bytes(data)
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.mark.parametrize("config_key", [
+    "caption_vision_model", "caption_decoder_model", "caption_decoder_prefill_model", "caption_decoder_step_model"
+])
+def test_reexporting_any_caption_graph_changes_version(model_dir, config_key):
+    for key in ("caption_vision_model", "caption_decoder_model"):
+        export(model_dir, key, b"graph", 1_000_000_000)
+    before = model_version("onnx/caption")
+    assert model_version("onnx/caption") == before
+
+    export(model_dir, config_key, b"quantized", 2_000_000_000)
+    assert model_version("onnx/caption") != before
+
+
+def test_model_dir_is_part_of_version(model_dir, monkeypatch):
+    export(model_dir, "vqa_model", b"graph", 1_000_000_000)
+    before = model_version("onnx/vqa")
+    (model_dir / "int8").mkdir()
+    export(model_dir / "int8", "vqa_model", b"graph", 1_000_000_000)
+    monkeypatch.setitem(ONNX_CONFIG, "model_dir", str(model_dir / "int8"))
+    assert model_version("onnx/vqa") != before
+
+
+def test_new_version_misses_old_results(model_dir, tmp_path):
+    db_path = str(tmp_path / "results.sqlite3")
+    export(model_dir, "scene_model", b"graph", 1_000_000_000)
+    ResultCache(db_path=db_path, enabled=True).put("scene", "onnx/scene", "image", ["beach", 0.9])
+    assert ResultCache(db_path=db_path, enabled=True).get("scene", "onnx/scene", "image") == ["beach", 0.9]
+
+    export(model_dir, "scene_model", b"re-exported", 2_000_000_000)
+    assert ResultCache(db_path=db_path, enabled=True).get("scene", "onnx/scene", "image") is None
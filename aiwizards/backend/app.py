@@ -12,9 +12,13 @@ import os
 import asyncio
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-from models.image_captioning import generate_caption
-from models.visual_qa import answer_question
+from models.image_captioning import generate_caption_within, caption_batcher
+from models.visual_qa import answer_question, vqa_batcher
 from models.text_to_speech import text_to_speech
+from models.preload import load_models, start_preload, status as preload_status
+from models.embedding_cache import embedding_cache
+from utils.memory import memory_usage
+from utils.audio_cache import audio_cache
 
 app = Flask(__name__, static_folder="generated_audio")
 CORS(app, resources={r"/*": {"origins": "*"}})  # Allow all origins
@@ -28,6 +32,22 @@ UPLOAD_FOLDER = "uploaded_images"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 
+# Load and warm up models in the background; /health reports readiness.
+# Under gunicorn_conf.py the master loads them before forking so workers share the weights.
+if os.environ.get("AIWIZARDS_PREFORK") == "1":
+    load_models()
+else:
+    start_preload()
+
+@app.route("/health")
+def health():
+    status = preload_status()
+    status["memory"] = memory_usage()
+    status["embedding_cache"] = embedding_cache.stats()
+    status["batching"] = {"caption": caption_batcher.stats(), "vqa": vqa_batcher.stats()}
+    status["audio_cache"] = audio_cache.stats()
+    return jsonify(status), (200 if status["ready"] else 503)
+
 # Serve Audio Files Correctly
 @app.route("/generated_audio/<filename>")
 def serve_audio(filename):
@@ -48,7 +68,9 @@ def upload_image():
     image_path = os.path.join(UPLOAD_FOLDER, file.filename)
     file.save(image_path)
 
-    caption = generate_caption(image_path)
+    # Optional latency budget: a shorter caption on time beats a full one late
+    budget_ms = request.form.get("budget_ms", type=float)
+    caption, truncated = generate_caption_within(image_path, budget_ms)
 
     # Fix: Remove file extension before adding .mp3
     base_filename = os.path.splitext(file.filename)[0]  # Removes .jpg/.png
@@ -59,6 +81,7 @@ def upload_image():
 
     return jsonify({
         "caption": caption,
+        "truncated": truncated,
         "image_path": image_path,
         "caption_audio_url": f"/generated_audio/{caption_audio_filename}"  #  Correct URL
     })
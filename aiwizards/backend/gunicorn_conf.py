@@ -0,0 +1,50 @@
+# gunicorn_conf.py
+# Prefork serving with model weights loaded once in the master and shared
+# copy-on-write by every worker:
+#   cd aiwizards/backend && gunicorn -c gunicorn_conf.py app:app
+import gc
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.batching import MAX_BATCH_SIZE
+
+# Tells app.py to load the models synchronously before workers are forked
+os.environ["AIWIZARDS_PREFORK"] = "1"
+
+bind = "0.0.0.0:5000"
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# A sync worker serves one request at a time, so its micro-batches would
+# always hold one request; threads let a full batch gather in each worker
+worker_class = "gthread"
+threads = int(os.environ.get("AIWIZARDS_THREADS", MAX_BATCH_SIZE))
+preload_app = True
+timeout = 120
+# Seconds a worker waits for its models to warm up before serving degraded
+# (/health reports 503); AIWIZARDS_EXIT_ON_PRELOAD_FAILURE=1 exits instead.
+# The worker sends no heartbeat while it waits, so the wait stays within
+# 3/4 of timeout: past timeout gunicorn would kill and respawn it in a loop.
+WORKER_READY_TIMEOUT = min(int(os.environ.get("AIWIZARDS_WORKER_READY_TIMEOUT", 90)), timeout * 0.75)
+
+
+def pre_fork(server, worker):
+    # Keep the workers' GC from touching (and un-sharing) the preloaded objects
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    from models.preload import start_preload, wait, status
+    from utils.memory import memory_usage
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    start_preload()  # weights are already shared, this only warms up kernels
+    if not wait(WORKER_READY_TIMEOUT):
+        if os.environ.get("AIWIZARDS_EXIT_ON_PRELOAD_FAILURE") == "1":
+            print(f"Worker models not ready, exiting: {status()['models']}")
+            sys.exit(1)
+        print(f"Worker serving degraded, models not ready: {status()['models']}")
+        return
+    print(f"Worker ready: {memory_usage()}")
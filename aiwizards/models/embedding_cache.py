@@ -0,0 +1,63 @@
+#embedding_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Least recently used images are evicted above either limit
+MAX_ENTRIES = 32
+MAX_MB = 256
+
+
+def image_key(image_path):
+    """Content hash of an image file (re-uploads of the same photo share one entry)"""
+    digest = hashlib.sha1()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """LRU cache of per-image vision encoder outputs (torch tensors)"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_mb=MAX_MB):
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = OrderedDict()  # key -> (tensor, nbytes), oldest first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Computed outside the lock so other images are not blocked
+        value = compute()
+        size = value.numel() * value.element_size()
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / (1024 * 1024), 1),
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared cache for this process
+embedding_cache = EmbeddingCache()
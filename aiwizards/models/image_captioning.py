@@ -1,19 +1,48 @@
 #image_captioning.py
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from PIL import Image
+from models.model_registry import registry, CAPTION_MODEL
+from utils.batching import MicroBatcher
+from utils.deadline import DeadlineCriteria, deadline_after
+from utils.image_loading import load_image
+from utils.preprocess import batch_buffer, preprocess
 
-# Load BLIP Model
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+# BLIP Model is loaded once on first use and shared through the model registry
+registry.acquire(CAPTION_MODEL)
+
+# Caption a batch of (image, deadline) requests in one generate call;
+# each image stops decoding at its deadline, returning (caption, truncated)
+def generate_captions(requests):
+    import torch  # deferred so importing the app stays cheap
+    from transformers import StoppingCriteriaList
+
+    processor, model = registry.get(CAPTION_MODEL)
+    images = [image for image, _ in requests]
+    # Written into the batcher thread's reusable buffer, used only by this generate call
+    pixel_values = preprocess("blip_caption", images, out=batch_buffer("blip_caption", len(images)))
+    inputs = {"pixel_values": torch.from_numpy(pixel_values)}
+    deadlines = [deadline for _, deadline in requests]
+
+    criteria = DeadlineCriteria(deadlines, model.config.text_config.sep_token_id)
+    generate_kwargs = {}
+    if any(deadline is not None for deadline in deadlines):
+        # Greedy decoding is the cheapest setting; the deadline ends it early
+        generate_kwargs = {"num_beams": 1, "stopping_criteria": StoppingCriteriaList([criteria])}
+
+    with torch.no_grad():
+        out = model.generate(**inputs, **generate_kwargs)
+
+    captions = processor.batch_decode(out, skip_special_tokens=True)
+    return list(zip(captions, criteria.truncated.tolist()))
+
+# Concurrent /upload requests are collected into one batch
+caption_batcher = MicroBatcher("caption", generate_captions)
+
+# Generate a caption within a latency budget (ms, None for no limit); returns
+# (caption, truncated), truncated when the budget cut decoding short
+def generate_caption_within(image_path, budget_ms):
+    deadline = deadline_after(budget_ms)
+    # Decoded before queueing, so a corrupt upload fails only its own request
+    return caption_batcher((load_image(image_path), deadline))
 
 # Generate Caption
 def generate_caption(image_path):
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(image, return_tensors="pt")
-    
-    with torch.no_grad():
-        out = model.generate(**inputs)
-    
-    caption = processor.decode(out[0], skip_special_tokens=True)
-    return caption
+    return generate_caption_within(image_path, None)[0]
@@ -0,0 +1,115 @@
+#model_registry.py
+import gc
+import threading
+import time
+
+# Idle models are unloaded (least recently used first) above this budget
+MEMORY_BUDGET_MB = 4096
+
+CAPTION_MODEL = "Salesforce/blip-image-captioning-base"
+VQA_MODEL = "Salesforce/blip-vqa-base"
+
+
+def _load_blip_caption(model_name):
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained(model_name)
+    model = BlipForConditionalGeneration.from_pretrained(model_name)
+    model.eval()
+    return processor, model
+
+
+def _load_blip_vqa(model_name):
+    from transformers import BlipProcessor, BlipForQuestionAnswering
+    processor = BlipProcessor.from_pretrained(model_name)
+    model = BlipForQuestionAnswering.from_pretrained(model_name)
+    model.eval()
+    return processor, model
+
+
+def _size_mb(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024)
+
+
+class ModelRegistry:
+    """Loads each model once per process, counts references and unloads idle models"""
+
+    def __init__(self, memory_budget_mb=None):
+        self.memory_budget_mb = memory_budget_mb
+        self._loaders = {}
+        self._models = {}      # model_id -> (processor, model)
+        self._sizes = {}
+        self._refcounts = {}
+        self._last_used = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+
+    def register(self, model_id, loader):
+        with self._lock:
+            self._loaders.setdefault(model_id, loader)
+            self._refcounts.setdefault(model_id, 0)
+            self._load_locks.setdefault(model_id, threading.Lock())
+
+    def acquire(self, model_id):
+        with self._lock:
+            self._refcounts[model_id] += 1
+
+    def release(self, model_id):
+        with self._lock:
+            self._refcounts[model_id] = max(0, self._refcounts[model_id] - 1)
+        self._enforce_budget()
+
+    def get(self, model_id):
+        """Return (processor, model), loading the model on first use"""
+        if model_id not in self._models:
+            with self._load_locks[model_id]:
+                if model_id not in self._models:
+                    start = time.time()
+                    processor, model = self._loaders[model_id](model_id)
+                    with self._lock:
+                        self._models[model_id] = (processor, model)
+                        self._sizes[model_id] = _size_mb(model)
+                        self._last_used[model_id] = time.time()
+                    print(f"Loaded {model_id} in {time.time() - start:.1f}s")
+                    self._enforce_budget(keep=model_id)
+        with self._lock:
+            self._last_used[model_id] = time.time()
+            return self._models[model_id]
+
+    def unload_idle(self):
+        with self._lock:
+            idle = [m for m in self._models if self._refcounts[m] == 0]
+            for model_id in idle:
+                del self._models[model_id]
+                self._sizes.pop(model_id, None)
+        gc.collect()
+        return idle
+
+    def _enforce_budget(self, keep=None):
+        if self.memory_budget_mb is None:
+            return
+        with self._lock:
+            idle = sorted(
+                (self._last_used[m], m) for m in self._models
+                if self._refcounts[m] == 0 and m != keep
+            )
+            for _, model_id in idle:
+                if sum(self._sizes.values()) <= self.memory_budget_mb:
+                    break
+                del self._models[model_id]
+                self._sizes.pop(model_id, None)
+                print(f"Unloaded idle model {model_id}")
+        gc.collect()
+
+    def stats(self):
+        with self._lock:
+            return {
+                m: {"loaded": m in self._models, "refcount": self._refcounts[m],
+                    "size_mb": round(self._sizes.get(m, 0.0), 1)}
+                for m in self._loaders
+            }
+
+
+# Shared registry used by every model module in this process
+registry = ModelRegistry(memory_budget_mb=MEMORY_BUDGET_MB)
+registry.register(CAPTION_MODEL, _load_blip_caption)
+registry.register(VQA_MODEL, _load_blip_vqa)
@@ -0,0 +1,82 @@
+#preload.py
+import threading
+import time
+
+from models.model_registry import registry, CAPTION_MODEL, VQA_MODEL
+
+WARMUP_IMAGE_SIZE = (640, 480)  # typical phone photo aspect ratio
+
+
+def _warm_caption(processor, model):
+    import torch
+    from PIL import Image
+    inputs = processor(Image.new("RGB", WARMUP_IMAGE_SIZE), return_tensors="pt")
+    with torch.no_grad():
+        model.generate(**inputs)
+
+
+def _warm_vqa(processor, model):
+    import torch
+    from PIL import Image
+    inputs = processor(Image.new("RGB", WARMUP_IMAGE_SIZE), "What is in the image?", return_tensors="pt")
+    with torch.no_grad():
+        model.generate(**inputs)
+
+
+WARMUPS = {CAPTION_MODEL: _warm_caption, VQA_MODEL: _warm_vqa}
+
+ready = threading.Event()
+finished = threading.Event()  # every model is ready or failed
+_states = {model_id: "pending" for model_id in WARMUPS}
+_threads = []
+_started_at = None
+_lock = threading.Lock()
+
+
+def _load(model_id):
+    try:
+        _states[model_id] = "loading"
+        processor, model = registry.get(model_id)
+        _states[model_id] = "warming_up"
+        WARMUPS[model_id](processor, model)
+        _states[model_id] = "ready"
+    except Exception as e:
+        print(f"Error preloading {model_id}: {str(e)}")
+        _states[model_id] = "failed"
+    with _lock:
+        if finished.is_set() or not all(state in ("ready", "failed") for state in _states.values()):
+            return
+        if all(state == "ready" for state in _states.values()):
+            ready.set()
+            print(f"All models loaded and warmed up in {time.time() - _started_at:.1f}s - ready to serve")
+        else:
+            print(f"Model preload finished with failures: {_states}")
+        finished.set()
+
+
+def load_models():
+    """Load every model synchronously without warming up (used before forking workers)"""
+    for model_id in WARMUPS:
+        registry.get(model_id)
+
+
+def start_preload():
+    """Load and warm up every model concurrently on background threads"""
+    global _started_at
+    if _threads:
+        return
+    _started_at = time.time()
+    for model_id in WARMUPS:
+        thread = threading.Thread(target=_load, args=(model_id,), daemon=True)
+        _threads.append(thread)
+        thread.start()
+
+
+def wait(timeout=None):
+    """Block until every model is ready or failed (at most timeout seconds); True if all are ready"""
+    finished.wait(timeout)
+    return ready.is_set()
+
+
+def status():
+    return {"ready": ready.is_set(), "models": dict(_states)}
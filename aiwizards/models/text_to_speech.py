@@ -1,9 +1,17 @@
 # text_to_speech.py
 import edge_tts
 import asyncio
+from utils.audio_cache import audio_cache
+
+VOICE = "en-US-JennyNeural"
 
 async def text_to_speech(text, output_file="output.mp3"):
-    tts = edge_tts.Communicate(text, voice="en-US-JennyNeural")
+    # Repeated captions and answers are copied from the audio cache
+    if audio_cache.fetch(text, VOICE, "mp3", output_file):
+        print(f"Audio saved at {output_file} (cached)")
+        return output_file
+    tts = edge_tts.Communicate(text, voice=VOICE)
     await tts.save(output_file)
+    audio_cache.store(text, VOICE, "mp3", output_file)
     print(f"Audio saved at {output_file}")
     return output_file
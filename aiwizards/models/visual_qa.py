@@ -1,21 +1,63 @@
 #visual_qa.py
-import torch
-from transformers import BlipProcessor, BlipForQuestionAnswering
-from PIL import Image
+from models.model_registry import registry, VQA_MODEL
+from models.embedding_cache import embedding_cache, image_key
+from utils.batching import MicroBatcher
+from utils.image_loading import load_image
+from utils.preprocess import preprocess
 
-# Load BLIP-VQA Model
-vqa_processor = BlipProcessor.from_pretrained("Salesforce/blip-vqa-base")
-vqa_model = BlipForQuestionAnswering.from_pretrained("Salesforce/blip-vqa-base")
+# BLIP-VQA Model is loaded once on first use and shared through the model registry
+registry.acquire(VQA_MODEL)
 
-# Answer Image-Related Questions
-def answer_question(image_path, question):
-    image = Image.open(image_path).convert("RGB")
+# Encode the image with the vision tower (cached per image, so follow-up questions skip it)
+def encode_image(image_path):
+    import torch  # deferred so importing the app stays cheap
+
+    vqa_model = registry.get(VQA_MODEL)[1]
+
+    def compute():
+        pixel_values = torch.from_numpy(preprocess("blip_vqa", [load_image(image_path)]))
+        with torch.no_grad():
+            return vqa_model.vision_model(pixel_values=pixel_values)[0]
+
+    return embedding_cache.get_or_compute(image_key(image_path), compute)
+
+# Answer a batch of (image_embeds, question) pairs in one pass through the text side
+def answer_questions(requests):
+    import torch
 
-    # Process image + text input
-    inputs = vqa_processor(image, question, return_tensors="pt")
+    vqa_processor, vqa_model = registry.get(VQA_MODEL)
+    image_embeds = torch.cat([embeds for embeds, _ in requests])
 
+    # Process text input only (padded to the longest question); the image side comes from the cache
+    inputs = vqa_processor(text=[question for _, question in requests], padding=True, return_tensors="pt")
+
+    # Same steps as BlipForQuestionAnswering.generate, starting after the vision tower
     with torch.no_grad():
-        out = vqa_model.generate(**inputs)
+        image_attention_mask = torch.ones(image_embeds.size()[:-1], dtype=torch.long)
+        question_embeds = vqa_model.text_encoder(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            encoder_hidden_states=image_embeds,
+            encoder_attention_mask=image_attention_mask,
+            return_dict=False
+        )[0]
+        # Questions are padded to the longest one, so the decoder must not attend to the padding
+        question_attention_mask = inputs["attention_mask"]
+        bos_ids = torch.full((question_embeds.size(0), 1), fill_value=vqa_model.decoder_start_token_id)
+        out = vqa_model.text_decoder.generate(
+            input_ids=bos_ids,
+            eos_token_id=vqa_model.config.text_config.sep_token_id,
+            pad_token_id=vqa_model.config.text_config.pad_token_id,
+            encoder_hidden_states=question_embeds,
+            encoder_attention_mask=question_attention_mask
+        )
+
+    return vqa_processor.batch_decode(out, skip_special_tokens=True)
+
+# Concurrent /ask requests are collected into one batch
+vqa_batcher = MicroBatcher("vqa", answer_questions)
 
-    answer = vqa_processor.decode(out[0], skip_special_tokens=True)
-    return answer
+# Answer Image-Related Questions
+def answer_question(image_path, question):
+    # The image is encoded before queueing, so a corrupt upload fails only its own request
+    return vqa_batcher((encode_image(image_path), question))
@@ -0,0 +1,34 @@
+#test_preprocess.py
+# utils/preprocess.py against the BLIP processors' configs:
+#   cd aiwizards && python -m pytest tests
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+transformers = pytest.importorskip("transformers")
+
+from PIL import Image
+
+from models.model_registry import CAPTION_MODEL, VQA_MODEL
+from utils.preprocess import preprocess
+
+TOLERANCE = 1e-5
+MODELS = {"blip_caption": CAPTION_MODEL, "blip_vqa": VQA_MODEL}
+# Random photos in landscape, portrait and square shapes
+IMAGES = [
+    Image.fromarray(np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8))
+    for seed, (width, height) in enumerate([(640, 480), (480, 640), (500, 500), (1000, 667)])
+]
+
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+def test_matches_blip_processor(model):
+    try:
+        processor = transformers.BlipImageProcessor.from_pretrained(MODELS[model])
+    except OSError as e:
+        pytest.skip(f"{MODELS[model]} processor config not available: {e}")
+    for image in IMAGES:
+        expected = processor(images=image, return_tensors="np")["pixel_values"]
+        actual = preprocess(model, [image])
+        assert actual.shape == expected.shape
+        assert np.abs(expected - actual).max() <= TOLERANCE
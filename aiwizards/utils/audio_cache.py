@@ -0,0 +1,79 @@
+#audio_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# Synthesized speech by hash of (text, voice, format); least recently used files go above MAX_MB
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "generated_audio", "cache"))
+MAX_MB = 128
+
+
+class AudioCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, text, voice, audio_format):
+        digest = hashlib.sha1(json.dumps([text, voice, audio_format]).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{audio_format}")
+
+    def fetch(self, text, voice, audio_format, output_file):
+        """Copy the cached audio to output_file; False on a miss"""
+        cached = self.path(text, voice, audio_format)
+        try:
+            shutil.copyfile(cached, output_file)
+            os.utime(cached)  # mark as recently used
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def store(self, text, voice, audio_format, output_file):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = self.path(text, voice, audio_format)
+        partial = f"{cached}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(output_file, partial)
+        os.replace(partial, cached)
+        with self.lock:
+            self.writes += 1
+            check = self.writes % 32 == 1
+        if check:
+            self.evict()
+
+    def files(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and not entry.name.endswith(".tmp")]
+
+    def evict(self):
+        """Delete the least recently used files while the cache is over MAX_MB"""
+        files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self.files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        size = sum(entry.stat().st_size for entry in self.files())
+        with self.lock:
+            return {"files": len(self.files()), "size_mb": round(size / (1024 * 1024), 2),
+                    "hits": self.hits, "misses": self.misses}
+
+
+audio_cache = AudioCache()
@@ -0,0 +1,82 @@
+#batching.py
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+# Longest a request waits for others to join its batch, and the batch size limit
+MAX_WAIT_MS = 10
+MAX_BATCH_SIZE = 8
+
+
+class MicroBatcher:
+    """
+    Request queue in front of one model: concurrent requests arriving within
+    MAX_WAIT_MS run together as one batch, and each caller gets its own result.
+    Items are decoded before they are queued; if a batch still fails, its
+    requests are retried one at a time so only the bad one gets the error.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.run_batch = run_batch  # list of items -> list of results
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+
+    def __call__(self, item):
+        """Queue a request and wait for its result"""
+        future = Future()
+        with self._lock:
+            # Started on first use, so prefork workers each get their own thread
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._serve, name=f"batcher-{self.name}", daemon=True)
+                self._worker.start()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _serve(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+            try:
+                results = self._run_items([item for item, _ in batch])
+            except Exception as e:
+                print(f"Batch of {len(batch)} failed on {self.name} ({e}), retrying one at a time")
+                for item, future in batch:
+                    try:
+                        future.set_result(self._run_items([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run_items(self, items):
+        results = self.run_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} requests")
+        return results
+
+    def stats(self):
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            requests = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items()))
+            }
@@ -0,0 +1,33 @@
+#deadline.py
+import time
+
+import numpy as np
+
+
+def deadline_after(budget_ms):
+    """perf_counter() time budget_ms from now, or None for no budget"""
+    if budget_ms is None:
+        return None
+    return time.perf_counter() + budget_ms / 1000
+
+
+class DeadlineCriteria:
+    """
+    generate() stopping criterion that ends each row of the batch at its own
+    deadline (None for none); truncated marks rows stopped before [SEP]
+    """
+
+    def __init__(self, deadlines, eos_token_id):
+        self.deadlines = list(deadlines)
+        self.eos_token_id = eos_token_id
+        self.truncated = np.zeros(len(self.deadlines), dtype=bool)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        now = time.perf_counter()
+        done = np.array([d is not None and now >= d for d in self.deadlines], dtype=bool)
+        if done.any():
+            ended = (input_ids == self.eos_token_id).any(-1).cpu().numpy()
+            self.truncated |= done & ~ended
+        return torch.as_tensor(done, device=input_ids.device)
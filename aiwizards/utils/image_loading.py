@@ -0,0 +1,17 @@
+#image_loading.py
+from PIL import Image
+
+# Smallest image side any model needs: both BLIP processors resize to 384x384
+MIN_SIZE = 384
+
+
+def load_image(image_path, min_size=MIN_SIZE):
+    """
+    Decode an image to RGB. Large JPEGs (12 MP phone photos) are scaled down
+    in the DCT domain while decoding (PIL draft mode), to the smallest 1/2,
+    1/4 or 1/8 scale whose sides still cover min_size
+    """
+    with Image.open(image_path) as image:
+        if image.format == "JPEG":
+            image.draft("RGB", (min_size, min_size))
+        return image.convert("RGB")
@@ -0,0 +1,23 @@
+#memory.py
+import os
+
+
+def memory_usage():
+    """RSS, PSS and unique (private) RSS of this process in MB, from /proc/self/smaps_rollup"""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {"pid": os.getpid(), "rss_mb": None, "pss_mb": None, "unique_rss_mb": None}
+
+    unique_kb = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "pid": os.getpid(),
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "unique_rss_mb": round(unique_kb / 1024, 1)
+    }
@@ -1,14 +1,68 @@
 #preprocess.py
-from torchvision import transforms
-from PIL import Image
+import threading
+
 import numpy as np
+from PIL import Image
+
+from utils.image_loading import load_image
+
+# Per-model (size, mean, std, resample), matching BlipProcessor for the BLIP
+# models and the torchvision transform the ONNX export used
+OPENAI_CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+OPENAI_CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+SPECS = {
+    "blip_caption": (384, OPENAI_CLIP_MEAN, OPENAI_CLIP_STD, Image.BICUBIC),
+    "blip_vqa": (384, OPENAI_CLIP_MEAN, OPENAI_CLIP_STD, Image.BICUBIC),
+    "imagenet": (256, IMAGENET_MEAN, IMAGENET_STD, Image.BILINEAR),
+}
+
+
+def _normalize_table(mean, std):
+    """(3, 256) float32 values of (pixel / 255 - mean) / std, rounded as the processors do"""
+    rescaled = (np.arange(256, dtype=np.float64) * (1 / 255)).astype(np.float32)
+    mean = np.asarray(mean, dtype=np.float32)[:, None]
+    std = np.asarray(std, dtype=np.float32)[:, None]
+    return (rescaled[None, :] - mean) / std
+
+
+TABLES = {model: _normalize_table(mean, std) for model, (_, mean, std, _) in SPECS.items()}
+
+_buffers = threading.local()
+
+
+def batch_buffer(model, batch_size):
+    """
+    Reusable (batch_size, 3, size, size) float32 array for the calling thread,
+    overwritten by its next call (for pixel values used straight away)
+    """
+    size = SPECS[model][0]
+    buffers = _buffers.__dict__.setdefault("arrays", {})
+    buffer = buffers.get(model)
+    if buffer is None or len(buffer) < batch_size:
+        buffer = buffers[model] = np.empty((batch_size, 3, size, size), dtype=np.float32)
+    return buffer[:batch_size]
+
+
+def preprocess(model, images, out=None):
+    """
+    Pixel values (n, 3, size, size) for a list of PIL images: resize, rescale,
+    normalize and HWC->CHW in one table lookup per channel, written into out
+    (e.g. a batch_buffer) when given
+    """
+    size, _, _, resample = SPECS[model]
+    table = TABLES[model]
+    if out is None:
+        out = np.empty((len(images), 3, size, size), dtype=np.float32)
+    for image, pixel_values in zip(images, out):
+        pixels = np.asarray(image.convert("RGB").resize((size, size), resample))
+        for channel in range(3):
+            np.take(table[channel], pixels[:, :, channel], out=pixel_values[channel])
+    return out
+
 
 # Image preprocessing function
 def preprocess_image(image_path):
-    transform = transforms.Compose([
-        transforms.Resize((256, 256)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
-    image = Image.open(image_path).convert("RGB")
-    return transform(image).unsqueeze(0).numpy()  # Convert to NumPy for ONNX
+    return preprocess("imagenet", [load_image(image_path)])  # NumPy for ONNX